@@ -104,6 +104,7 @@ function db_check($query, $params = [])
     if (!method_exists(get_config('db/obj'), 'db_check')) {
         show_php_error(['dberror' => 'Unknown database connector']);
     }
+    __db_queries_helper(__FUNCTION__);
     return get_config('db/obj')->db_check($query, $params);
 }
 
@@ -159,6 +160,7 @@ function db_query($query, ...$args)
     if (eval_bool(get_config('debug/slowquerydebug'))) {
         $curtime = microtime(true);
     }
+    __db_queries_helper(__FUNCTION__);
     $result = get_config('db/obj')->db_query($query, ...$args);
     if (eval_bool(get_config('debug/slowquerydebug'))) {
         $curtime = microtime(true) - $curtime;
@@ -180,6 +182,32 @@ function db_query($query, ...$args)
     return $result;
 }
 
+/**
+ * DB Queries
+ *
+ * This function returns the number of queries executed by db_query and db_check
+ * in the current request, intended to be used by the stats of the benchmarks
+ */
+function db_queries()
+{
+    return __db_queries_helper(__FUNCTION__);
+}
+
+/**
+ * DB Queries helper
+ *
+ * This function is a helper of the db_queries function, increments the counter
+ * when is called by db_query or db_check and returns the current counter
+ */
+function __db_queries_helper($fn)
+{
+    static $count = 0;
+    if ($fn != 'db_queries') {
+        $count++;
+    }
+    return $count;
+}
+
 /**
  * DB Fetch Row
  *
@@ -252,6 +280,31 @@ function db_field_name($result, $index)
     return $result['header'][$index];
 }
 
+/**
+ * DB Load Data
+ *
+ * This function is intended to load a CSV or TSV file into a table using the bulk load command
+ * of the database, only available in the drivers that implement it
+ *
+ * @file   => the uncompressed file that you want to load
+ * @table  => the table where the rows will be inserted
+ * @fields => the fields of the columns of the file
+ * @format => the format of the file, csv or tsv
+ *
+ * Returns the number of inserted rows or false if the driver can not load the file, in this
+ * case the caller must insert the rows using queries
+ */
+function db_load_data($file, $table, $fields, $format)
+{
+    if (!get_config('db/obj')) {
+        show_php_error(['dberror' => 'Unknown database connector']);
+    }
+    if (!method_exists(get_config('db/obj'), 'db_load_data')) {
+        return false;
+    }
+    return get_config('db/obj')->db_load_data($file, $table, $fields, $format);
+}
+
 /**
  * DB Last Insert ID
  *
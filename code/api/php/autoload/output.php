@@ -139,6 +139,7 @@ function output_handler($array)
         __output_header($temp, false);
     }
     __output_header('Connection: keep-alive, close');
+    __output_stats();
     if ($file != '' && $data == '') {
         readfile($file);
     } else {
@@ -150,6 +151,26 @@ function output_handler($array)
     // @codeCoverageIgnoreEnd
 }
 
+/**
+ * Output stats helper
+ *
+ * This function writes a JSON line with the time, the peak of memory and the
+ * number of queries of the request to the standard error, only when the CLI
+ * SAPI is used with the stats environment variable, this allow to the benchmark
+ * scripts to measure the actions without changes in the output of the actions
+ */
+function __output_stats()
+{
+    if (get_data('server/request_method') != 'CLI' || !getenv('stats')) {
+        return;
+    }
+    file_put_contents('php://stderr', json_encode([
+        'time' => round(time_get_usage(true), 6),
+        'memory' => memory_get_peak_usage(),
+        'queries' => db_queries(),
+    ]) . "\n");
+}
+
 /**
  * Output header helper
  *
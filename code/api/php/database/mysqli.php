@@ -69,6 +69,9 @@ class database_mysqli
      *
      * MYSQLI_REPORT_ERROR | MYSQLI_REPORT_STRICT are the same that PDO::ERRMODE_EXCEPTION
      * MYSQLI_USE_RESULT is the same that PDO::MYSQL_ATTR_USE_BUFFERED_QUERY = false
+     *
+     * LOAD DATA LOCAL INFILE is only allowed for the files of the temp directory, this is done
+     * using MYSQLI_OPT_LOAD_DATA_LOCAL_DIR, available from PHP 8.1
      */
     public function __construct($args)
     {
@@ -86,8 +89,13 @@ class database_mysqli
         $args['name'] = $args['name'] ?? '';
         $args['user'] = $args['user'] ?? '';
         $args['pass'] = $args['pass'] ?? '';
+        $dir = realpath(get_directory('dirs/tempdir') ?? getcwd_protected() . '/data/temp/');
         try {
-            $this->link = new mysqli(
+            $this->link = mysqli_init();
+            if ($dir && defined('MYSQLI_OPT_LOAD_DATA_LOCAL_DIR')) {
+                $this->link->options(MYSQLI_OPT_LOAD_DATA_LOCAL_DIR, $dir);
+            }
+            $this->link->real_connect(
                 $args['host'] . ':' . $args['port'],
                 $args['user'], $args['pass'],
                 $args['name']
@@ -245,6 +253,43 @@ class database_mysqli
         return intval($this->link->insert_id);
     }
 
+    /**
+     * DB Load Data
+     *
+     * This public function is intended to load a CSV or TSV file into a table using the
+     * LOAD DATA LOCAL INFILE command
+     *
+     * @file   => the uncompressed file, must be located in the temp directory
+     * @table  => the table where the rows will be inserted
+     * @fields => the fields of the columns of the file
+     * @format => the format of the file, csv or tsv
+     *
+     * Returns the number of inserted rows or false if the server or the client does not allow
+     * the LOAD DATA LOCAL INFILE command
+     *
+     * Notes:
+     *
+     * This command can not be prepared, by this reason it is executed using the query method
+     * instead of the prepare method used by the db_query function
+     */
+    public function db_load_data($file, $table, $fields, $format)
+    {
+        $fields = '`' . implode('`,`', $fields) . '`';
+        $file = $this->link->real_escape_string($file);
+        $query = "LOAD DATA LOCAL INFILE '$file' INTO TABLE `$table`";
+        $query .= ' CHARACTER SET utf8mb4';
+        if ($format == 'csv') {
+            $query .= " FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY ''";
+        }
+        $query .= " IGNORE 1 LINES ($fields)";
+        try {
+            $this->link->query($query);
+            return $this->link->affected_rows;
+        } catch (Exception $e) {
+            return false;
+        }
+    }
+
     /**
      * DB Disconnect
      *
@@ -64,6 +64,11 @@ class database_pdo_mysql
      * @name => name of the database for the connection
      * @user => user used to stablish the connection
      * @pass => pass used to stablish the connection
+     *
+     * Notes of this driver:
+     *
+     * LOAD DATA LOCAL INFILE is only allowed for the files of the temp directory, this is done
+     * using PDO::MYSQL_ATTR_LOCAL_INFILE_DIRECTORY, available from PHP 8.1
      */
     public function __construct($args)
     {
@@ -80,11 +85,16 @@ class database_pdo_mysql
         $args['name'] = $args['name'] ?? '';
         $args['user'] = $args['user'] ?? '';
         $args['pass'] = $args['pass'] ?? '';
+        $options = [];
+        $dir = realpath(get_directory('dirs/tempdir') ?? getcwd_protected() . '/data/temp/');
+        if ($dir && defined('PDO::MYSQL_ATTR_LOCAL_INFILE_DIRECTORY')) {
+            $options[PDO::MYSQL_ATTR_LOCAL_INFILE_DIRECTORY] = $dir;
+        }
         try {
             $this->link = new PDO(
                 'mysql:host=' . $args['host'] . ':' . $args['port'] . ';' .
                 'dbname=' . $args['name'],
-                $args['user'], $args['pass']
+                $args['user'], $args['pass'], $options
             );
         } catch (PDOException $e) {
             show_php_error(['dberror' => $e->getMessage()]);
@@ -233,6 +243,42 @@ class database_pdo_mysql
         return intval($this->link->lastInsertId());
     }
 
+    /**
+     * DB Load Data
+     *
+     * This public function is intended to load a CSV or TSV file into a table using the
+     * LOAD DATA LOCAL INFILE command
+     *
+     * @file   => the uncompressed file, must be located in the temp directory
+     * @table  => the table where the rows will be inserted
+     * @fields => the fields of the columns of the file
+     * @format => the format of the file, csv or tsv
+     *
+     * Returns the number of inserted rows or false if the server or the client does not allow
+     * the LOAD DATA LOCAL INFILE command
+     *
+     * Notes:
+     *
+     * The first line of the file contains the names of the columns and is ignored, the TSV files
+     * use the default format of the LOAD DATA command and the CSV files use optionally enclosed
+     * fields with the double quotes doubled inside the fields
+     */
+    public function db_load_data($file, $table, $fields, $format)
+    {
+        $fields = '`' . implode('`,`', $fields) . '`';
+        $query = 'LOAD DATA LOCAL INFILE ' . $this->link->quote($file) . " INTO TABLE `$table`";
+        $query .= ' CHARACTER SET utf8mb4';
+        if ($format == 'csv') {
+            $query .= " FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY ''";
+        }
+        $query .= " IGNORE 1 LINES ($fields)";
+        try {
+            return $this->link->exec($query);
+        } catch (PDOException $e) {
+            return false;
+        }
+    }
+
     /**
      * DB Disconnect
      *
@@ -142,20 +142,40 @@ function setup()
  * Load and initialize sample data for all apps in the given directory.
  *
  * This function is used during the setup or development phase to populate
- * the database with sample data stored in `.sql.gz` files under
- * `apps/<dir>/sample/sql/`. For each file:
+ * the database with sample data stored in `.sql.gz`, `.csv.gz` or `.tsv.gz`
+ * files under `apps/<dir>/sample/sql/`. For each file:
  *
  * - It infers the corresponding table and app.
- * - If the table is empty, it loads the data from the SQL file.
- * - It then generates control/version/index/log metadata for each inserted record.
+ * - If the table is empty, it loads the data from the SQL file, statement by
+ *   statement, using the __setup_import_sql function, or from the CSV or TSV
+ *   file using the __setup_import_csv function.
+ * - If the table contains data loaded from a file whose sha256 in the
+ *   `manifest.json` file of the directory is different of the sha256 stored
+ *   in the `sample/<dir>/<file>` key of the tbl_config when it was loaded, the
+ *   contents of the table are removed and the file is loaded again, the tables
+ *   without stored sha256 keep their data as before.
+ * - It then generates control/version/index/log metadata for each inserted record,
+ *   except the control, version and index rows loaded from the files of the
+ *   `<table>_control`, `<table>_version` and `<table>_index` tables of the app,
+ *   the control and index rows of the registers removed by a new load are
+ *   removed too.
  * - It ensures that subtable and main table mappings are respected.
  *
  * The function returns timing information and the number of records processed
- * per app, which can be used for diagnostics or logging.
+ * per app (only the apps with loaded files), which can be used for diagnostics
+ * or logging, the time is split in the phases of the load of the files and of
+ * the control, version, index and log metadata, as used by the
+ * scripts/benchsetup.py benchmark.
+ *
+ * When the CLI is used with the `sample` environment variable, the files are
+ * searched in the `<sample>/<dir>/` directory instead of the sample directory
+ * of the app, as written by scripts/sampleall.py with the --output option,
+ * this allow to load the sample data generated at other scales.
  *
  * @dir => The directory under `apps/` (e.g., "crm", "sales", ...)
  *
- * Return an associative array with total execution time and per-app counts
+ * Return an associative array with total execution time, the time of each
+ * phase and per-app counts
  */
 function __setup_helper($dir)
 {
@@ -164,59 +184,269 @@ function __setup_helper($dir)
     require_once 'php/lib/version.php';
     require_once 'php/lib/indexing.php';
     $time1 = microtime(true);
+    $phases = ['load' => 0, 'control' => 0, 'version' => 0, 'index' => 0, 'log' => 0];
 
     // Search all files of the requested directory
-    $files = glob("apps/$dir/sample/sql/*.sql.gz");
+    $path = "apps/$dir/sample/sql";
+    if (get_data('server/request_method') == 'CLI' && getenv('sample')) {
+        $path = getenv('sample') . "/$dir";
+    }
+    $files = array_merge(
+        glob("$path/*.sql.gz"),
+        glob("$path/*.csv.gz"),
+        glob("$path/*.tsv.gz")
+    );
+    sort($files);
+    // The manifest contains the sha256 of each file written by the generators
+    $manifest = [];
+    if (file_exists("$path/manifest.json")) {
+        $manifest = json_decode(file_get_contents("$path/manifest.json"), true);
+    }
     $total = [];
+    $meta = [];
+    $old = [];
     foreach ($files as $file) {
         // Prepare the table and app variables
-        $table = basename($file, '.sql.gz');
+        $table = strtok(basename($file), '.');
         $app = '';
+        $type = '';
         if (table_exists($table)) {
             $app = table2app($table);
         }
         if (subtable_exists($table)) {
             $app = subtable2app($table);
         }
+        // The control, version and index tables of the app can be loaded from files
+        if (!$app && preg_match('/^(.+)_(control|version|index)$/', $table, $matches)) {
+            if (table_exists($matches[1])) {
+                $app = table2app($matches[1]);
+                $type = $matches[2];
+                $meta[$app][$type] = true;
+            }
+        }
         if (!$app) {
             show_php_error(['phperror' => "table $table without app"]);
         }
-        if (!isset($total[$app])) {
-            $total[$app] = 0;
-        }
-
         // Check if table contains some data
         $exists = execute_query("SELECT COUNT(*) FROM $table");
+        // Check if the file changed after the last load of the table
+        $name = basename($file);
+        $hash = $manifest[$name]['sha256'] ?? '';
+        $key = "sample/$dir/$name";
+        if ($exists && $hash) {
+            $loaded = get_config($key, 0);
+            if ($loaded !== null && $loaded != $hash) {
+                // Keep the old ids to remove the control and index of the removed registers
+                if (!$type && !isset($old[$app])) {
+                    $old[$app] = execute_query_array('SELECT id FROM ' . app2table($app));
+                }
+                db_query("DELETE FROM $table");
+                $exists = 0;
+            }
+        }
         if (!$exists) {
-            // Load and executes the query
-            $query = file_get_contents("compress.zlib://$file");
-            db_query($query);
+            // Load and executes the queries
+            $time = microtime(true);
+            if (substr($file, -7) == '.sql.gz') {
+                __setup_import_sql($file);
+            } else {
+                __setup_import_csv($file);
+            }
+            $phases['load'] += microtime(true) - $time;
 
             // Increment the total item
-            $count = execute_query("SELECT COUNT(*) FROM $table");
-            $total[$app] += $count;
+            if (!isset($total[$app])) {
+                $total[$app] = 0;
+            }
+            if (!$type) {
+                $count = execute_query("SELECT COUNT(*) FROM $table");
+                $total[$app] += $count;
+            }
+
+            // Remember the hash of the loaded file
+            if ($hash) {
+                set_config($key, $hash, 0);
+            }
         }
     }
 
     foreach ($total as $app => $num) {
         if ($num) {
             $table = app2table($app);
-            // Add the needed control, version, index and log
+            // Add the needed control, version, index and log, except the loaded from files
             $ids = execute_query_array("SELECT id FROM $table");
+            if (isset($old[$app])) {
+                $ids = array_values(array_unique(array_merge($old[$app], $ids)));
+                sort($ids);
+            }
             foreach ($ids as $id) {
-                make_control($app, $id);
-                make_version($app, $id);
-                make_index($app, $id);
+                $time = microtime(true);
+                if (!isset($meta[$app]['control'])) {
+                    make_control($app, $id);
+                }
+                $phases['control'] += microtime(true) - $time;
+                $time = microtime(true);
+                if (!isset($meta[$app]['version'])) {
+                    make_version($app, $id);
+                }
+                $phases['version'] += microtime(true) - $time;
+                $time = microtime(true);
+                if (!isset($meta[$app]['index'])) {
+                    make_index($app, $id);
+                }
+                $phases['index'] += microtime(true) - $time;
             }
+            $time = microtime(true);
             make_log($app, 'setup', $ids);
+            $phases['log'] += microtime(true) - $time;
         }
     }
 
     $time2 = microtime(true);
+    foreach ($phases as $key => $val) {
+        $phases[$key] = round($val, 6);
+    }
     return [
         'setup' => [
             'time' => round($time2 - $time1, 6),
+            'phases' => $phases,
             'total' => $total,
         ],
     ];
 }
+
+/**
+ * Import SQL helper
+ *
+ * This function executes the statements of a gzipped SQL file one by one, the
+ * file is read line by line and each statement is sent to the database when a
+ * line finish with a semicolon outside of a quoted string, this allow to load
+ * big sample files using a bounded amount of memory and without exceed the
+ * max_allowed_packet limit of the database server
+ *
+ * @file => the .sql.gz file that you want to import
+ *
+ * Returns the number of executed statements
+ *
+ * Notes:
+ *
+ * The sample generators group the INSERT statements in transactions using the
+ * parse_query syntax, for this reason this function does not manage any
+ * transaction by itself
+ */
+function __setup_import_sql($file)
+{
+    $fd = gzopen($file, 'rb');
+    if (!$fd) {
+        show_php_error(['phperror' => "Unable to open $file"]);
+    }
+    $total = 0;
+    $query = '';
+    $quotes = 0;
+    while (($line = gzgets($fd)) !== false) {
+        $query .= $line;
+        $quotes += substr_count($line, "'");
+        if ($quotes % 2 == 0 && substr(rtrim($line), -1) == ';') {
+            db_query(substr(rtrim($query), 0, -1));
+            $total++;
+            $query = '';
+            $quotes = 0;
+        }
+    }
+    if (trim($query) != '') {
+        db_query($query);
+        $total++;
+    }
+    gzclose($fd);
+    return $total;
+}
+
+/**
+ * Import CSV helper
+ *
+ * This function loads a gzipped CSV or TSV file produced by the sample generators
+ * into the table of the same name, the first line of the file contains the names of
+ * the columns, the file is uncompressed in the temp directory and loaded with the
+ * db_load_data function (LOAD DATA LOCAL INFILE in MySQL), and if the driver can not
+ * load it, the rows are inserted with prepared multi-row INSERT statements inside one
+ * transaction (the fast path of SQLite)
+ *
+ * @file => the .csv.gz or .tsv.gz file that you want to import
+ *
+ * Returns the number of inserted rows
+ */
+function __setup_import_csv($file)
+{
+    $format = pathinfo(basename($file, '.gz'), PATHINFO_EXTENSION);
+    $table = basename($file, ".$format.gz");
+    $temp = get_temp_file($format);
+    if (!copy("compress.zlib://$file", $temp)) {
+        show_php_error(['phperror' => "Unable to open $file"]);
+    }
+    $fd = fopen($temp, 'rb');
+    $fields = __setup_read_row($fd, $format);
+    if (!$fields) {
+        fclose($fd);
+        unlink($temp);
+        return 0;
+    }
+    $total = db_load_data($temp, $table, $fields, $format);
+    if ($total === false) {
+        $total = 0;
+        // SQLite allows 999 variables by query in the old versions
+        $size = max(1, intdiv(999, count($fields)));
+        $values = '(' . implode(',', array_fill(0, count($fields), '?')) . ')';
+        $fields = '`' . implode('`,`', $fields) . '`';
+        db_query('/*MYSQL SET autocommit=0 *//*SQLITE BEGIN */');
+        $rows = [];
+        for (;;) {
+            $row = __setup_read_row($fd, $format);
+            if ($row) {
+                $rows[] = $row;
+            }
+            if (count($rows) && (count($rows) == $size || !$row)) {
+                $query = "INSERT INTO $table ($fields) VALUES ";
+                $query .= implode(',', array_fill(0, count($rows), $values));
+                db_query($query, array_merge(...$rows));
+                $total += count($rows);
+                $rows = [];
+            }
+            if (!$row) {
+                break;
+            }
+        }
+        db_query('COMMIT');
+        db_query('/*MYSQL SET autocommit=1 */');
+    }
+    fclose($fd);
+    unlink($temp);
+    return $total;
+}
+
+/**
+ * Read row helper
+ *
+ * This function returns the values of the next row of a CSV or TSV file, or null at
+ * the end of the file, the CSV values can be enclosed by double quotes with the double
+ * quotes doubled inside them, and the TSV values escape the backslashes, tabs and
+ * newlines with backslashes, as expected by the LOAD DATA command
+ *
+ * @fd     => the descriptor of the opened file
+ * @format => the format of the file, csv or tsv
+ */
+function __setup_read_row($fd, $format)
+{
+    if ($format == 'csv') {
+        $row = fgetcsv($fd, null, ',', '"', '');
+        return is_array($row) ? $row : null;
+    }
+    $line = fgets($fd);
+    if ($line === false) {
+        return null;
+    }
+    $row = explode("\t", rtrim($line, "\n"));
+    foreach ($row as $key => $val) {
+        $row[$key] = strtr($val, ['\\\\' => '\\', '\\t' => "\t", '\\n' => "\n", '\\r' => "\r"]);
+    }
+    return $row;
+}
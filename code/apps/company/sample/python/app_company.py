@@ -1,4 +1,8 @@
-import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, open_sample, write_manifest
 
 record = (
     1,
@@ -20,31 +24,37 @@ record = (
     'Entidad acogida al régimen general del IVA'
 )
 
-with gzip.open('app_company.sql.gz', 'wt', encoding='utf-8') as f:
-    f.write("INSERT INTO app_company (\n")
-    f.write("    id, active, name, code, address, city, province, zip, country,\n")
-    f.write("    phone, email, website, iban, swift,\n")
-    f.write("    fiscal_regime, activity_code, notes\n")
-    f.write(") VALUES\n")
+def main(args):
+    path = os.path.join(args.output, 'app_company.sql.gz')
+    with open_sample(path) as f:
+        f.write("INSERT INTO app_company (\n")
+        f.write("    id, active, name, code, address, city, province, zip, country,\n")
+        f.write("    phone, email, website, iban, swift,\n")
+        f.write("    fiscal_regime, activity_code, notes\n")
+        f.write(") VALUES\n")
+
+        values = "({}, {}, '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}');".format(
+            record[0],
+            record[1],
+            record[2].replace("'", "''"),
+            record[3].replace("'", "''"),
+            record[4].replace("'", "''"),
+            record[5].replace("'", "''"),
+            record[6].replace("'", "''"),
+            record[7].replace("'", "''"),
+            record[8].replace("'", "''"),
+            record[9].replace("'", "''"),
+            record[10].replace("'", "''"),
+            record[11].replace("'", "''"),
+            record[12].replace("'", "''"),
+            record[13].replace("'", "''"),
+            record[14].replace("'", "''"),
+            record[15].replace("'", "''"),
+            record[16].replace("'", "''")
+        )
 
-    values = "({}, {}, '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}', '{}');".format(
-        record[0],
-        record[1],
-        record[2].replace("'", "''"),
-        record[3].replace("'", "''"),
-        record[4].replace("'", "''"),
-        record[5].replace("'", "''"),
-        record[6].replace("'", "''"),
-        record[7].replace("'", "''"),
-        record[8].replace("'", "''"),
-        record[9].replace("'", "''"),
-        record[10].replace("'", "''"),
-        record[11].replace("'", "''"),
-        record[12].replace("'", "''"),
-        record[13].replace("'", "''"),
-        record[14].replace("'", "''"),
-        record[15].replace("'", "''"),
-        record[16].replace("'", "''")
-    )
+        f.write(values + "\n")
+    write_manifest([path], __file__)
 
-    f.write(values + "\n")
+if __name__ == "__main__":
+    main(parse_args("Generate the app_company sample data"))
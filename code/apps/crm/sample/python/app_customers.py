@@ -1,39 +1,40 @@
-import gzip
-import random
-from faker import Faker
-from pathlib import Path
+import os
+import sys
 
-def generar_cif():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, scaled, table_rows, sample, generate, fkeys
+
+HEADER = "INSERT INTO `app_customers` (`id`, `active`, `name`, `address`, `city`, `province`, `zip`, `country`, `code`, `email`, `phone`, `website`, `notes`, `type_id`) VALUES\n"
+
+def generar_cif(nrng, count):
     letras = "ABCDEFGHJNPQRSUVW"
-    letra = random.choice(letras)
-    numero = random.randint(1000000, 9999999)
-    digito = random.randint(0, 9)
-    return f"{letra}{numero}{digito}"
+    letra = nrng.integers(0, len(letras), count).tolist()
+    numero = nrng.integers(1000000, 10000000, count).tolist()
+    digito = nrng.integers(0, 10, count).tolist()
+    return [f"{letras[l]}{n}{d}" for l, n, d in zip(letra, numero, digito)]
+
+def app_customers_block(rng, nrng, fake, args, first, last, ids, data):
+    count = last - first
+    columns = zip(
+        range(first, last),
+        nrng.integers(0, 2, count).tolist(),
+        sample(args, nrng, "company", count),
+        sample(args, nrng, "street_address", count),
+        sample(args, nrng, "city", count),
+        sample(args, nrng, "state", count),
+        sample(args, nrng, "postcode", count),
+        sample(args, nrng, "country", count),
+        generar_cif(nrng, count),
+        sample(args, nrng, "company_email", count),
+        sample(args, nrng, "phone_number", count),
+        [f"https://{website}" for website in sample(args, nrng, "domain_name", count)],
+        sample(args, nrng, "catch_phrase", count),
+        fkeys(args, nrng, "app_customers.type_id", table_rows("app_customers_types", args.scale), count).tolist(),
+    )
+    return [list(columns)]
 
-def generate_app_customers_sql_gz():
-    path = Path("app_customers.sql.gz")
-    fake = Faker()
-    sql = "INSERT INTO `app_customers` (`id`, `active`, `name`, `address`, `city`, `province`, `zip`, `country`, `code`, `email`, `phone`, `website`, `notes`, `type_id`) VALUES\n"
-    rows = []
-    for i in range(1, 101):
-        active = random.randint(0, 1)
-        name = fake.company().replace("'", "''")
-        address = fake.street_address().replace("'", "''")
-        city = fake.city()
-        province = fake.state()
-        zip_code = fake.postcode()
-        country = fake.country().replace("'", "''")
-        code = generar_cif()
-        email = fake.company_email()
-        phone = fake.phone_number()
-        website = f"https://{fake.domain_name()}"
-        notes = fake.catch_phrase().replace("'", "''")
-        type_id = random.randint(1, 3)
-        row = f"({i}, {active}, '{name}', '{address}', '{city}', '{province}', '{zip_code}', '{country}', '{code}', '{email}', '{phone}', '{website}', '{notes}', {type_id})"
-        rows.append(row)
-    sql += ",\n".join(rows) + ";"
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        f.write(sql)
-    return path
+def main(args):
+    generate(args, "app_customers", [("app_customers.sql.gz", HEADER)], scaled(100, args.scale), app_customers_block, block=True)
 
-generate_app_customers_sql_gz()
+if __name__ == "__main__":
+    main(parse_args("Generate the app_customers sample data"))
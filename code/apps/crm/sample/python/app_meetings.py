@@ -1,58 +1,45 @@
-import gzip
-import random
-from faker import Faker
-from pathlib import Path
-from datetime import timedelta
-
-def generate_app_meetings_sql_gz():
-    path = Path("app_meetings.sql.gz")
-    fake = Faker()
-    sql = (
-        "INSERT INTO `app_meetings` "
-        "(`id`, `start_time`, `end_time`, `title`, `location`, `participants`, "
-        "`agenda`, `topics_approved`, `topics_rejected`, `topics_pending`, `customer_id`) VALUES\n"
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, scaled, table_rows, ref_date, sample, sample_joined, generate, fkeys, seconds
+
+HEADER = (
+    "INSERT INTO `app_meetings` "
+    "(`id`, `start_time`, `end_time`, `title`, `location`, `participants`, "
+    "`agenda`, `topics_approved`, `topics_rejected`, `topics_pending`, `customer_id`) VALUES\n"
+)
+
+def fake_paragraphs(args, nrng, count, min_paragraphs=1, max_paragraphs=4):
+    return sample_joined(args, nrng, "paragraph", min_paragraphs, max_paragraphs, "\n\n", count)
+
+def app_meetings_block(rng, nrng, fake, args, first, last, ids, data):
+    count = last - first
+    # Inicio en el último año antes de la fecha de referencia
+    origin = datetime.combine(ref_date(args, -365), datetime.min.time())
+    start_seconds = seconds(args, nrng, "app_meetings.start_time", 365, count).tolist()
+    duration_minutes = nrng.choice([30, 45, 60, 90, 120], count).tolist()
+    start_dt = [origin + timedelta(seconds=seconds) for seconds in start_seconds]
+    end_dt = [start + timedelta(minutes=minutes) for start, minutes in zip(start_dt, duration_minutes)]
+
+    columns = zip(
+        range(first, last),
+        [start.strftime("%Y-%m-%d %H:%M:%S") for start in start_dt],
+        [end.strftime("%Y-%m-%d %H:%M:%S") for end in end_dt],
+        sample(args, nrng, "catch_phrase", count),
+        sample(args, nrng, "city", count),
+        sample_joined(args, nrng, "name", 2, 5, "\n", count),
+        fake_paragraphs(args, nrng, count),
+        fake_paragraphs(args, nrng, count),
+        fake_paragraphs(args, nrng, count),
+        fake_paragraphs(args, nrng, count),
+        fkeys(args, nrng, "app_meetings.customer_id", table_rows("app_customers", args.scale), count).tolist(),
     )
-    rows = []
-
-    for i in range(1, 101):
-        start_dt = fake.date_time_between(start_date='-1y', end_date='now')
-        duration_minutes = random.choice([30, 45, 60, 90, 120])
-        end_dt = start_dt + timedelta(minutes=duration_minutes)
-
-        start_time = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-        end_time = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-        title = fake.catch_phrase().replace("'", "''")
-        location = fake.city().replace("'", "''")
-
-        participants = "\n".join(
-            fake.name().replace("'", "''")
-            for _ in range(random.randint(2, 5))
-        )
-
-        def fake_paragraphs(min_paragraphs=1, max_paragraphs=4):
-            return "\n\n".join(
-                fake.paragraph().replace("'", "''")
-                for _ in range(random.randint(min_paragraphs, max_paragraphs))
-            )
-
-        agenda = fake_paragraphs()
-        topics_approved = fake_paragraphs()
-        topics_rejected = fake_paragraphs()
-        topics_pending = fake_paragraphs()
-        customer_id = random.randint(1, 100)
-
-        row = (
-            f"({i}, '{start_time}', '{end_time}', '{title}', '{location}', "
-            f"'{participants}', '{agenda}', '{topics_approved}', "
-            f"'{topics_rejected}', '{topics_pending}', {customer_id})"
-        )
-        rows.append(row)
-
-    sql += ",\n".join(rows) + ";\n"
-
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        f.write(sql)
+    return [list(columns)]
 
-    return path
+def main(args):
+    generate(args, "app_meetings", [("app_meetings.sql.gz", HEADER)], scaled(100, args.scale), app_meetings_block, block=True)
 
-generate_app_meetings_sql_gz()
+if __name__ == "__main__":
+    main(parse_args("Generate the app_meetings sample data"))
@@ -1,12 +1,9 @@
 import os
-import random
-import gzip
-from datetime import timedelta
-from faker import Faker
+import sys
+import numpy
 
-fake = Faker()
-random.seed(42)
-Faker.seed(42)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, scaled, table_rows, ref_date, sample, generate, document_shape, document_lines, fkeys, ages
 
 # --- Definición de impuestos ---
 taxes = [
@@ -16,55 +13,54 @@ taxes = [
     {"id": 4, "name": "Exempt / Not subject", "value": 0.00},
 ]
 
-# --- Parámetros iniciales ---
-n_quotes = 100
-quote_rows = []
-line_rows = []
-tax_rows = []
+# --- Letras de los CIF ---
+letras = "ABCDEFGHJNPQRSUVW"
 
-quote_id_seq = 1
-line_id_seq = 1
-tax_id_seq = 1
+# --- Ficheros de salida ---
+tables = [
+    ("app_quotes.sql.gz", "INSERT INTO app_quotes VALUES\n"),
+    ("app_quotes_lines.sql.gz", "INSERT INTO app_quotes_lines VALUES\n"),
+    ("app_quotes_taxes.sql.gz", "INSERT INTO app_quotes_taxes VALUES\n"),
+]
 
 # --- Funciones auxiliares ---
 def gen_quote_code(prefix, year, number):
     return f"{prefix}{year}-{number:04d}"
 
-def escape_sql_text(text):
-    return text.replace("'", "''")
-
-def safe_sql_str(s):
-    return f"'{escape_sql_text(s)}'" if s else "''"
-
-def safe_sql_date(d):
-    return f"'{d.strftime('%Y-%m-%d')}'" if d else "'0000-00-00'"
-
-def random_discount():
-    return random.choices([0, 5, 10, 15, 20, 25], weights=[70, 10, 8, 6, 4, 2])[0]
+def safe_date(d):
+    return d if d else "0000-00-00"
 
-def save_sql_gz(table_name, values, output_dir="."):
-    sql = f"INSERT INTO app_{table_name} VALUES\n" + ",\n".join(values) + ";\n"
-    path = os.path.join(output_dir, f"app_{table_name}.sql.gz")
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        f.write(sql)
-    return path
-
-def generar_cif():
-    letras = "ABCDEFGHJNPQRSUVW"
-    letra = random.choice(letras)
-    numero = random.randint(1000000, 9999999)
-    digito = random.randint(0, 9)
-    return f"{letra}{numero}{digito}"
+# --- Forma de cada bloque de presupuestos: líneas e impuestos ---
+def quote_shape(nrng, args, first, last):
+    n_lines, line_tax, present = document_shape(nrng, last - first, len(taxes))
+    return (last - first, len(line_tax), int(present.sum())), (n_lines, line_tax, present)
 
 # --- Generador de datos ---
-for i in range(n_quotes):
-    year = 2025
+def quote_block(rng, nrng, fake, args, first, last, ids, data):
+    quote_id_seq, line_id_seq, tax_id_seq = ids
+    n_lines, line_tax, present = data
+    count = last - first
+    lines = document_lines(nrng, n_lines, line_tax, [tax["value"] for tax in taxes])
 
-    code = gen_quote_code("Q", year, i + 1)
-    date = fake.date_between(start_date='-60d', end_date='today')
-    valid_until = date + timedelta(days=random.choice([15, 30, 45]))
-    payment_method_id = random.randint(1, 12)
-    status_id = random.randint(1, 5)
+    year = 2025
+    # Fechas como días respecto a la fecha de referencia
+    quote_day = -ages(args, nrng, "app_quotes.date", 60, count)
+    valid_day = quote_day + nrng.choice([15, 30, 45], count)
+    days = {day: ref_date(args, day).isoformat() for day in range(-60, 46)}
+    payment_method_id = fkeys(args, nrng, "app_quotes.payment_method_id", table_rows("app_payment_methods", args.scale), count)
+    status_id = fkeys(args, nrng, "app_quotes.status_id", table_rows("app_quotes_status", args.scale), count)
+    customer_id = fkeys(args, nrng, "app_quotes.customer_id", table_rows("app_customers", args.scale), count)
+    cif_letter = nrng.integers(0, len(letras), count)
+    cif_number = nrng.integers(1000000, 10000000, count)
+    cif_digit = nrng.integers(0, 10, count)
+
+    customer_name = sample(args, nrng, "company", count)
+    customer_address = [address.replace("\n", ", ") for address in sample(args, nrng, "address", count)]
+    customer_city = sample(args, nrng, "city", count)
+    customer_province = sample(args, nrng, "state", count)
+    customer_zip = sample(args, nrng, "postcode", count)
+    customer_country = sample(args, nrng, "country", count)
+    description = sample(args, nrng, "paragraph", count)
 
     company_id = 1
     company_name = 'SaltOS Solutions SL'
@@ -75,63 +71,49 @@ for i in range(n_quotes):
     company_zip = '08001'
     company_country = 'Spain'
 
-    customer_name = escape_sql_text(fake.company())
-    customer_address = escape_sql_text(fake.address().replace("\n", ", "))
-    customer_city = escape_sql_text(fake.city())
-    customer_province = fake.state()
-    customer_zip = escape_sql_text(fake.postcode())
-    customer_country = escape_sql_text(fake.country())
-    customer_code = generar_cif()
-    customer_id = random.randint(1, 50)
-    description = escape_sql_text(fake.paragraph())
-
-    n_lines = int(random.random() ** 2 * 49) + 1
-    subtotal = 0
-    tax_buckets = {}
-
-    for _ in range(n_lines):
-        quantity = round(random.uniform(1, 10), 2)
-        price = round(random.uniform(10, 200), 2)
-        discount = random_discount()
-        tax = random.choice(taxes)
-        base_total = round(quantity * price * (1 - discount / 100), 2)
-
-        line_rows.append(f"({line_id_seq},{quote_id_seq},0,"
-                         f"{safe_sql_str(fake.bs())},{quantity},{price},{discount},"
-                         f"{tax['id']},{tax['value']},{base_total})")
-        line_id_seq += 1
-        subtotal += base_total
-
-        if tax['id'] not in tax_buckets:
-            tax_buckets[tax['id']] = {"tax_name": tax["name"], "tax_value": tax["value"], "base": 0.0}
-        tax_buckets[tax['id']]["base"] += base_total
-
-    total_tax = 0.0
-    for tax_id, data in tax_buckets.items():
-        base = round(data["base"], 2)
-        tax_amount = round(base * data["tax_value"] / 100, 2)
-        total_tax += tax_amount
-        tax_rows.append(f"({tax_id_seq},{quote_id_seq},{tax_id},'{escape_sql_text(data['tax_name'])}',"
-                        f"{data['tax_value']},{base},{tax_amount})")
-        tax_id_seq += 1
-
-    total = round(subtotal + total_tax, 2)
-
-    quote_rows.append(
-        f"({quote_id_seq},"
-        f"'{code}',"
-        f"{safe_sql_date(date)},"
-        f"{company_id},'{company_name}','{company_address}','{company_city}',"
-        f"'{company_province}','{company_zip}','{company_country}','{company_code}',"
-        f"{customer_id},'{customer_name}','{customer_address}','{customer_city}',"
-        f"'{customer_province}','{customer_zip}','{customer_country}','{customer_code}',"
-        f"'{description}',{subtotal},{total_tax},{total},"
-        f"{payment_method_id},{safe_sql_date(valid_until)},"
-        f"{status_id})"
-    )
-    quote_id_seq += 1
-
-# --- Guardar ficheros ---
-save_sql_gz("quotes", quote_rows)
-save_sql_gz("quotes_lines", line_rows)
-save_sql_gz("quotes_taxes", tax_rows)
+    # Columnas numéricas como listas de Python para formatear las filas
+    line_quote = (quote_id_seq + numpy.repeat(numpy.arange(count), n_lines)).tolist()
+    line_tax_id = [taxes[tax]["id"] for tax in line_tax.tolist()]
+    line_tax_value = [taxes[tax]["value"] for tax in line_tax.tolist()]
+    line_rows = [
+        (line_id_seq + j, quote_id, 0, line_description, quantity, price, discount, tax_id, tax_value, base_total)
+        for j, (quote_id, line_description, quantity, price, discount, tax_id, tax_value, base_total) in enumerate(zip(
+            line_quote, sample(args, nrng, "bs", len(line_tax)), lines["quantity"].tolist(), lines["price"].tolist(), lines["discount"].tolist(),
+            line_tax_id, line_tax_value, lines["base_total"].tolist()))
+    ]
+
+    doc, tax = numpy.nonzero(present)
+    tax_rows = [
+        (tax_id_seq + j, quote_id_seq + d, taxes[t]["id"], taxes[t]["name"], taxes[t]["value"], base, tax_amount)
+        for j, (d, t, base, tax_amount) in enumerate(zip(
+            doc.tolist(), tax.tolist(), lines["base"][doc, tax].tolist(), lines["amount"][doc, tax].tolist()))
+    ]
+
+    quote_rows = []
+    for d, (date, valid_until, method, status, customer, letter, number, digit, subtotal, total_tax, total) in enumerate(zip(
+            quote_day.tolist(), valid_day.tolist(), payment_method_id.tolist(), status_id.tolist(),
+            customer_id.tolist(), cif_letter.tolist(), cif_number.tolist(), cif_digit.tolist(),
+            lines["subtotal"].tolist(), lines["total_tax"].tolist(), lines["total"].tolist())):
+        code = gen_quote_code("Q", year, first + d)
+
+        customer_code = f"{letras[letter]}{number}{digit}"
+
+        quote_rows.append((
+            quote_id_seq + d,
+            code,
+            safe_date(days[date]),
+            company_id, company_name, company_address, company_city,
+            company_province, company_zip, company_country, company_code,
+            customer, customer_name[d], customer_address[d], customer_city[d],
+            customer_province[d], customer_zip[d], customer_country[d], customer_code,
+            description[d], subtotal, total_tax, total,
+            method, safe_date(days[valid_until]),
+            status,
+        ))
+    return quote_rows, line_rows, tax_rows
+
+def main(args):
+    generate(args, "app_quotes", tables, scaled(100, args.scale), quote_block, quote_shape, block=True)
+
+if __name__ == "__main__":
+    main(parse_args("Generate the app_quotes, app_quotes_lines and app_quotes_taxes sample data"))
@@ -1,15 +1,19 @@
-from fpdf import FPDF
-from PIL import Image, ImageDraw, ImageFont
 import os
+import sys
 
-# Crear carpetas para imágenes y PDFs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args
+
+# PIL y fpdf se importan al crear los ficheros, así sampleall.py puede
+# importar este generador para leer las opciones sin estas librerías
+
+# Carpetas para imágenes y PDFs, dentro del directorio de la caché
 image_directory = 'generated_images'
 pdf_directory = 'generated_pdfs'
-os.makedirs(image_directory, exist_ok=True)
-os.makedirs(pdf_directory, exist_ok=True)
 
 # Crear imágenes
 def create_image_with_text(text, filename):
+    from PIL import Image, ImageDraw, ImageFont
     img = Image.new('RGB', (200, 100), color=(73, 109, 137))
     d = ImageDraw.Draw(img)
     try:
@@ -21,11 +25,10 @@ def create_image_with_text(text, filename):
     d.text((x, y), text, font=font, fill=(255, 255, 0))
     img.save(os.path.join(image_directory, filename))
 
-for i in range(5):
-    create_image_with_text(f'Image {i+1}', f'image_{i+1}.jpg')
 
 # Crear PDFs
 def create_pdf_with_text(filename):
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
@@ -34,5 +37,16 @@ def create_pdf_with_text(filename):
         pdf.multi_cell(0, 10, text)
     pdf.output(os.path.join(pdf_directory, filename))
 
-for i in range(5):
-    create_pdf_with_text(f'document_{i+1}.pdf')
+def main(args):
+    global image_directory, pdf_directory
+    image_directory = os.path.join(args.cache, 'generated_images')
+    pdf_directory = os.path.join(args.cache, 'generated_pdfs')
+    os.makedirs(image_directory, exist_ok=True)
+    os.makedirs(pdf_directory, exist_ok=True)
+    for i in range(5):
+        create_image_with_text(f'Image {i+1}', f'image_{i+1}.jpg')
+    for i in range(5):
+        create_pdf_with_text(f'document_{i+1}.pdf')
+
+if __name__ == "__main__":
+    main(parse_args("Generate the images and PDFs attached to the sample emails"))
@@ -1,7 +1,8 @@
 import os
-import random
+import sys
+import re
 import gzip
-import shutil
+from multiprocessing import Pool
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
@@ -13,11 +14,8 @@ import datetime
 from email import charset
 charset.add_charset('utf-8', charset.SHORTEST, charset.QP)
 
-# === Directorios ===
-image_directory = 'generated_images'
-pdf_directory = 'generated_pdfs'
-gzip_directory = 'emails_gzip'
-os.makedirs(gzip_directory, exist_ok=True)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import COMPRESSLEVEL, parse_args, scaled, shard_random
 
 # === Datos base ===
 personal_messages = [
@@ -31,69 +29,177 @@ business_messages = [
     "Attached is the revised proposal for the client. Please review before our call."
 ]
 
-def generate_realistic_paragraph():
+topics = ["project", "invoice", "meeting", "proposal", "report", "budget", "trip", "weekend"]
+
+# Buzones de las conversaciones, los primeros son los de siempre
+default_mailboxes = [
+    "alice@example.com", "bob@example.com", "diana@example.com", "eve@example.com",
+    "jane.doe@business.com", "manager@business.com", "ceo@business.com", "it.support@business.com",
+]
+
+def mailbox_list(count):
+    extra = [f"user{i:05d}@{'example.com' if i % 2 else 'business.com'}" for i in range(1, count - len(default_mailboxes) + 1)]
+    return (default_mailboxes + extra)[:count]
+
+def generate_realistic_paragraph(rng):
     samples = personal_messages + business_messages
-    return " ".join(random.choices(samples, k=random.randint(10, 20))) + "."
+    return " ".join(rng.choices(samples, k=rng.randint(10, 20))) + "."
+
+# === Árbol de una conversación: padre y profundidad de cada email, en orden ===
+def conversation(rng, args, size):
+    # Cada email por debajo de la profundidad máxima tiene entre 1 y fanout
+    # respuestas con probabilidad 0.8, y el árbol se corta en size emails
+    tree = [(None, 0)]
+    node = 0
+    while node < len(tree) and len(tree) < size:
+        depth = tree[node][1]
+        if depth < args.thread_depth and rng.random() < 0.8:
+            for _ in range(rng.randint(1, args.thread_fanout)):
+                tree.append((node, depth + 1))
+        node += 1
+    return tree[:size]
+
+# === Adjuntos generados por step1.py en la caché, cargados una vez por proceso ===
+_attachments = None
+
+def attachments(args):
+    # Las partes MIME ya codificadas en base64 se comparten entre los emails
+    global _attachments
+    if _attachments is None:
+        images = []
+        image_directory = os.path.join(args.cache, 'generated_images')
+        for img_file in sorted(os.listdir(image_directory)):
+            with open(os.path.join(image_directory, img_file), "rb") as f:
+                img = MIMEImage(f.read())
+            img.add_header('Content-Disposition', 'attachment', filename=img_file)
+            images.append(img)
+        pdfs = []
+        pdf_directory = os.path.join(args.cache, 'generated_pdfs')
+        for pdf_file in sorted(os.listdir(pdf_directory)):
+            with open(os.path.join(pdf_directory, pdf_file), "rb") as f:
+                pdf = MIMEApplication(f.read(), _subtype="pdf")
+            pdf.add_header('Content-Disposition', 'attachment', filename=pdf_file)
+            pdfs.append(pdf)
+        _attachments = images, pdfs
+    return _attachments
 
 # === Crear email ===
-def create_email_with_attachments(index):
+# Devuelve el email y sus datos, que usan las respuestas (parent)
+def create_email_with_attachments(rng, args, index, images, pdfs, mailboxes, parent=None):
     msg = MIMEMultipart("alternative")
-
-    # Cabeceras
-    if index % 2 == 0:
-        sender = f"{random.choice(['alice', 'bob'])}@example.com"
-        recipient = f"{random.choice(['diana', 'eve'])}@example.com"
-        subject = "Catching Up"
+    # Boundary del generador del shard, como el que crearía el módulo email
+    msg.set_boundary("=" * 15 + f"{rng.randrange(sys.maxsize):019d}" + "==")
+
+    # Cabeceras, las respuestas van del destinatario al remitente del padre
+    if parent:
+        sender, recipient = parent["to"], parent["from"]
+        subject = parent["subject"] if parent["subject"].startswith("Re: ") else "Re: " + parent["subject"]
+        # Respuesta entre 5 minutos y unos días después, 4 horas de media
+        email_date = parent["date"] + datetime.timedelta(seconds=300 + int(rng.expovariate(1 / 14400)))
     else:
-        sender = f"{random.choice(['jane.doe', 'manager'])}@business.com"
-        recipient = f"{random.choice(['ceo', 'it.support'])}@business.com"
-        subject = "Business Update"
-
+        sender, recipient = rng.sample(mailboxes, 2)
+        subject = "Catching Up" if index % 2 == 0 else "Business Update"
+        if args.thread_depth:
+            subject += f": {rng.choice(topics)}"
+        base_date = datetime.datetime(2024, 1, 1, 8, 0, 0)
+        email_date = base_date + datetime.timedelta(minutes=10 * index)
+
+    domain = sender.split("@")[1]
+    message_id = f"<email-{index:08d}.{args.seed}@{domain}>"
     msg['From'] = sender
     msg['To'] = recipient
     msg['Subject'] = subject
-
-    base_date = datetime.datetime(2024, 1, 1, 8, 0, 0)
-    email_date = base_date + datetime.timedelta(minutes=10 * index)
     msg['Date'] = format_datetime(email_date)
-
-    # Cuerpo (sin codificación forzada, charset=utf-8)
-    n_paragraphs = random.randint(1, 6)
-    body_plain = "\n\n".join(generate_realistic_paragraph() for _ in range(n_paragraphs))
-    body_html = "<html><body>" + "".join(f"<p>{generate_realistic_paragraph()}</p>" for _ in range(n_paragraphs)) + "</body></html>"
+    msg['Message-ID'] = message_id
+    references = []
+    if parent:
+        references = parent["references"] + [parent["message_id"]]
+        msg['In-Reply-To'] = parent["message_id"]
+        msg['References'] = " ".join(references)
+
+    # Cuerpo (sin codificación forzada, charset=utf-8), las respuestas citan al padre
+    n_paragraphs = rng.randint(1, 6)
+    body_plain = "\n\n".join(generate_realistic_paragraph(rng) for _ in range(n_paragraphs))
+    body_html = "".join(f"<p>{generate_realistic_paragraph(rng)}</p>" for _ in range(n_paragraphs))
+    if parent:
+        quoted = "\n".join(f"> {line}" if line else ">" for line in parent["plain"].split("\n"))
+        body_plain += f"\n\nOn {format_datetime(parent['date'])}, {parent['from']} wrote:\n{quoted}"
+        body_html += f"<p>On {format_datetime(parent['date'])}, {parent['from']} wrote:</p><blockquote>{parent['html']}</blockquote>"
 
     part_plain = MIMEText(body_plain, "plain", _charset="utf-8")
-    part_html = MIMEText(body_html, "html", _charset="utf-8")
+    part_html = MIMEText(f"<html><body>{body_html}</body></html>", "html", _charset="utf-8")
 
     msg.attach(part_plain)
     msg.attach(part_html)
 
-    # Adjuntos (se codifican en base64 automáticamente)
-    if random.choice([True, False]):
-        if random.choice([True, False]):
-            img_file = random.choice(os.listdir(image_directory))
-            with open(os.path.join(image_directory, img_file), "rb") as f:
-                img = MIMEImage(f.read())
-                img.add_header('Content-Disposition', 'attachment', filename=img_file)
-                msg.attach(img)
+    # Adjuntos del pool (ya codificados en base64), solo al iniciar la conversación
+    if not parent and rng.choice([True, False]):
+        if rng.choice([True, False]):
+            msg.attach(rng.choice(images))
         else:
-            pdf_file = random.choice(os.listdir(pdf_directory))
-            with open(os.path.join(pdf_directory, pdf_file), "rb") as f:
-                pdf = MIMEApplication(f.read(), _subtype="pdf")
-                pdf.add_header('Content-Disposition', 'attachment', filename=pdf_file)
-                msg.attach(pdf)
-
-    # Guardar como .eml y comprimir
-    eml_path = os.path.join(gzip_directory, f"email_{index:04d}.eml")
-    with open(eml_path, "wb") as f:
-        f.write(msg.as_bytes())
-
-    with open(eml_path, "rb") as f_in:
-        with gzip.open(eml_path + ".gz", "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
-
-    os.remove(eml_path)
+            msg.attach(rng.choice(pdfs))
+
+    return msg, {
+        "from": sender,
+        "to": recipient,
+        "subject": subject,
+        "date": email_date,
+        "message_id": message_id,
+        "references": references,
+        "plain": body_plain,
+        "html": body_html,
+    }
+
+# === Generar los emails de un shard directamente como .eml.gz ===
+def create_shard(task):
+    args, shard, first, last = task
+    rng = shard_random("emails", args.seed, shard)
+    images, pdfs = attachments(args)
+    mailboxes = mailbox_list(args.mailboxes)
+    index = first
+    # Conversaciones completas dentro del shard, la última se corta al final
+    while index < last:
+        emails = []
+        for parent, _ in conversation(rng, args, last - index):
+            msg, data = create_email_with_attachments(
+                rng, args, index, images, pdfs, mailboxes, emails[parent] if parent is not None else None)
+            emails.append(data)
+            with open(os.path.join(args.output, f"email_{index:04d}.eml.gz"), "wb") as f:
+                f.write(gzip.compress(msg.as_bytes(), COMPRESSLEVEL, mtime=0))
+            index += 1
+
+# === Opciones de las conversaciones ===
+def options(parser):
+    parser.add_argument("--thread-depth", type=int, default=3,
+                        help="Max depth of the replies of the conversations of the emails, 0 for standalone emails")
+    parser.add_argument("--thread-fanout", type=int, default=2, help="Max replies to each email of the conversations")
+    parser.add_argument("--mailboxes", type=int, default=8, help="Addresses that take part in the conversations of the emails")
+
+# === Opciones del script solo, sin sampleall.py ===
+def standalone(parser):
+    options(parser)
+    # Sin --output los emails se escriben en emails_gzip como antes
+    parser.set_defaults(output="emails_gzip")
 
 # === Ejecutar ===
-for i in range(1, 101):
-    create_email_with_attachments(i)
+def main(args):
+    if args.thread_depth < 0 or args.thread_fanout < 1 or args.mailboxes < 2:
+        sys.exit("--thread-depth must be positive or zero, --thread-fanout positive and --mailboxes at least 2")
+    # 100 emails por cada unidad de escala, en shards repartidos entre los procesos
+    count = scaled(100, args.scale)
+    tasks = [(args, shard, first, min(first + args.shard, count + 1))
+             for shard, first in enumerate(range(1, count + 1, args.shard))]
+    pool = Pool(args.jobs) if args.jobs > 1 else None
+    list((pool.imap if pool else map)(create_shard, tasks))
+    if pool:
+        pool.close()
+        pool.join()
+    # Borrar los emails de una ejecución anterior más grande, solo los
+    # nombres que escribe este script
+    for file in os.listdir(args.output):
+        match = re.fullmatch(r"email_(\d{4,})\.eml\.gz", file)
+        if match and int(match.group(1)) > count:
+            os.remove(os.path.join(args.output, file))
+
+if __name__ == "__main__":
+    main(parse_args("Generate the sample emails", standalone))
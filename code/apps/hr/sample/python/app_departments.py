@@ -1,24 +1,21 @@
-import gzip
-from faker import Faker
-from pathlib import Path
-import random
+import os
+import sys
 
-def generate_app_departments_sql_gz():
-    path = Path("app_departments.sql.gz")
-    fake = Faker()
-    sql = "INSERT INTO `app_departments` (`id`, `active`, `name`, `code`, `parent_id`, `notes`) VALUES\n"
-    rows = []
-    for i in range(1, 101):
-        active = random.randint(0, 1);
-        name = fake.job().replace("'", "''")
-        code = f"DPT-{i:04d}"
-        parent_id = random.choice([0] + list(range(1, i))) if i > 1 else 0
-        notes = fake.sentence(nb_words=6).replace("'", "''")
-        row = f"({i}, {active}, '{name}', '{code}', {parent_id}, '{notes}')"
-        rows.append(row)
-    sql += ",\n".join(rows) + ";"
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        f.write(sql)
-    return path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, scaled, generate
 
-generate_app_departments_sql_gz()
+HEADER = "INSERT INTO `app_departments` (`id`, `active`, `name`, `code`, `parent_id`, `notes`) VALUES\n"
+
+def app_departments_row(rng, fake, args, i):
+    active = rng.randint(0, 1);
+    name = fake.job()
+    code = f"DPT-{i:04d}"
+    parent_id = rng.randint(0, i - 1)
+    notes = fake.sentence(nb_words=6)
+    return (i, active, name, code, parent_id, notes)
+
+def main(args):
+    generate(args, "app_departments", [("app_departments.sql.gz", HEADER)], scaled(100, args.scale), app_departments_row)
+
+if __name__ == "__main__":
+    main(parse_args("Generate the app_departments sample data"))
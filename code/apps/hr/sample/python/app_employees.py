@@ -1,48 +1,44 @@
-import gzip
-import random
-from faker import Faker
-from pathlib import Path
-from datetime import date as dt_date
+import os
+import sys
 
-def generar_nif():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, scaled, table_rows, ref_date, days_window, generate
+
+HEADER = "INSERT INTO `app_employees` (`id`, `active`, `name`, `address`, `city`, `province`, `zip`, `country`, `code`, `email`, `phone`, `department_id`, `job_title`, `start_date`, `end_date`, `type_id`, `notes`, `user_id`) VALUES\n"
+
+def generar_nif(rng):
     letras = "TRWAGMYFPDXBNJZSQVHLCKE"
-    numero = random.randint(10000000, 99999999)
+    numero = rng.randint(10000000, 99999999)
     letra = letras[numero % 23]
     return f"{numero}{letra}"
 
-def generate_app_employees_sql_gz():
-    path = Path("app_employees.sql.gz")
-    fake = Faker()
-    sql = "INSERT INTO `app_employees` (`id`, `active`, `name`, `address`, `city`, `province`, `zip`, `country`, `code`, `email`, `phone`, `department_id`, `job_title`, `start_date`, `end_date`, `type_id`, `notes`, `user_id`) VALUES\n"
-    rows = []
-    for i in range(1, 101):
-        active = random.randint(0, 1);
-        name = fake.name().replace("'", "''")
-        address = fake.street_address().replace("'", "''")
-        city = fake.city()
-        province = fake.state()
-        zip_code = fake.postcode()
-        country = fake.country().replace("'", "''")
-        code = generar_nif()
-        email = fake.email()
-        phone = fake.phone_number()
-        department_id = random.randint(1, 20)
-        job_title = fake.job().replace("'", "''")
-        start_date_obj = fake.date_between(start_date='-5y', end_date='-1y')
-        start_date = start_date_obj.isoformat()
-        if random.random() > 0.1:
-            end_date = "'0000-00-00'"
-        else:
-            end_date_val = fake.date_between(start_date=start_date_obj, end_date='today').isoformat()
-            end_date = f"'{end_date_val}'"
-        type_id = random.randint(1, 3)
-        notes = fake.sentence(nb_words=8).replace("'", "''")
-        user_id = 1
-        row = f"({i}, {active}, '{name}', '{address}', '{city}', '{province}', '{zip_code}', '{country}', '{code}', '{email}', '{phone}', {department_id}, '{job_title}', '{start_date}', {end_date}, {type_id}, '{notes}', {user_id})"
-        rows.append(row)
-    sql += ",\n".join(rows) + ";"
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        f.write(sql)
-    return path
+def app_employees_row(rng, fake, args, i):
+    active = rng.randint(0, 1);
+    name = fake.name()
+    address = fake.street_address()
+    city = fake.city()
+    province = fake.state()
+    zip_code = fake.postcode()
+    country = fake.country()
+    code = generar_nif(rng)
+    email = fake.email()
+    phone = fake.phone_number()
+    department_id = rng.randint(1, table_rows("app_departments", args.scale))
+    job_title = fake.job()
+    low, high = days_window(args, -5 * 365, -365)
+    start_date_obj = fake.date_between(start_date=ref_date(args, low), end_date=ref_date(args, high))
+    start_date = start_date_obj.isoformat()
+    if rng.random() > 0.1:
+        end_date = "0000-00-00"
+    else:
+        end_date = fake.date_between(start_date=start_date_obj, end_date=ref_date(args)).isoformat()
+    type_id = rng.randint(1, table_rows("app_employees_types", args.scale))
+    notes = fake.sentence(nb_words=8)
+    user_id = 1
+    return (i, active, name, address, city, province, zip_code, country, code, email, phone, department_id, job_title, start_date, end_date, type_id, notes, user_id)
+
+def main(args):
+    generate(args, "app_employees", [("app_employees.sql.gz", HEADER)], scaled(100, args.scale), app_employees_row)
 
-generate_app_employees_sql_gz()
+if __name__ == "__main__":
+    main(parse_args("Generate the app_employees sample data"))
@@ -1,4 +1,8 @@
-import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, open_sample, write_manifest
 
 data = [
     (1, 1, 'Draft', 'Purchase not yet confirmed'),
@@ -13,15 +17,21 @@ data = [
     (10, 1, 'Other', 'Other status')
 ]
 
-with gzip.open('app_purchase_status.sql.gz', 'wt', encoding='utf-8') as f:
-    f.write("INSERT INTO app_purchase_status (id, active, name, description) VALUES\n")
-    for i, row in enumerate(data):
-        line = "({}, {}, '{}', '{}')".format(
-            row[0], row[1],
-            row[2].replace("'", "''"),
-            row[3].replace("'", "''")
-        )
-        if i < len(data) - 1:
-            line += ","
-        f.write(line + "\n")
-    f.write(";\n")
+def main(args):
+    path = os.path.join(args.output, 'app_purchase_status.sql.gz')
+    with open_sample(path) as f:
+        f.write("INSERT INTO app_purchase_status (id, active, name, description) VALUES\n")
+        for i, row in enumerate(data):
+            line = "({}, {}, '{}', '{}')".format(
+                row[0], row[1],
+                row[2].replace("'", "''"),
+                row[3].replace("'", "''")
+            )
+            if i < len(data) - 1:
+                line += ","
+            f.write(line + "\n")
+        f.write(";\n")
+    write_manifest([path], __file__)
+
+if __name__ == "__main__":
+    main(parse_args("Generate the app_purchase_status sample data"))
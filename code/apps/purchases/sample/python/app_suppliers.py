@@ -1,39 +1,36 @@
-import gzip
-from faker import Faker
-from pathlib import Path
-import random
+import os
+import sys
 
-def generar_cif():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, scaled, table_rows, generate
+
+HEADER = "INSERT INTO `app_suppliers` (`id`, `active`, `name`, `address`, `city`, `province`, `zip`, `country`, `code`, `email`, `phone`, `website`, `notes`, `type_id`) VALUES\n"
+
+def generar_cif(rng):
     letras = "ABCDEFGHJNPQRSUVW"
-    letra = random.choice(letras)
-    numero = random.randint(1000000, 9999999)
-    digito = random.randint(0, 9)
+    letra = rng.choice(letras)
+    numero = rng.randint(1000000, 9999999)
+    digito = rng.randint(0, 9)
     return f"{letra}{numero}{digito}"
 
-def generate_app_suppliers_sql_gz():
-    path = Path("app_suppliers.sql.gz")
-    fake = Faker()
-    sql = "INSERT INTO `app_suppliers` (`id`, `active`, `name`, `address`, `city`, `province`, `zip`, `country`, `code`, `email`, `phone`, `website`, `notes`, `type_id`) VALUES\n"
-    rows = []
-    for i in range(1, 101):
-        active = random.randint(0, 1)
-        name = fake.company().replace("'", "''")
-        address = fake.street_address().replace("'", "''")
-        city = fake.city()
-        province = fake.state()
-        zip_code = fake.postcode()
-        country = fake.country().replace("'", "''")
-        code = generar_cif()
-        email = fake.company_email()
-        phone = fake.phone_number()
-        website = f"https://{fake.domain_name()}"
-        notes = fake.catch_phrase().replace("'", "''")
-        type_id = random.randint(1, 3)
-        row = f"({i}, {active}, '{name}', '{address}', '{city}', '{province}', '{zip_code}', '{country}', '{code}', '{email}', '{phone}', '{website}', '{notes}', {type_id})"
-        rows.append(row)
-    sql += ",\n".join(rows) + ";"
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        f.write(sql)
-    return path
+def app_suppliers_row(rng, fake, args, i):
+    active = rng.randint(0, 1)
+    name = fake.company()
+    address = fake.street_address()
+    city = fake.city()
+    province = fake.state()
+    zip_code = fake.postcode()
+    country = fake.country()
+    code = generar_cif(rng)
+    email = fake.company_email()
+    phone = fake.phone_number()
+    website = f"https://{fake.domain_name()}"
+    notes = fake.catch_phrase()
+    type_id = rng.randint(1, table_rows("app_suppliers_types", args.scale))
+    return (i, active, name, address, city, province, zip_code, country, code, email, phone, website, notes, type_id)
+
+def main(args):
+    generate(args, "app_suppliers", [("app_suppliers.sql.gz", HEADER)], scaled(100, args.scale), app_suppliers_row)
 
-generate_app_suppliers_sql_gz()
+if __name__ == "__main__":
+    main(parse_args("Generate the app_suppliers sample data"))
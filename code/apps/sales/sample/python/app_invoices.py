@@ -1,12 +1,9 @@
 import os
-import random
-import gzip
-from datetime import timedelta
-from faker import Faker
+import sys
+import numpy
 
-fake = Faker()
-random.seed(42)
-Faker.seed(42)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, scaled, table_rows, ref_date, sample, generate, document_shape, document_lines, fkeys, ages
 
 # --- Definición de impuestos ---
 taxes = [
@@ -16,60 +13,58 @@ taxes = [
     {"id": 4, "name": "Exempt / Not subject", "value": 0.00},
 ]
 
-# --- Parámetros iniciales ---
-n_invoices = 100
-invoice_rows = []
-line_rows = []
-tax_rows = []
+# --- Letras de los CIF ---
+letras = "ABCDEFGHJNPQRSUVW"
 
-invoice_id_seq = 1
-line_id_seq = 1
-tax_id_seq = 1
+# --- Ficheros de salida ---
+tables = [
+    ("app_invoices.sql.gz", "INSERT INTO app_invoices VALUES\n"),
+    ("app_invoices_lines.sql.gz", "INSERT INTO app_invoices_lines VALUES\n"),
+    ("app_invoices_taxes.sql.gz", "INSERT INTO app_invoices_taxes VALUES\n"),
+]
 
 # --- Funciones auxiliares ---
 def gen_invoice_code(prefix, year, number):
     return f"{prefix}{year}-{number:04d}"
 
-def escape_sql_text(text):
-    return text.replace("'", "''")
-
-def safe_sql_str(s):
-    return f"'{escape_sql_text(s)}'" if s else "''"
-
-def safe_sql_date(d):
-    return f"'{d.strftime('%Y-%m-%d')}'" if d else "'0000-00-00'"
+def safe_date(d):
+    return d if d else "0000-00-00"
 
-def random_discount():
-    return random.choices([0, 5, 10, 15, 20, 25], weights=[70, 10, 8, 6, 4, 2])[0]
-
-def save_sql_gz(table_name, values, output_dir="."):
-    sql = f"INSERT INTO app_{table_name} VALUES\n" + ",\n".join(values) + ";\n"
-    path = os.path.join(output_dir, f"app_{table_name}.sql.gz")
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        f.write(sql)
-    return path
-
-def generar_cif():
-    letras = "ABCDEFGHJNPQRSUVW"
-    letra = random.choice(letras)
-    numero = random.randint(1000000, 9999999)
-    digito = random.randint(0, 9)
-    return f"{letra}{numero}{digito}"
+# --- Forma de cada bloque de facturas: líneas e impuestos ---
+def invoice_shape(nrng, args, first, last):
+    n_lines, line_tax, present = document_shape(nrng, last - first, len(taxes))
+    return (last - first, len(line_tax), int(present.sum())), (n_lines, line_tax, present)
 
 # --- Generador de datos ---
-for i in range(n_invoices):
+def invoice_block(rng, nrng, fake, args, first, last, ids, data):
+    invoice_id_seq, line_id_seq, tax_id_seq = ids
+    n_lines, line_tax, present = data
+    count = last - first
+    lines = document_lines(nrng, n_lines, line_tax, [tax["value"] for tax in taxes])
+
     year = 2025
-    is_closed = random.choice([0, 1])
-    is_paid = random.choice([0, 1]) if is_closed else 0
-
-    proforma_code = gen_invoice_code("P", year, i + 1)
-    proforma_date = fake.date_between(start_date='-60d', end_date='today')
-    invoice_code = gen_invoice_code("F", year, i + 1) if is_closed else ""
-    invoice_date = fake.date_between(start_date=proforma_date, end_date='today') if is_closed else None
-    due_date = invoice_date + timedelta(days=random.choice([15, 30, 45])) if is_closed else None
-    paid_date = fake.date_between(start_date=invoice_date, end_date='today') if is_paid and invoice_date else None
-    payment_method_id = random.randint(1, 12)
-    status_id = random.randint(1, 5)
+    is_closed = nrng.integers(0, 2, count)
+    is_paid = nrng.integers(0, 2, count) * is_closed
+    # Fechas como días respecto a la fecha de referencia
+    proforma_day = -ages(args, nrng, "app_invoices.proforma_date", 60, count)
+    invoice_day = proforma_day + (nrng.random(count) * (1 - proforma_day)).astype(int)
+    due_day = invoice_day + nrng.choice([15, 30, 45], count)
+    paid_day = invoice_day + (nrng.random(count) * (1 - invoice_day)).astype(int)
+    days = {day: ref_date(args, day).isoformat() for day in range(-60, 46)}
+    payment_method_id = fkeys(args, nrng, "app_invoices.payment_method_id", table_rows("app_payment_methods", args.scale), count)
+    status_id = fkeys(args, nrng, "app_invoices.status_id", table_rows("app_invoices_status", args.scale), count)
+    customer_id = fkeys(args, nrng, "app_invoices.customer_id", table_rows("app_customers", args.scale), count)
+    cif_letter = nrng.integers(0, len(letras), count)
+    cif_number = nrng.integers(1000000, 10000000, count)
+    cif_digit = nrng.integers(0, 10, count)
+
+    customer_name = sample(args, nrng, "company", count)
+    customer_address = [address.replace("\n", ", ") for address in sample(args, nrng, "address", count)]
+    customer_city = sample(args, nrng, "city", count)
+    customer_province = sample(args, nrng, "state", count)
+    customer_zip = sample(args, nrng, "postcode", count)
+    customer_country = sample(args, nrng, "country", count)
+    description = sample(args, nrng, "paragraph", count)
 
     company_id = 1
     company_name = 'SaltOS Solutions SL'
@@ -80,66 +75,59 @@ for i in range(n_invoices):
     company_zip = '08001'
     company_country = 'Spain'
 
-    customer_name = escape_sql_text(fake.company())
-    customer_address = escape_sql_text(fake.address().replace("\n", ", "))
-    customer_city = escape_sql_text(fake.city())
-    customer_province = fake.state()
-    customer_zip = escape_sql_text(fake.postcode())
-    customer_country = escape_sql_text(fake.country())
-    customer_code = generar_cif()
-    customer_id = random.randint(1, 50)
-    description = escape_sql_text(fake.paragraph())
-
-    n_lines = int(random.random() ** 2 * 49) + 1
-    subtotal = 0
-    tax_buckets = {}
-
-    for _ in range(n_lines):
-        quantity = round(random.uniform(1, 10), 2)
-        price = round(random.uniform(10, 200), 2)
-        discount = random_discount()
-        tax = random.choice(taxes)
-        base_total = round(quantity * price * (1 - discount / 100), 2)
-
-        line_rows.append(f"({line_id_seq},{invoice_id_seq},0,"
-                         f"{safe_sql_str(fake.bs())},{quantity},{price},{discount},"
-                         f"{tax['id']},{tax['value']},{base_total})")
-        line_id_seq += 1
-        subtotal += base_total
-
-        if tax['id'] not in tax_buckets:
-            tax_buckets[tax['id']] = {"tax_name": tax["name"], "tax_value": tax["value"], "base": 0.0}
-        tax_buckets[tax['id']]["base"] += base_total
-
-    total_tax = 0.0
-    for tax_id, data in tax_buckets.items():
-        base = round(data["base"], 2)
-        tax_amount = round(base * data["tax_value"] / 100, 2)
-        total_tax += tax_amount
-        tax_rows.append(f"({tax_id_seq},{invoice_id_seq},{tax_id},'{escape_sql_text(data['tax_name'])}',"
-                        f"{data['tax_value']},{base},{tax_amount})")
-        tax_id_seq += 1
-
-    total = round(subtotal + total_tax, 2)
-    paid = total if is_paid else 0.0
-
-    invoice_rows.append(
-        f"({invoice_id_seq},"
-        f"'{proforma_code}',"
-        f"{safe_sql_date(proforma_date)},"
-        f"{safe_sql_str(invoice_code)},"
-        f"{safe_sql_date(invoice_date)},"
-        f"{company_id},'{company_name}','{company_address}','{company_city}',"
-        f"'{company_province}','{company_zip}','{company_country}','{company_code}',"
-        f"{customer_id},'{customer_name}','{customer_address}','{customer_city}',"
-        f"'{customer_province}','{customer_zip}','{customer_country}','{customer_code}',"
-        f"'{description}',{subtotal},{total_tax},{total},"
-        f"{payment_method_id},{safe_sql_date(due_date)},{paid},{safe_sql_date(paid_date)},"
-        f"{status_id},{is_closed},{is_paid})"
-    )
-    invoice_id_seq += 1
-
-# --- Guardar ficheros ---
-save_sql_gz("invoices", invoice_rows)
-save_sql_gz("invoices_lines", line_rows)
-save_sql_gz("invoices_taxes", tax_rows)
+    # Columnas numéricas como listas de Python para formatear las filas
+    line_invoice = (invoice_id_seq + numpy.repeat(numpy.arange(count), n_lines)).tolist()
+    line_tax_id = [taxes[tax]["id"] for tax in line_tax.tolist()]
+    line_tax_value = [taxes[tax]["value"] for tax in line_tax.tolist()]
+    line_rows = [
+        (line_id_seq + j, invoice_id, 0, line_description, quantity, price, discount, tax_id, tax_value, base_total)
+        for j, (invoice_id, line_description, quantity, price, discount, tax_id, tax_value, base_total) in enumerate(zip(
+            line_invoice, sample(args, nrng, "bs", len(line_tax)), lines["quantity"].tolist(), lines["price"].tolist(), lines["discount"].tolist(),
+            line_tax_id, line_tax_value, lines["base_total"].tolist()))
+    ]
+
+    doc, tax = numpy.nonzero(present)
+    tax_rows = [
+        (tax_id_seq + j, invoice_id_seq + d, taxes[t]["id"], taxes[t]["name"], taxes[t]["value"], base, tax_amount)
+        for j, (d, t, base, tax_amount) in enumerate(zip(
+            doc.tolist(), tax.tolist(), lines["base"][doc, tax].tolist(), lines["amount"][doc, tax].tolist()))
+    ]
+
+    invoice_rows = []
+    for d, (closed, paid_flag, proforma, invoice, due, paid_at, method, status, customer, letter, number, digit,
+            subtotal, total_tax, total) in enumerate(zip(
+            is_closed.tolist(), is_paid.tolist(), proforma_day.tolist(), invoice_day.tolist(), due_day.tolist(),
+            paid_day.tolist(), payment_method_id.tolist(), status_id.tolist(), customer_id.tolist(),
+            cif_letter.tolist(), cif_number.tolist(), cif_digit.tolist(), lines["subtotal"].tolist(),
+            lines["total_tax"].tolist(), lines["total"].tolist())):
+        i = first + d
+        proforma_code = gen_invoice_code("P", year, i)
+        invoice_code = gen_invoice_code("F", year, i) if closed else ""
+        invoice_date = days[invoice] if closed else None
+        due_date = days[due] if closed else None
+        paid_date = days[paid_at] if paid_flag else None
+        paid = total if paid_flag else 0.0
+
+        customer_code = f"{letras[letter]}{number}{digit}"
+
+        invoice_rows.append((
+            invoice_id_seq + d,
+            proforma_code,
+            safe_date(days[proforma]),
+            invoice_code,
+            safe_date(invoice_date),
+            company_id, company_name, company_address, company_city,
+            company_province, company_zip, company_country, company_code,
+            customer, customer_name[d], customer_address[d], customer_city[d],
+            customer_province[d], customer_zip[d], customer_country[d], customer_code,
+            description[d], subtotal, total_tax, total,
+            method, safe_date(due_date), paid, safe_date(paid_date),
+            status, closed, paid_flag,
+        ))
+    return invoice_rows, line_rows, tax_rows
+
+def main(args):
+    generate(args, "app_invoices", tables, scaled(100, args.scale), invoice_block, invoice_shape, block=True)
+
+if __name__ == "__main__":
+    main(parse_args("Generate the app_invoices, app_invoices_lines and app_invoices_taxes sample data"))
@@ -1,4 +1,8 @@
-import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, open_sample, write_manifest
 
 # Lista de métodos de pago con sus descripciones
 payment_methods = [
@@ -33,5 +37,11 @@ sql = (
 )
 
 # Escribir archivo comprimido .sql.gz
-with gzip.open("app_payment_methods.sql.gz", "wt", encoding="utf-8") as f:
-    f.write(sql)
+def main(args):
+    path = os.path.join(args.output, "app_payment_methods.sql.gz")
+    with open_sample(path) as f:
+        f.write(sql)
+    write_manifest([path], __file__)
+
+if __name__ == "__main__":
+    main(parse_args("Generate the app_payment_methods sample data"))
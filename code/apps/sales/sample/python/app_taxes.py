@@ -1,8 +1,11 @@
-import gzip
-from pathlib import Path
+import os
+import sys
 
-def generate_app_taxes_sql_gz():
-    path = Path("app_taxes.sql.gz")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, open_sample, write_manifest
+
+def generate_app_taxes_sql_gz(args):
+    path = os.path.join(args.output, "app_taxes.sql.gz")
     tax_rows = [
         (1, "VAT 21%", "Standard VAT rate of 21%", 21.00, 1, 1),
         (2, "VAT 10%", "Reduced VAT rate of 10%", 10.00, 1, 0),
@@ -17,8 +20,13 @@ def generate_app_taxes_sql_gz():
         desc_escaped = desc.replace("'", "''")
         values.append(f"({id_}, '{name_escaped}', '{desc_escaped}', {value}, {active}, {default})")
     sql += ",\n".join(values) + ";\n"
-    with gzip.open(path, "wt", encoding="utf-8") as f:
+    with open_sample(path) as f:
         f.write(sql)
+    write_manifest([path], __file__)
     return path
 
-generate_app_taxes_sql_gz()
+def main(args):
+    generate_app_taxes_sql_gz(args)
+
+if __name__ == "__main__":
+    main(parse_args("Generate the app_taxes sample data"))
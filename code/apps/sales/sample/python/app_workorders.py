@@ -1,34 +1,34 @@
-import gzip
-import random
-from faker import Faker
-from pathlib import Path
+import os
+import sys
 
-def generate_app_workorders_sql_gz():
-    path = Path("app_workorders.sql.gz")
-    fake = Faker()
-    sql = "INSERT INTO `app_workorders` (`id`, `date`, `worker_id`, `client_id`, `description`, `hours`, `price`, `total`, `invoice_id`) VALUES\n"
-    rows = []
-    for i in range(1, 101):
-        date = fake.date_between(start_date='-6M', end_date='today').isoformat()
-        worker_id = random.randint(1, 50)
-        client_id = random.randint(1, 100)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../../scripts"))
+from samplelib import parse_args, scaled, table_rows, ref_date, sample_joined, generate, fkeys, ages
 
-        def fake_paragraphs(min_paragraphs=1, max_paragraphs=4):
-            return "\n\n".join(
-                fake.paragraph().replace("'", "''")
-                for _ in range(random.randint(min_paragraphs, max_paragraphs))
-            )
+HEADER = "INSERT INTO `app_workorders` (`id`, `date`, `worker_id`, `client_id`, `description`, `hours`, `price`, `total`, `invoice_id`) VALUES\n"
 
-        description = fake_paragraphs()
-        hours = round(random.uniform(1, 8), 2)
-        price = round(random.uniform(20, 100), 2)
-        total = round(hours * price, 2)
-        invoice_id = random.randint(1, 100)
-        row = f"({i}, '{date}', {worker_id}, {client_id}, '{description}', {hours}, {price}, {total}, {invoice_id})"
-        rows.append(row)
-    sql += ",\n".join(rows) + ";"
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        f.write(sql)
-    return path
+def fake_paragraphs(args, nrng, count, min_paragraphs=1, max_paragraphs=4):
+    return sample_joined(args, nrng, "paragraph", min_paragraphs, max_paragraphs, "\n\n", count)
 
-generate_app_workorders_sql_gz()
+def app_workorders_block(rng, nrng, fake, args, first, last, ids, data):
+    count = last - first
+    days = {day: ref_date(args, day).isoformat() for day in range(-180, 1)}
+    hours = nrng.uniform(1, 8, count).round(2)
+    price = nrng.uniform(20, 100, count).round(2)
+    columns = zip(
+        range(first, last),
+        [days[day] for day in (-ages(args, nrng, "app_workorders.date", 180, count)).tolist()],
+        fkeys(args, nrng, "app_workorders.worker_id", table_rows("app_employees", args.scale), count).tolist(),
+        fkeys(args, nrng, "app_workorders.client_id", table_rows("app_customers", args.scale), count).tolist(),
+        fake_paragraphs(args, nrng, count),
+        hours.tolist(),
+        price.tolist(),
+        (hours * price).round(2).tolist(),
+        fkeys(args, nrng, "app_workorders.invoice_id", table_rows("app_invoices", args.scale), count).tolist(),
+    )
+    return [list(columns)]
+
+def main(args):
+    generate(args, "app_workorders", [("app_workorders.sql.gz", HEADER)], scaled(100, args.scale), app_workorders_block, block=True)
+
+if __name__ == "__main__":
+    main(parse_args("Generate the app_workorders sample data"))
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Actions benchmark
+
+This script measures the actions of the apps using the CLI of SaltOS with
+the same calls and payloads of the utest/test_cli_*.php tests: it logs in
+with auth/login and repeats for each app the create, insert, list (the first
+page and a search), view, edit, update and delete actions, each repetition
+inserts a register and deletes it, so the size of the tables does not change
+during the benchmark
+
+For each action it reports the percentiles p50, p95 and p99 of the wall time
+of the process (with the start of PHP) and of the time of the request
+measured by PHP, the peak of memory of PHP and the number of queries, the
+time, the memory and the queries are written by PHP to the standard error
+when the stats environment variable is set, see __output_stats
+
+With --datasets the benchmark is repeated for each SQLite database of the
+list, copied over the --database of the instance (that is restored at the
+end), as the databases made by scripts/samplesqlite.py at several scales,
+and the report of each dataset contains the rows of the tables of the apps,
+to see which actions get slower as the tables grow, without --datasets the
+current database of the instance is used and the rows are read from
+--database when it exists
+
+The reports are printed as JSON lines to the standard output and appended to
+the --report file, and a table with the percentiles is printed to the
+standard error, the script must be run by the owner of the files
+
+Usage:
+
+scripts/benchactions.py [--apps app,...] [--repeat N] [--warmup N]
+                        [--database file] [--datasets file,...]
+                        [--report file] [--store [file]]
+"""
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import argparse
+import statistics
+
+from benchlib import ROOT_PATH, run_action, percentiles, append_report
+from benchstore import STORE, record
+
+# Payloads of the apps, the same of the utest/test_cli_*.php tests
+APPS = {
+    "customers": {
+        "insert": {
+            "name": "The SaltOS project",
+            "code": "12345678X",
+            "city": "Barcelona",
+            "zip": "08001",
+        },
+        "update": {
+            "name": "The SaltOS project v2",
+            "code": "12345678Z",
+        },
+        "search": "The SaltOS project 12345678X",
+    },
+    "invoices": {
+        "insert": {
+            "customer_name": "The SaltOS project",
+            "customer_address": "X",
+            "customer_country": "Y",
+            "customer_city": "Barcelona",
+            "customer_zip": "08001",
+            "customer_code": "12345678X",
+            "lines": [
+                {"description": "ABC", "quantity": "1", "price": "2", "discount": "3"},
+                {"description": "DEF", "quantity": "4", "price": "5", "discount": "6"},
+            ],
+        },
+        "update": {
+            "customer_name": "The SaltOS project v2",
+            "customer_code": "12345678Z",
+        },
+        "search": "The SaltOS project 12345678X",
+    },
+}
+
+def login(args):
+    output, _, _ = run_action("auth/login", {"user": args.user, "pass": args.password}, php=args.php)
+    if not isinstance(output, dict) or output.get("status") != "ok":
+        sys.exit(f"Could not login: {str(output)[:500]}")
+    return output["token"]
+
+
+def repetition(args, token, app):
+    """
+    Runs the actions of an app once and returns the wall time, the stats
+    and the success of each action
+    """
+    payload = APPS[app]
+    results = {}
+
+    def call(action, rest, data=None, key=None):
+        output, wall, stats = run_action(rest, data, token=token, php=args.php)
+        ok = isinstance(output, dict) and "error" not in output and (not key or key in output)
+        results[action] = (wall, stats, ok)
+        return output if ok else {}
+
+    call("create", f"app/{app}/create", key="cache")
+    id = call("insert", f"app/{app}/insert", payload["insert"], "created_id").get("created_id")
+    call("list", f"app/{app}/list/data", {"page": 1}, "data")
+    call("search", f"app/{app}/list/data", {"search": payload["search"]}, "data")
+    if id:
+        call("view", f"app/{app}/view/{id}", key="data")
+        call("edit", f"app/{app}/edit/{id}", key="data")
+        call("update", f"app/{app}/update/{id}", payload["update"], "updated_id")
+        call("delete", f"app/{app}/delete/{id}", key="deleted_id")
+    return results
+
+
+def table_rows(database, apps):
+    """
+    Returns the rows of the tables of the apps in the SQLite database
+    """
+    if not database or not os.path.exists(database):
+        return {}
+    db = sqlite3.connect(database)
+    rows = {}
+    for app in apps:
+        table = db.execute("SELECT `table` FROM tbl_apps WHERE code = ?", (app,)).fetchone()
+        if table:
+            rows[app] = db.execute(f"SELECT COUNT(*) FROM {table[0]}").fetchone()[0]
+    db.close()
+    return rows
+
+
+def summary(samples):
+    """
+    Returns the report of the samples of an action
+    """
+    walls = [wall for wall, _, _ in samples]
+    stats = [stats for _, stats, _ in samples if stats]
+    return {
+        "samples": len(samples),
+        "errors": sum(not ok for _, _, ok in samples),
+        "wall": {key: round(value, 6) for key, value in percentiles(walls).items()},
+        "time": {key: round(value, 6) for key, value in percentiles([stat["time"] for stat in stats]).items()},
+        "memory": max((stat["memory"] for stat in stats), default=0),
+        "queries": statistics.median([stat["queries"] for stat in stats]) if stats else 0,
+    }
+
+
+def benchmark(args, dataset):
+    """
+    Runs the benchmark with the current database and returns its report
+    """
+    token = login(args)
+    samples = {}
+    for app in args.apps:
+        for number in range(args.warmup + args.repeat):
+            for action, sample in repetition(args, token, app).items():
+                if number >= args.warmup:
+                    samples.setdefault(f"{app}/{action}", []).append(sample)
+    report = {
+        "dataset": dataset,
+        "rows": table_rows(args.database, args.apps),
+        "repeat": args.repeat,
+        "actions": {name: summary(data) for name, data in samples.items()},
+    }
+    if args.store:
+        metrics = {}
+        for name, data in samples.items():
+            metrics[f"{name}/wall"] = [wall for wall, _, _ in data]
+            metrics[f"{name}/time"] = [stats["time"] for _, stats, _ in data if stats]
+        record(args.store, "actions", metrics, dataset=dataset, params={"repeat": args.repeat, "rows": report["rows"]},
+               php=args.php)
+    return report
+
+
+def print_report(report):
+    print(f"{report['dataset']} {json.dumps(report['rows'])}", file=sys.stderr)
+    for name, data in report["actions"].items():
+        print(f"  {name:<24} wall p50 {data['wall']['p50']:.3f}s p95 {data['wall']['p95']:.3f}s "
+              f"p99 {data['wall']['p99']:.3f}s time p50 {data['time']['p50']:.3f}s p95 {data['time']['p95']:.3f}s "
+              f"p99 {data['time']['p99']:.3f}s {data['memory'] / 1048576:6.1f} MB {data['queries']:>5} queries"
+              f"{' ' + str(data['errors']) + ' errors' if data['errors'] else ''}", file=sys.stderr)
+
+
+def parse_apps(apps):
+    result = [app for app in apps.split(",") if app]
+    unknown = [app for app in result if app not in APPS]
+    if unknown or not result:
+        raise argparse.ArgumentTypeError(f"invalid apps {','.join(unknown)}, the apps are {', '.join(APPS)}")
+    return result
+
+
+def main(args):
+    datasets = args.datasets or [None]
+    backup = None
+    if args.datasets and os.path.exists(args.database):
+        backup = args.database + ".benchactions"
+        shutil.copyfile(args.database, backup)
+    try:
+        for dataset in datasets:
+            if dataset:
+                # The database of the instance can be one of the datasets
+                same = os.path.abspath(dataset) == os.path.abspath(args.database)
+                shutil.copyfile(backup if same else dataset, args.database)
+            report = benchmark(args, dataset or args.database)
+            print(json.dumps(report, sort_keys=True))
+            print_report(report)
+            append_report(args.report, report)
+    finally:
+        if backup:
+            shutil.move(backup, args.database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the actions of the apps using the CLI")
+    parser.add_argument("--apps", type=parse_apps, default=list(APPS), help="Apps to measure, all by default")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions of the actions of each app")
+    parser.add_argument("--warmup", type=int, default=1, help="Repetitions not measured before the measured ones")
+    parser.add_argument("--database", default=os.path.join(ROOT_PATH, "code", "data", "files", "saltos.sqlite"),
+                        help="SQLite database of the instance, replaced by each dataset")
+    parser.add_argument("--datasets", type=lambda value: [file for file in value.split(",") if file],
+                        help="SQLite databases copied over the database of the instance, one benchmark by database")
+    parser.add_argument("--user", default="admin", help="User of the login")
+    parser.add_argument("--password", default="admin", help="Password of the login")
+    parser.add_argument("--php", default="php", help="PHP binary used to run the actions")
+    parser.add_argument("--report", help="File where the reports are appended as JSON lines")
+    parser.add_argument("--store", nargs="?", const=STORE, help="Record the samples in the history of the benchmarks")
+    main(parser.parse_args())
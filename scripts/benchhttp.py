@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+HTTP load benchmark
+
+This script measures the throughput of code/api/index.php under concurrency
+using the HTTP API, as the SaltOS client does: it is an asyncio load
+generator that logs in once by virtual user with auth/login, caches the
+tokens (in memory and in the --tokens file, to reuse them in the next runs),
+and sends the requests by a pool of --connections HTTP/1.1 connections that
+are kept alive while the server allows it, against a local php -S server
+(started in code/api, with PHP_CLI_SERVER_WORKERS to have more than one
+worker) or an Apache instance
+
+Each request is a scenario choosen by the weights of --mix: list (a page of
+the list of customers), filter (the list of customers filtered by a term),
+view (the view of an invoice), insert (the insert of a quote) and search
+(the list of invoices filtered by a term), the ids of the invoices and the
+terms of the searches are read from the first pages of the lists before the
+benchmark, and the quotes inserted are deleted at the end unless --keep is
+used
+
+With --rps the requests are sent in open loop at the target rate (with
+poisson arrivals), and the latency is measured from the time when the
+request was scheduled, so the time waiting for a free connection is part of
+the latency as the users would see, the --rps can be a list of rates that
+are run as steps of --duration seconds, and the saturation point is the
+first step whose achieved rate is less than the 90% of the offered rate
+(the requests sent by second, near the target), whose error rate is greater
+than --max-errors or whose p95 latency is greater than --slo, with --rps=0
+each virtual user sends its requests in closed loop
+
+The report contains by step the target and the achieved rates, the errors
+by type, the percentiles and the histogram of the latencies, the same data
+by scenario and the connections opened, printed as JSON lines to the
+standard output and appended to the --report file, and a table with the
+histograms is printed to the standard error
+
+Usage:
+
+scripts/benchhttp.py [--url url] [--users N] [--connections N]
+                     [--rps rate,...] [--duration seconds] [--mix ...]
+                     [--tokens file] [--report file] [--store [file]]
+"""
+import sys
+import ssl
+import json
+import time
+import random
+import asyncio
+import argparse
+import urllib.parse
+
+from benchlib import percentiles, append_report
+from benchstore import STORE, record
+
+USER_AGENT = "SaltOS benchhttp"
+
+# Upper limits of the buckets of the histograms, in milliseconds
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# Payload of the insert of a quote, as the invoices of the utest/test_cli_invoices.php tests
+QUOTE = {
+    "customer_name": "The SaltOS project",
+    "customer_address": "X",
+    "customer_province": "Z",
+    "customer_country": "Y",
+    "customer_city": "Barcelona",
+    "customer_zip": "08001",
+    "customer_code": "12345678X",
+    "lines": [
+        {"description": "ABC", "quantity": "1", "price": "2", "discount": "3"},
+        {"description": "DEF", "quantity": "4", "price": "5", "discount": "6"},
+    ],
+}
+
+
+class Connection:
+    """
+    HTTP/1.1 connection to the server, the responses are read using the
+    Content-Length, the chunked encoding or the end of the connection
+    """
+
+    def __init__(self, url, context):
+        self.url = url
+        self.context = context
+        self.reader = None
+        self.writer = None
+
+    async def open(self):
+        port = self.url.port or (443 if self.url.scheme == "https" else 80)
+        self.reader, self.writer = await asyncio.open_connection(
+            self.url.hostname, port, ssl=self.context if self.url.scheme == "https" else None)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+    async def request(self, method, target, headers, body):
+        """
+        Sends the request and returns the status, the headers, the body and
+        if the connection can be reused
+        """
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.url.netloc}"]
+        lines += [f"{key}: {value}" for key, value in headers.items()]
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionResetError("connection closed by the server")
+        version, status = line.decode("latin-1").split(" ", 2)[:2]
+        response = {}
+        while True:
+            line = (await self.reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            key, _, value = line.partition(":")
+            response[key.strip().lower()] = value.strip()
+        tokens = [token.strip().lower() for token in response.get("connection", "").split(",")]
+        keep = "close" not in tokens and (version == "HTTP/1.1" or "keep-alive" in tokens)
+        if "chunked" in response.get("transfer-encoding", "").lower():
+            data = b""
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if not size:
+                    break
+                data += await self.reader.readexactly(size)
+                await self.reader.readexactly(2)
+            while (await self.reader.readline()).strip():
+                pass
+        elif "content-length" in response:
+            data = await self.reader.readexactly(int(response["content-length"]))
+        else:
+            data = await self.reader.read()
+            keep = False
+        return int(status), response, data, keep
+
+
+class Pool:
+    """
+    Pool of connections shared by the virtual users, the connections are
+    opened on demand and reused while the server keeps them alive
+    """
+
+    def __init__(self, args):
+        self.url = urllib.parse.urlsplit(args.url)
+        self.path = self.url.path or "/"
+        self.timeout = args.timeout
+        self.context = ssl.create_default_context()
+        if args.insecure:
+            self.context.check_hostname = False
+            self.context.verify_mode = ssl.CERT_NONE
+        self.queue = asyncio.Queue()
+        for _ in range(args.connections):
+            self.queue.put_nowait(None)
+        self.opened = 0
+
+    async def request(self, rest, data=None, token=None):
+        """
+        Sends the request of the rest path, by POST with the JSON data or by
+        GET without data, and returns the status and the decoded JSON of the
+        body (or the text when it is not JSON), a reused connection closed by
+        the server before the response is replaced by a new one
+        """
+        headers = {"User-Agent": USER_AGENT, "Accept": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        body = b""
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+            body = json.dumps(data).encode("utf-8")
+        method = "POST" if body else "GET"
+        connection = await self.queue.get()
+        try:
+            for retry in (True, False):
+                reused = connection is not None
+                if not reused:
+                    connection = Connection(self.url, self.context)
+                    await asyncio.wait_for(connection.open(), self.timeout)
+                    self.opened += 1
+                try:
+                    status, _, response, keep = await asyncio.wait_for(
+                        connection.request(method, f"{self.path}?{rest}", headers, body), self.timeout)
+                    break
+                except (ConnectionResetError, asyncio.IncompleteReadError, BrokenPipeError):
+                    connection.close()
+                    connection = None
+                    if not reused or not retry:
+                        raise
+            if not keep:
+                connection.close()
+                connection = None
+        except BaseException:
+            if connection:
+                connection.close()
+                connection = None
+            raise
+        finally:
+            self.queue.put_nowait(connection)
+        text = response.decode("utf-8", "replace")
+        if text[:1] in ("{", "["):
+            try:
+                return status, json.loads(text)
+            except ValueError:
+                pass
+        return status, text
+
+    def close(self):
+        while not self.queue.empty():
+            connection = self.queue.get_nowait()
+            if connection:
+                connection.close()
+
+
+def failure(status, output, key=None):
+    """
+    Returns the type of error of a response or None when it is right
+    """
+    if status != 200:
+        return f"http {status}"
+    if not isinstance(output, dict):
+        return "not json"
+    if "error" in output:
+        return "error " + str(output["error"].get("text", "") if isinstance(output["error"], dict) else output["error"])[:40]
+    if key and key not in output:
+        return f"no {key}"
+    return None
+
+
+async def login(args, pool, cached):
+    """
+    Returns the token of a virtual user, the cached token is reused when
+    auth/check accepts it
+    """
+    if cached:
+        status, output = await pool.request("auth/check", token=cached)
+        if not failure(status, output) and output.get("status") == "ok":
+            return cached
+    status, output = await pool.request("auth/login", {"user": args.user, "pass": args.password})
+    if failure(status, output) or output.get("status") != "ok":
+        sys.exit(f"Could not login: {str(output)[:500]}")
+    return output["token"]
+
+
+async def prepare(args, pool, token):
+    """
+    Returns the context of the scenarios: the ids of the invoices, the pages
+    of the customers and the terms of the searches, read from the first
+    pages of the lists
+    """
+    context = {"invoices": [], "pages": 1, "terms": args.terms or [], "quotes": []}
+    words = set()
+    for app in ("customers", "invoices"):
+        for page in range(4):
+            status, output = await pool.request(f"app/{app}/list/data", {"page": page}, token)
+            if failure(status, output, "data") or not output["data"]:
+                break
+            if not page and str(output.get("footer", "")).split(": ")[-1].isdigit():
+                if app == "customers":
+                    context["pages"] = max(1, min(int(output["footer"].split(": ")[-1]) // 25, 1000))
+            for row in output["data"]:
+                if app == "invoices":
+                    context["invoices"].append(row["id"])
+                for value in row.values():
+                    words.update(word for word in str(value).split() if len(word) >= 4 and word.isalnum())
+    if not context["terms"]:
+        context["terms"] = sorted(words)[:200] or ["SaltOS"]
+    if not context["invoices"] and args.mix["view"]:
+        sys.exit("The invoices app does not have registers, the view scenario needs some")
+    return context
+
+
+def scenario_list(rng, context):
+    return "app/customers/list/data", {"page": rng.randrange(context["pages"])}, "data"
+
+
+def scenario_filter(rng, context):
+    return "app/customers/list/data", {"search": rng.choice(context["terms"])}, "data"
+
+
+def scenario_view(rng, context):
+    return f"app/invoices/view/{rng.choice(context['invoices'])}", None, "data"
+
+
+def scenario_insert(rng, context):
+    return "app/quotes/insert", QUOTE, "created_id"
+
+
+def scenario_search(rng, context):
+    return "app/invoices/list/data", {"search": rng.choice(context["terms"])}, "data"
+
+
+# Scenarios of the mix with its default weight
+SCENARIOS = {
+    "list": (scenario_list, 40),
+    "filter": (scenario_filter, 20),
+    "view": (scenario_view, 25),
+    "insert": (scenario_insert, 5),
+    "search": (scenario_search, 10),
+}
+
+
+async def execute(args, pool, tokens, context, rng, samples, scheduled):
+    """
+    Sends the request of a scenario choosen by the mix using the token of a
+    virtual user and adds its sample, the latency from the scheduled time
+    """
+    name = rng.choices(list(args.mix), weights=list(args.mix.values()))[0]
+    rest, data, key = SCENARIOS[name][0](rng, context)
+    try:
+        status, output = await pool.request(rest, data, rng.choice(tokens))
+        error = failure(status, output, key)
+        if not error and name == "insert":
+            context["quotes"].append(output["created_id"])
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exception:
+        error = type(exception).__name__
+    if samples is not None:
+        samples.append((name, time.perf_counter() - scheduled, error))
+
+
+async def run_step(args, pool, tokens, context, rng, rps, duration, samples):
+    """
+    Sends requests during the duration, in open loop at the rps rate or in
+    closed loop by each virtual user when the rate is zero, and returns the
+    seconds until the last response and the requests sent in open loop
+    """
+    begin = time.perf_counter()
+    deadline = begin + duration
+    offered = 0
+    if rps:
+        tasks = set()
+        scheduled = begin
+        while scheduled < deadline:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(execute(args, pool, tokens, context, rng, samples, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            offered += 1
+            scheduled += rng.expovariate(rps)
+        if tasks:
+            await asyncio.gather(*tasks)
+    else:
+        async def user(token):
+            while time.perf_counter() < deadline:
+                await execute(args, pool, [token], context, rng, samples, time.perf_counter())
+        await asyncio.gather(*(user(token) for token in tokens))
+    return time.perf_counter() - begin, offered
+
+
+def histogram(latencies):
+    result = {f"{bucket}ms": 0 for bucket in BUCKETS}
+    result["more"] = 0
+    for latency in latencies:
+        bucket = next((bucket for bucket in BUCKETS if latency * 1000 <= bucket), None)
+        result[f"{bucket}ms" if bucket else "more"] += 1
+    return result
+
+
+def summary(samples, seconds):
+    """
+    Returns the report of the samples of a step or of a scenario
+    """
+    latencies = [latency for _, latency, _ in samples]
+    errors = {}
+    for _, _, error in samples:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    return {
+        "requests": len(samples),
+        "rps": round(len(samples) / seconds, 3) if seconds else 0,
+        "errors": errors,
+        "error_rate": round(sum(errors.values()) / len(samples), 4) if samples else 0,
+        "latency": {key: round(value, 6) for key, value in percentiles(latencies).items()},
+        "histogram": histogram(latencies),
+    }
+
+
+def saturated(args, step):
+    """
+    Returns the reason why the step is saturated or None
+    """
+    if step["offered"] and step["rps"] < step["offered"] * 0.9:
+        return "rate"
+    if step["error_rate"] > args.max_errors:
+        return "errors"
+    if step["latency"]["p95"] > args.slo:
+        return "latency"
+    return None
+
+
+def print_step(step):
+    print(f"target {step['target']:>8} rps achieved {step['rps']:>8.1f} rps {step['requests']:>7} requests "
+          f"errors {step['error_rate'] * 100:.2f}% p50 {step['latency']['p50'] * 1000:.1f}ms "
+          f"p95 {step['latency']['p95'] * 1000:.1f}ms p99 {step['latency']['p99'] * 1000:.1f}ms "
+          f"{step['connections']} connections{' saturated by ' + step['saturated'] if step['saturated'] else ''}",
+          file=sys.stderr)
+    largest = max(step["histogram"].values()) or 1
+    for bucket, count in step["histogram"].items():
+        if count:
+            print(f"  {bucket:>8} {count:>7} {'#' * round(count * 50 / largest)}", file=sys.stderr)
+    for error, count in step["errors"].items():
+        print(f"  {error} {count}", file=sys.stderr)
+
+
+def read_tokens(file):
+    try:
+        with open(file, encoding="utf-8") as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        return {}
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    pool = Pool(args)
+    cache = read_tokens(args.tokens) if args.tokens else {}
+    cached = cache.get(args.url, {}).get(args.user, [])
+    tokens = []
+    for number in range(args.users):
+        tokens.append(await login(args, pool, cached[number] if number < len(cached) else None))
+    if args.tokens:
+        cache.setdefault(args.url, {})[args.user] = tokens
+        with open(args.tokens, "w", encoding="utf-8") as fd:
+            json.dump(cache, fd, indent=4)
+    context = await prepare(args, pool, tokens[0])
+    if args.warmup:
+        await run_step(args, pool, tokens, context, rng, args.rps[0], args.warmup, None)
+    report = {
+        "url": args.url,
+        "users": args.users,
+        "connections": args.connections,
+        "duration": args.duration,
+        "mix": args.mix,
+        "steps": [],
+        "saturation": None,
+    }
+    metrics = {}
+    try:
+        for rps in args.rps:
+            samples = []
+            opened = pool.opened
+            seconds, offered = await run_step(args, pool, tokens, context, rng, rps, args.duration, samples)
+            step = {"target": rps, "offered": round(offered / args.duration, 3), "connections": pool.opened - opened,
+                    **summary(samples, seconds)}
+            step["scenarios"] = {name: summary([sample for sample in samples if sample[0] == name], seconds)
+                                 for name in args.mix if args.mix[name]}
+            step["saturated"] = saturated(args, step)
+            report["steps"].append(step)
+            metrics[f"{rps:g}/rps"] = [step["rps"]]
+            metrics[f"{rps:g}/latency"] = [latency for _, latency, _ in samples]
+            for name in step["scenarios"]:
+                metrics[f"{rps:g}/{name}/latency"] = [latency for scenario, latency, _ in samples if scenario == name]
+            print_step(step)
+            if step["saturated"] and not report["saturation"]:
+                report["saturation"] = {"target": rps, "reason": step["saturated"]}
+                if not args.all_steps:
+                    break
+        sustained = [step["rps"] for step in report["steps"] if not step["saturated"]]
+        report["sustained"] = max(sustained, default=0)
+    finally:
+        if not args.keep:
+            for id in context["quotes"]:
+                await pool.request(f"app/quotes/delete/{id}", token=tokens[0])
+        pool.close()
+    print(json.dumps(report, sort_keys=True))
+    append_report(args.report, report)
+    if args.store:
+        record(args.store, "http", metrics, dataset=args.url,
+               params={key: report[key] for key in ("users", "connections", "duration", "mix")})
+
+
+def parse_mix(mix):
+    """
+    Returns the weights of the scenarios with the changes of --mix, as
+    view=50,insert=0
+    """
+    weights = {name: scenario[1] for name, scenario in SCENARIOS.items()}
+    for item in filter(None, mix.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS or not weight.replace(".", "", 1).isdigit():
+            raise argparse.ArgumentTypeError(f"invalid item {item}, the scenarios are {', '.join(SCENARIOS)}")
+        weights[name] = float(weight)
+    if not sum(weights.values()):
+        raise argparse.ArgumentTypeError("some scenario must have weight")
+    return weights
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the throughput of the HTTP API with mixed workloads")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/", help="Base URL of the API, as php -S in code/api")
+    parser.add_argument("--users", type=int, default=10, help="Virtual users, each one with its token")
+    parser.add_argument("--connections", type=int, default=10, help="Connections of the pool")
+    parser.add_argument("--rps", type=lambda value: [float(rate) for rate in value.split(",") if rate], default=[10],
+                        help="Target rates of the steps, as 10,20,50,100, 0 for closed loop")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of each step")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds not measured before the steps")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(""),
+                        help="Weights of the scenarios, as view=50,insert=0")
+    parser.add_argument("--terms", type=lambda value: [term for term in value.split(",") if term],
+                        help="Terms of the searches, read from the lists by default")
+    parser.add_argument("--slo", type=float, default=1, help="Max p95 latency in seconds of a not saturated step")
+    parser.add_argument("--max-errors", type=float, default=0.01, help="Max error rate of a not saturated step")
+    parser.add_argument("--all-steps", action="store_true", help="Continue with the steps after the saturation")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout of each request in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the mix and the arrivals")
+    parser.add_argument("--user", default="admin", help="User of the login")
+    parser.add_argument("--password", default="admin", help="Password of the login")
+    parser.add_argument("--tokens", help="File where the tokens are cached between runs")
+    parser.add_argument("--insecure", action="store_true", help="Do not verify the certificate of https")
+    parser.add_argument("--keep", action="store_true", help="Keep the quotes inserted")
+    parser.add_argument("--report", help="File where the report is appended as a JSON line")
+    parser.add_argument("--store", nargs="?", const=STORE, help="Record the latencies in the history of the benchmarks")
+    asyncio.run(main(parser.parse_args()))
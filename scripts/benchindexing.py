@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Indexing benchmark
+
+This script measures the text extraction of indexing_files with a corpus of
+documents made by scripts/sampledocs.py, each document is copied to the
+files directory of the app, registered as a pending file of a register of
+the app in the SQLite database of the instance, and indexed running the
+indexing action (the task of the cron) using the CLI, so the latency of each
+document is the time of indexing_files returned by the action, that includes
+unoconv2txt, the updates of the file and the make_index of its register,
+without the start of PHP
+
+The text saved in the search field of each file is compared with the text of
+expected.json: the recall is the fraction of the expected words found in the
+extracted text and the marker tells if the unique marker of the document was
+found, and the report contains by type of document the files, the input and
+the extracted bytes, the extracted bytes per second, the percentiles of the
+latency, the mean recall, the markers found and the files without text
+
+The files are copied to a new bench<time> directory in each run because
+unoconv2txt caches the text by the path of the file, so each run measures a
+cold extraction, the files of other apps and the pending files of the app
+must be indexed before the benchmark, and at the end the rows and the copies
+are removed unless --keep is used (the index rows of the registers keep the
+text of the files until the next edit of the registers), run it against a
+copy of the database by the owner of the files, as the cron does
+
+Usage:
+
+scripts/benchindexing.py [--database file] [--files dir] [--app app]
+                         [--types type,...] [--limit N] [--keep]
+                         [--report file] corpus
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import mimetypes
+from collections import Counter
+
+from benchlib import ROOT_PATH, run_action, percentiles, append_report
+
+
+def words(text):
+    return Counter(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def correctness(info, search):
+    """
+    Returns the recall of the expected words in the extracted text and if
+    the marker of the document was found
+    """
+    expected = words(info["text"])
+    found = words(search)
+    return sum((expected & found).values()) / sum(expected.values()), info["marker"].lower() in found
+
+
+def summary(results):
+    """
+    Returns the report of a list of results of the documents
+    """
+    seconds = sum(result["latency"] for result in results)
+    extracted = sum(result["extracted"] for result in results)
+    return {
+        "files": len(results),
+        "bytes": sum(result["bytes"] for result in results),
+        "extracted": extracted,
+        "seconds": round(seconds, 6),
+        "bytes_per_second": round(extracted / seconds, 3) if seconds else 0,
+        "latency": {key: round(value, 6) for key, value in percentiles([result["latency"] for result in results]).items()},
+        "recall": round(sum(result["recall"] for result in results) / len(results), 4) if results else 0,
+        "markers": sum(result["marker"] for result in results),
+        "empty": sum(not result["extracted"] for result in results),
+    }
+
+
+def index_document(args, db, table, run, number, reg_id, file, info):
+    """
+    Registers and indexes a document and returns its result
+    """
+    with open(os.path.join(args.corpus, file), "rb") as fd:
+        data = fd.read()
+    with open(os.path.join(args.files, args.app, run, file), "wb") as fd:
+        fd.write(data)
+    cursor = db.execute(
+        f"INSERT INTO {table}_files (user_id, datetime, reg_id, uniqid, name, size, type, file, hash, search, indexed, retries) "
+        "VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, '', 0, 0)",
+        (time.strftime("%Y-%m-%d %H:%M:%S"), reg_id, f"{run}{number:06d}", file, len(data),
+         mimetypes.guess_type(file)[0] or "application/octet-stream", f"{run}/{file}", hashlib.md5(data).hexdigest()))
+    db.commit()
+    output, wall, _ = run_action("indexing", php=args.php)
+    if not isinstance(output, dict) or "indexing_files" not in output:
+        sys.exit(f"The indexing action failed: {str(output)[:500]}")
+    search, indexed = db.execute(f"SELECT search, indexed FROM {table}_files WHERE id = ?", (cursor.lastrowid,)).fetchone()
+    search = search or ""
+    recall, marker = correctness(info, search)
+    return {
+        "file": file,
+        "type": info["type"],
+        "bytes": len(data),
+        "extracted": len(search.encode("utf-8")),
+        "latency": output["indexing_files"]["time"],
+        "wall": wall,
+        "indexed": indexed,
+        "recall": recall,
+        "marker": marker,
+    }
+
+
+def main(args):
+    with open(os.path.join(args.corpus, "expected.json"), encoding="utf-8") as fd:
+        expected = json.load(fd)
+    expected = {file: info for file, info in sorted(expected.items()) if not args.types or info["type"] in args.types}
+    if args.limit:
+        expected = dict(list(expected.items())[:args.limit])
+    db = sqlite3.connect(args.database)
+    row = db.execute("SELECT `table` FROM tbl_apps WHERE code = ?", (args.app,)).fetchone()
+    if not row or not db.execute("SELECT name FROM sqlite_master WHERE name = ?", (f"{row[0]}_files",)).fetchone():
+        sys.exit(f"The app {args.app} does not exist or does not have files")
+    table = row[0]
+    pending = db.execute(f"SELECT COUNT(*) FROM {table}_files WHERE indexed = 0 AND retries < 3 AND file != ''").fetchone()[0]
+    if pending:
+        sys.exit(f"The table {table}_files has {pending} pending files, run the indexing action before the benchmark")
+    ids = [row[0] for row in db.execute(f"SELECT id FROM {table} ORDER BY id LIMIT 1000")]
+    if not ids:
+        sys.exit(f"The table {table} does not have registers")
+    run = time.strftime("bench%Y%m%d%H%M%S")
+    os.makedirs(os.path.join(args.files, args.app, run))
+    results = []
+    try:
+        # Each document goes to another register to not grow the index rows
+        for number, (file, info) in enumerate(expected.items()):
+            result = index_document(args, db, table, run, number, ids[number % len(ids)], file, info)
+            results.append(result)
+            print(f"{file} {result['latency']:.3f}s {result['extracted']} bytes recall {result['recall']:.3f}"
+                  f"{'' if result['marker'] else ' no marker'}")
+    finally:
+        if not args.keep:
+            db.execute(f"DELETE FROM {table}_files WHERE uniqid LIKE ?", (f"{run}%",))
+            db.commit()
+            shutil.rmtree(os.path.join(args.files, args.app, run))
+    report = {
+        "corpus": os.path.abspath(args.corpus),
+        "app": args.app,
+        "total": summary(results),
+        "types": {type: summary([result for result in results if result["type"] == type])
+                  for type in sorted({result["type"] for result in results})},
+    }
+    for type, data in list(report["types"].items()) + [("total", report["total"])]:
+        print(f"{type:<6} {data['files']:>6} files {data['bytes'] / 1048576:8.1f} MB in {data['extracted'] / 1048576:8.1f} MB out "
+              f"{data['bytes_per_second'] / 1024:10.1f} KB/s p50 {data['latency']['p50']:.3f}s p95 {data['latency']['p95']:.3f}s "
+              f"p99 {data['latency']['p99']:.3f}s recall {data['recall']:.3f} markers {data['markers']} empty {data['empty']}",
+              file=sys.stderr)
+    append_report(args.report, report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the text extraction of indexing_files with a corpus of documents")
+    parser.add_argument("corpus", help="Directory of the documents and the expected.json file made by sampledocs.py")
+    parser.add_argument("--database", default=os.path.join(ROOT_PATH, "code", "data", "files", "saltos.sqlite"),
+                        help="SQLite database of the instance")
+    parser.add_argument("--files", default=os.path.join(ROOT_PATH, "code", "data", "files"), help="Files directory of the instance")
+    parser.add_argument("--app", default="customers", help="App whose files table receives the documents")
+    parser.add_argument("--types", type=lambda value: [type for type in value.split(",") if type], help="Types of documents to index")
+    parser.add_argument("--limit", type=int, default=0, help="Max documents to index, 0 for all")
+    parser.add_argument("--php", default="php", help="PHP binary used to run the actions")
+    parser.add_argument("--keep", action="store_true", help="Keep the rows and the copies of the documents")
+    parser.add_argument("--report", help="File where the report is appended as a JSON line")
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark helpers
+
+This module provides the helpers shared by the benchmark scripts
+(scripts/bench*.py): the calls to the actions of SaltOS using the CLI SAPI,
+as the utest/test_cli_*.php tests do, with the stats of each request, the
+percentiles of the latencies and the JSON lines of the reports
+
+The actions are run from the code/api directory with php index.php <rest>,
+the JSON data is sent by the standard input and the user or the token by the
+environment, the CLI only accepts the user variable when the process is run
+by the owner of the files, as the cron and the setup actions require
+"""
+import os
+import json
+import time
+import subprocess
+
+ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+API_PATH = os.path.join(ROOT_PATH, "code", "api")
+
+
+def run_action(rest, data=None, user=None, token=None, php="php", env=None):
+    """
+    Runs the action of the rest path using the CLI and returns the decoded
+    JSON of the output (or the text when it is not JSON), the wall time of
+    the process, that includes the start of PHP and the load of the config,
+    and the stats that PHP writes to the standard error with the stats
+    environment variable (the time, the peak of memory and the queries of the
+    request), None when the action ends without output_handler, the env dict
+    contains other environment variables of the action, as the sample
+    directory of the setup
+    """
+    env = {**{key: value for key, value in os.environ.items() if key not in ("user", "token")}, **(env or {})}
+    env["stats"] = "1"
+    if user:
+        env["user"] = user
+    if token:
+        env["token"] = token
+    begin = time.perf_counter()
+    process = subprocess.run(
+        [php, "index.php", rest], cwd=API_PATH, env=env, capture_output=True,
+        input=json.dumps(data).encode("utf-8") if data is not None else b"")
+    wall = time.perf_counter() - begin
+    output = process.stdout.decode("utf-8", "replace")
+    if output[:1] in ("{", "["):
+        try:
+            output = json.loads(output)
+        except ValueError:
+            pass
+    stats = None
+    for line in process.stderr.decode("utf-8", "replace").splitlines():
+        if line.startswith('{"time"'):
+            stats = json.loads(line)
+    return output, wall, stats
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """
+    Returns the percentiles of the values as a dict of p<point> keys, using
+    the linear interpolation between the closest ranks
+    """
+    values = sorted(values)
+    result = {}
+    for point in points:
+        if not values:
+            result[f"p{point}"] = 0
+            continue
+        rank = (len(values) - 1) * point / 100
+        low = int(rank)
+        high = min(low + 1, len(values) - 1)
+        result[f"p{point}"] = values[low] + (values[high] - values[low]) * (rank - low)
+    return result
+
+
+def append_report(file, report):
+    """
+    Appends the report as a JSON line to the file, when the file is set
+    """
+    if file:
+        with open(file, "a", encoding="utf-8") as fd:
+            fd.write(json.dumps(report, sort_keys=True) + "\n")
+
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Search benchmark
+
+This script measures the latency of the full text search of the apps, that
+goes through the {table}_index tables filled by make_index with the fields
+of each register and the values of its foreign keys, and that uses one LIKE
+'%term%' by term (the MATCH AGAINST of mroonga is not used by SQLite), to
+see how the search scales with the rows of the app
+
+For each number of rows of --rows, the SQLite database of the instance is
+replaced by a copy whose app (customers by default) contains only that rows
+of generated records with text in all its fields (and --words words in its
+text fields), with the words of a vocabulary of --vocabulary pseudo words
+with a zipf distribution, so there are common and rare terms, and the
+control and index rows of the records are built in bulk as make_control and
+make_index do, the database is restored at the end
+
+The query set is made from the ranks of the vocabulary and replayed with
+the list/data action of the app using the CLI, as the search box of the list
+does with the first page (that counts the total): common words, medium
+words, rare words, multi word queries with the words of a record, prefixes
+of medium words and missing words, each query is repeated --repeat times
+and the same WHERE is run directly against the index table with SQLite to
+separate the time of the scan from the rest of the action
+
+The report of each number of rows contains the bytes of the index table,
+the percentiles of the time of the action measured by PHP, of the wall time
+and of the SQL time, and the mean result size by kind of query, and the
+median time and the result size of each query, printed as JSON lines to the
+standard output and appended to the --report file, and a table with the p50
+of each kind by number of rows is printed to the standard error, the runs
+can be recorded with --store using the rows as scale
+
+Usage:
+
+scripts/benchsearch.py [--app app] [--rows N,...] [--words N]
+                       [--queries N] [--repeat N] [--database file]
+                       [--report file] [--store [file]]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import statistics
+import itertools
+
+from benchlib import API_PATH, run_action, percentiles, append_report
+from benchstore import STORE, record
+from samplelib import read_dbschema, read_manifests
+from samplesqlite import open_database, make_meta
+
+KINDS = ("common", "medium", "rare", "multi", "prefix", "missing")
+
+SYLLABLES = ("ka", "lo", "mi", "ser", "tan", "vo", "ru", "pel", "di", "no", "gra", "the", "qui", "bas", "zu", "fen")
+
+
+def vocabulary(size, rng):
+    """
+    Returns the pseudo words of the vocabulary, unique and in the order of
+    their ranks, and the cumulative weights of its zipf distribution
+    """
+    words = []
+    seen = set()
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    weights = list(itertools.accumulate(1 / rank ** 1.1 for rank in range(1, size + 1)))
+    return words, weights
+
+
+def text(rng, words, weights, count, length=0):
+    """
+    Returns count words of the vocabulary, up to length chars if it is set
+    """
+    result = " ".join(rng.choices(words, cum_weights=weights, k=count))
+    return result[:length].rsplit(" ", 1)[0] if length and len(result) > length else result
+
+
+def fill_app(args, db, tables, manifests, rows, words, weights):
+    """
+    Replaces the registers of the app with rows generated records and builds
+    their control and index rows, and returns the words of some records used
+    by the multi word queries
+    """
+    table = manifests_table(manifests, args.app)
+    rng = random.Random(f"{args.seed}:{rows}")
+    for name in [table] + [f"{table}_{name}" for name in ("control", "version", "index", "files", "notes")]:
+        if name in tables:
+            db.execute(f"DELETE FROM {name}")
+    fields = [field for field in tables[table]["fields"] if not field["pkey"]]
+    fkeys = {}
+    for field in fields:
+        if field["fkey"]:
+            fkeys[field["name"]] = [row[0] for row in db.execute(f"SELECT id FROM {field['fkey']}")] or [0]
+    samples = []
+    db.execute("BEGIN")
+    names = ",".join(f"`{field['name']}`" for field in fields)
+    insert = f"INSERT INTO {table} (id, {names}) VALUES (?{',?' * len(fields)})"
+    for id in range(1, rows + 1):
+        values = [id]
+        for field in fields:
+            type = field["type"].upper()
+            size = re.search(r"VARCHAR\((\d+)\)", type)
+            if field["name"] in fkeys:
+                values.append(rng.choice(fkeys[field["name"]]))
+            elif field["name"] == "active":
+                values.append(1)
+            elif "TEXT" in type:
+                values.append(text(rng, words, weights, args.words))
+            elif size:
+                values.append(text(rng, words, weights, 8, int(size.group(1))))
+            else:
+                values.append(0)
+        db.execute(insert, values)
+        if len(samples) < args.queries * 2:
+            samples.append([value for value in values[1:] if isinstance(value, str)])
+    make_meta(db, tables, manifests, table, time.strftime("%Y-%m-%d %H:%M:%S"), ("control", "index"))
+    db.execute("COMMIT")
+    return samples
+
+
+def manifests_table(manifests, app):
+    table = next((table for table, spec in manifests.items() if spec.get("code") == app), None)
+    if not table:
+        sys.exit(f"The app {app} does not exist")
+    return table
+
+
+def query_set(args, words, samples, rng):
+    """
+    Returns the queries of each kind, as lists of kind and terms
+    """
+    size = len(words)
+    queries = []
+    for number in range(args.queries):
+        queries.append(("common", [words[number % 10]]))
+        queries.append(("medium", [words[rng.randrange(size // 100, size // 10)]]))
+        queries.append(("rare", [words[rng.randrange(size * 9 // 10, size)]]))
+        terms = " ".join(samples[number % len(samples)]).split()
+        queries.append(("multi", rng.sample(terms, min(rng.randint(2, 3), len(terms)))))
+        word = words[rng.randrange(size // 100, size // 10)]
+        queries.append(("prefix", [word[:max(4, len(word) * 2 // 3)]]))
+        queries.append(("missing", [f"xq{number}zj"]))
+    return queries
+
+
+def sql_time(db, table, terms, repeat):
+    """
+    Returns the median time and the rows of the WHERE of make_like_query run
+    directly against the index table
+    """
+    where = " AND ".join("search LIKE ?" for _ in terms)
+    params = [f"%{term}%" for term in terms]
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        count = db.execute(f"SELECT COUNT(*) FROM {table}_index WHERE {where}", params).fetchone()[0]
+        times.append(time.perf_counter() - begin)
+    return statistics.median(times), count
+
+
+def login(args):
+    output, _, _ = run_action("auth/login", {"user": args.user, "pass": args.password}, php=args.php)
+    if not isinstance(output, dict) or output.get("status") != "ok":
+        sys.exit(f"Could not login: {str(output)[:500]}")
+    return output["token"]
+
+
+def benchmark(args, rows, words, weights, backup):
+    """
+    Builds the database with the rows of the app, replays the queries and
+    returns the report
+    """
+    shutil.copyfile(backup, args.database)
+    tables = read_dbschema(core=True, auto=True)
+    manifests = read_manifests()
+    table = manifests_table(manifests, args.app)
+    # The exclusive lock of open_database is released before running PHP
+    db = open_database(args.database, journal=True)
+    samples = fill_app(args, db, tables, manifests, rows, words, weights)
+    db.close()
+    db = sqlite3.connect(args.database)
+    index = db.execute(f"SELECT IFNULL(SUM(LENGTH(search)), 0) FROM {table}_index").fetchone()[0]
+    token = login(args)
+    results = []
+    for kind, terms in query_set(args, words, samples, random.Random(args.seed)):
+        search = " ".join(terms)
+        times, walls, totals = [], [], []
+        for _ in range(args.repeat):
+            output, wall, stats = run_action(f"app/{args.app}/list/data", {"search": search}, token=token, php=args.php)
+            if not isinstance(output, dict) or "error" in output:
+                sys.exit(f"The search {search} failed: {str(output)[:500]}")
+            walls.append(wall)
+            if stats:
+                times.append(stats["time"])
+            total = re.search(r"(\d+)\s*$", str(output.get("footer", "")))
+            totals.append(int(total.group(1)) if total else len(output.get("data", [])))
+        sql, count = sql_time(db, table, terms, args.repeat)
+        results.append({
+            "kind": kind,
+            "search": search,
+            "results": totals[-1],
+            "index_results": count,
+            "time": statistics.median(times) if times else 0,
+            "wall": statistics.median(walls),
+            "sql": sql,
+        })
+    db.close()
+    report = {
+        "app": args.app,
+        "rows": rows,
+        "index_bytes": index,
+        "kinds": {},
+        "queries": [{key: round(value, 6) if isinstance(value, float) else value for key, value in result.items()}
+                    for result in results],
+    }
+    for kind in KINDS:
+        data = [result for result in results if result["kind"] == kind]
+        report["kinds"][kind] = {
+            **{key: {name: round(value, 6) for name, value in percentiles([result[key] for result in data]).items()}
+               for key in ("time", "wall", "sql")},
+            "results": round(statistics.mean(result["results"] for result in data), 1) if data else 0,
+        }
+    if args.store:
+        metrics = {}
+        for key in ("time", "sql"):
+            for kind in KINDS:
+                metrics[f"{kind}/{key}"] = [result[key] for result in results if result["kind"] == kind]
+        record(args.store, "search", metrics, "pdo_sqlite", rows, args.app,
+               {"words": args.words, "vocabulary": args.vocabulary, "repeat": args.repeat}, args.php)
+    return report
+
+
+def print_table(reports):
+    print(f"{'kind':<8} " + " ".join(f"{report['rows']:>12}" for report in reports), file=sys.stderr)
+    for kind in KINDS:
+        print(f"{kind:<8} " + " ".join(f"{report['kinds'][kind]['time']['p50'] * 1000:>10.1f}ms" for report in reports),
+              file=sys.stderr)
+    print(f"{'results':<8} " + " ".join(f"{statistics.mean(data['results'] for data in report['kinds'].values()):>12.1f}"
+                                        for report in reports), file=sys.stderr)
+    print(f"{'index':<8} " + " ".join(f"{report['index_bytes'] / 1048576:>10.1f}MB" for report in reports), file=sys.stderr)
+
+
+def main(args):
+    if not os.path.exists(args.database):
+        sys.exit(f"The database {args.database} does not exist")
+    rng = random.Random(args.seed)
+    words, weights = vocabulary(args.vocabulary, rng)
+    backup = args.database + ".benchsearch"
+    shutil.copyfile(args.database, backup)
+    reports = []
+    try:
+        for rows in args.rows:
+            report = benchmark(args, rows, words, weights, backup)
+            reports.append(report)
+            print(json.dumps(report, sort_keys=True))
+            append_report(args.report, report)
+    finally:
+        shutil.move(backup, args.database)
+    print_table(reports)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the latency of the full text search by rows of the app")
+    parser.add_argument("--app", default="customers", help="App whose registers are generated and searched")
+    parser.add_argument("--rows", type=lambda value: [int(rows) for rows in value.split(",") if rows],
+                        default=[100, 1000, 10000, 100000], help="Rows of the app of each run, as 100,1000,10000")
+    parser.add_argument("--words", type=int, default=200, help="Words of the text fields of each record")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Words of the vocabulary")
+    parser.add_argument("--queries", type=int, default=5, help="Queries of each kind")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of each query")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the records and the queries")
+    parser.add_argument("--database", default=os.path.join(API_PATH, "data", "files", "saltos.sqlite"),
+                        help="SQLite database of the instance, replaced during the benchmark")
+    parser.add_argument("--user", default="admin", help="User of the login")
+    parser.add_argument("--password", default="admin", help="Password of the login")
+    parser.add_argument("--php", default="php", help="PHP binary used to run the actions")
+    parser.add_argument("--report", help="File where the reports are appended as JSON lines")
+    parser.add_argument("--store", nargs="?", const=STORE, help="Record the times in the history of the benchmarks")
+    main(parser.parse_args())
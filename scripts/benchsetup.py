@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Setup benchmark
+
+This script measures the setup of SaltOS and the load of the sample data of
+the apps for each database driver and each scale factor of the sample data:
+for each scale the sample data is generated with scripts/sampleall.py in a
+directory of --data (the files that are current are kept between runs), and
+for each driver a new database is created, the setup action is run and then
+the setup/<app> action of each app, using the CLI as the makefile does
+
+The sample data of each scale is loaded by __setup_helper from the directory
+of the sample environment variable instead of the sample directory of the
+apps, and the output of the setup/<app> actions contains the time of the
+phases: the load of the files (the SQL load) and the control, version, index
+and log metadata of the registers, the other time is the rest of the action
+(the checks of the tables and the counts of the rows), the apps with its own
+setup (certs and emails) only report the total time
+
+The SQLite drivers (pdo_sqlite and sqlite3) use a new database file in the
+--data directory, and the MySQL drivers (pdo_mysql and mysqli) use the
+--mysql-name database of a local server, that is dropped and created again
+by the --mysql-client command before each run, so the user of --mysql-user
+must have all the privileges on it, the drivers are selected by the
+data/files/config.xml file of the instance, that is restored at the end
+
+The reports are printed as JSON lines to the standard output and appended to
+the --report file, and a table with the time of each phase by driver and
+scale is printed to the standard error and written to the --csv file, the
+script must be run by the owner of the files
+
+Usage:
+
+scripts/benchsetup.py [--drivers driver,...] [--scales N,...] [--apps app,...]
+                      [--data dir] [--jobs N] [--report file] [--csv file]
+                      [--store [file]]
+"""
+import os
+import csv
+import sys
+import json
+import shlex
+import shutil
+import argparse
+import subprocess
+from xml.sax.saxutils import escape, quoteattr
+
+from benchlib import ROOT_PATH, API_PATH, run_action, append_report
+from benchstore import STORE, record
+
+DRIVERS = ("pdo_sqlite", "sqlite3", "pdo_mysql", "mysqli")
+
+# Apps in the order of the setup of the makefile
+APPS = ("certs", "company", "emails", "crm", "hr", "purchases", "sales")
+
+PHASES = ("load", "control", "version", "index", "log", "other")
+
+CONFIG = os.path.join(API_PATH, "data", "files", "config.xml")
+
+
+def generate(args, scale):
+    """
+    Generates the sample data of the scale and returns its directory, the
+    generators skip the files that are current
+    """
+    directory = os.path.abspath(os.path.join(args.data, f"scale{scale:g}"))
+    apps = [app for app in args.apps if os.path.isdir(os.path.join(ROOT_PATH, "code", "apps", app, "sample", "sql"))]
+    if apps:
+        subprocess.run([sys.executable, os.path.join(ROOT_PATH, "scripts", "sampleall.py"), f"--scale={scale:g}",
+                        f"--output={directory}", f"--jobs={args.jobs}", *apps], stdout=sys.stderr, check=True)
+    return directory
+
+
+def reset_database(args, driver):
+    """
+    Creates a new database for the driver and writes the config of the
+    instance that uses it
+    """
+    if driver in ("pdo_sqlite", "sqlite3"):
+        file = os.path.abspath(os.path.join(args.data, "benchsetup.sqlite"))
+        if os.path.exists(file):
+            os.remove(file)
+        config = f"<file>{escape(file)}</file>"
+    else:
+        sql = f"DROP DATABASE IF EXISTS `{args.mysql_name}`; CREATE DATABASE `{args.mysql_name}`;"
+        subprocess.run(shlex.split(args.mysql_client), input=sql.encode("utf-8"), check=True)
+        attrs = {"host": args.mysql_host, "port": args.mysql_port, "name": args.mysql_name,
+                 "user": args.mysql_user, "pass": args.mysql_pass}
+        config = f"<{driver} " + " ".join(f"{key}={quoteattr(str(value))}" for key, value in attrs.items()) + "/>"
+    with open(CONFIG, "w", encoding="utf-8") as fd:
+        fd.write(f"<root><db><type>{driver}</type>{config}</db></root>\n")
+
+
+def failure(output):
+    """
+    Returns the error of the output of an action or None when it is right
+    """
+    if not isinstance(output, dict):
+        return str(output)[:500]
+    if "error" in output:
+        error = output["error"]
+        return str(error.get("text", error) if isinstance(error, dict) else error)[:500]
+    return None
+
+
+def benchmark(args, driver, scale, directory):
+    """
+    Runs the setup and the setup of the apps with a new database and returns
+    the report
+    """
+    reset_database(args, driver)
+    output, wall, _ = run_action("setup", php=args.php)
+    if failure(output):
+        sys.exit(f"The setup with {driver} failed: {failure(output)}")
+    report = {
+        "driver": driver,
+        "scale": scale,
+        "setup": {
+            "wall": round(wall, 6),
+            **{key: output[key]["time"] for key in ("db_schema", "db_static", "setup") if key in output},
+        },
+        "apps": {},
+    }
+    for app in args.apps:
+        output, wall, stats = run_action(f"setup/{app}", user=args.user, php=args.php, env={"sample": directory})
+        if failure(output) or "setup" not in output:
+            report["apps"][app] = {"wall": round(wall, 6), "error": failure(output) or str(output)[:500]}
+            print(f"{driver} {scale:g}x setup/{app} failed: {report['apps'][app]['error']}", file=sys.stderr)
+            continue
+        setup = output["setup"]
+        phases = dict(setup.get("phases", {}))
+        if phases:
+            phases["other"] = round(max(setup["time"] - sum(phases.values()), 0), 6)
+        total = setup["total"]
+        report["apps"][app] = {
+            "wall": round(wall, 6),
+            "time": setup["time"],
+            "phases": phases,
+            "rows": sum(total.values()) if isinstance(total, dict) else total,
+            "queries": stats["queries"] if stats else None,
+        }
+    apps = [data for data in report["apps"].values() if "time" in data]
+    report["time"] = round(sum(data["time"] for data in apps), 6)
+    report["rows"] = sum(data["rows"] for data in apps if data["phases"])
+    report["phases"] = {phase: round(sum(data["phases"].get(phase, 0) for data in apps), 6) for phase in PHASES}
+    seconds = sum(data["time"] for data in apps if data["phases"])
+    report["rows_per_second"] = round(report["rows"] / seconds, 3) if seconds else 0
+    if args.store:
+        metrics = {key: [value] for key, value in report["setup"].items()}
+        metrics.update({f"phases/{phase}": [value] for phase, value in report["phases"].items()})
+        metrics["rows_per_second"] = [report["rows_per_second"]]
+        for app, data in report["apps"].items():
+            if "time" in data:
+                metrics[f"{app}/time"] = [data["time"]]
+                metrics.update({f"{app}/{phase}": [value] for phase, value in data["phases"].items()})
+        record(args.store, "setup", metrics, driver, scale, directory, {"apps": args.apps}, args.php)
+    return report
+
+
+def table(reports):
+    """
+    Returns the rows of the comparison table of the reports
+    """
+    rows = [["driver", "scale", "rows", "schema", "static", *PHASES, "apps", "rows/s"]]
+    for report in reports:
+        rows.append([
+            report["driver"], f"{report['scale']:g}x", report["rows"],
+            report["setup"].get("db_schema", 0), report["setup"].get("db_static", 0),
+            *(report["phases"][phase] for phase in PHASES), report["time"], report["rows_per_second"],
+        ])
+    return rows
+
+
+def print_table(rows):
+    widths = [max(len(f"{row[column]}") for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(f"{value:>{width}}" for value, width in zip(row, widths)), file=sys.stderr)
+
+
+def main(args):
+    os.makedirs(args.data, exist_ok=True)
+    backup = None
+    if os.path.exists(CONFIG):
+        backup = CONFIG + ".benchsetup"
+        shutil.copyfile(CONFIG, backup)
+    reports = []
+    try:
+        for scale in args.scales:
+            directory = generate(args, scale)
+            for driver in args.drivers:
+                report = benchmark(args, driver, scale, directory)
+                reports.append(report)
+                print(json.dumps(report, sort_keys=True))
+                append_report(args.report, report)
+    finally:
+        if backup:
+            shutil.move(backup, CONFIG)
+        elif os.path.exists(CONFIG):
+            os.remove(CONFIG)
+    rows = table(reports)
+    print_table(rows)
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as fd:
+            csv.writer(fd).writerows(rows)
+
+
+def parse_list(choices):
+    def parse(value):
+        result = [item for item in value.split(",") if item]
+        unknown = [item for item in result if item not in choices]
+        if unknown or not result:
+            raise argparse.ArgumentTypeError(f"invalid items {','.join(unknown)}, the choices are {', '.join(choices)}")
+        return result
+    return parse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the setup and the load of the sample data by driver and scale")
+    parser.add_argument("--drivers", type=parse_list(DRIVERS), default=list(DRIVERS), help="Database drivers, all by default")
+    parser.add_argument("--scales", type=lambda value: [float(scale) for scale in value.split(",") if scale],
+                        default=[1, 10, 100, 1000], help="Scale factors of the sample data, as 1,10,100,1000")
+    parser.add_argument("--apps", type=parse_list(APPS), default=list(APPS), help="Apps whose setup is run, all by default")
+    parser.add_argument("--data", default="/tmp/benchsetup",
+                        help="Directory of the sample data of each scale and of the SQLite databases")
+    parser.add_argument("--jobs", type=int, default=1, help="Processes used to generate the sample data, 0 for all the CPUs")
+    parser.add_argument("--user", default="admin", help="User of the setup of the apps")
+    parser.add_argument("--php", default="php", help="PHP binary used to run the actions")
+    parser.add_argument("--mysql-client", default="mariadb", help="Command used to drop and create the MySQL database")
+    parser.add_argument("--mysql-host", default="localhost", help="Host of the MySQL server")
+    parser.add_argument("--mysql-port", type=int, default=3306, help="Port of the MySQL server")
+    parser.add_argument("--mysql-name", default="saltos_bench", help="MySQL database, dropped before each run")
+    parser.add_argument("--mysql-user", default="saltos", help="User of the MySQL database")
+    parser.add_argument("--mysql-pass", default="saltos", help="Password of the MySQL database")
+    parser.add_argument("--report", help="File where the reports are appended as JSON lines")
+    parser.add_argument("--csv", help="File where the comparison table is written as CSV")
+    parser.add_argument("--store", nargs="?", const=STORE, help="Record the times in the history of the benchmarks")
+    main(parser.parse_args())
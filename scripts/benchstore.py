@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Benchmark history
+
+This module stores the runs of the benchmark scripts (scripts/bench*.py with
+the --store option) in a SQLite database, by default code/data/bench/
+history.sqlite, each run with its benchmark, the git commit of the tree (and
+if it had local changes), the database driver, the scale and the dataset,
+the environment fingerprint (the host, the CPU, the memory and the versions
+of PHP and Python) and the samples of each metric, as the times of each
+request of an action or the time of each phase of the setup
+
+As script it compares the samples of each metric of the runs of a candidate
+commit (the commit of the last run by default) with the runs of a baseline,
+that is another commit (--baseline) or the last --rolling runs of other
+commits (the rolling baseline), using only the runs of the same benchmark,
+driver, scale and environment fingerprint, the samples of the runs of a
+commit are joined, so the metrics with one value by run (as the phases of
+the setup) need some runs by commit
+
+For each metric it reports the medians and the change of the median of the
+candidate, the bootstrap confidence interval of the change (resampling both
+groups --resamples times) and the p-value of the Mann-Whitney U test (with
+the normal approximation and the correction of the ties), a metric is a
+regression when the test is significant at --alpha, the confidence interval
+does not contain zero and the change is worse than --threshold, and an
+improvement in the other direction, the metrics where the higher is the
+better (rates and recalls) are reversed, and the script ends with error
+when some metric is a regression, to be used in the CI
+
+Usage:
+
+scripts/benchstore.py [--store file] [--list]
+scripts/benchstore.py [--store file] --bench name [--candidate commit]
+                      [--baseline commit | --rolling N] [--driver driver]
+                      [--scale N] [--metric text] [--threshold 0.1]
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import hashlib
+import sqlite3
+import argparse
+import platform
+import statistics
+import subprocess
+
+from benchlib import ROOT_PATH, API_PATH, percentiles, append_report
+
+STORE = os.path.join(ROOT_PATH, "code", "data", "bench", "history.sqlite")
+
+# Suffixes of the metrics where the higher is the better
+HIGHER = ("rps", "per_second", "recall", "markers")
+
+
+def connect(file):
+    """
+    Opens the store and creates its tables when they do not exist
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+    db = sqlite3.connect(file)
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            bench TEXT NOT NULL,
+            datetime TEXT NOT NULL,
+            commit_id TEXT NOT NULL,
+            dirty INTEGER NOT NULL,
+            driver TEXT NOT NULL,
+            scale REAL NOT NULL,
+            dataset TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            environment TEXT NOT NULL,
+            params TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS samples (
+            run_id INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            value REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS runs_bench ON runs (bench, driver, scale, fingerprint);
+        CREATE INDEX IF NOT EXISTS samples_run ON samples (run_id, metric);
+    """)
+    return db
+
+
+def git_commit():
+    """
+    Returns the commit of the tree and if the tree has local changes, unknown
+    when the tree is not a git repository
+    """
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT_PATH, capture_output=True, text=True).stdout.strip()
+    try:
+        commit = git("rev-parse", "HEAD")
+        dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    except OSError:
+        commit, dirty = "", False
+    return commit or "unknown", dirty
+
+
+def environment(php="php"):
+    """
+    Returns the environment of the runs and its fingerprint, the hash of the
+    environment, so only the runs of the same machine and versions are
+    compared
+    """
+    cpu = platform.processor()
+    memory = 0
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as fd:
+            cpu = next((line.split(":", 1)[1].strip() for line in fd if line.startswith("model name")), cpu)
+        with open("/proc/meminfo", encoding="utf-8") as fd:
+            memory = next((int(line.split()[1]) * 1024 for line in fd if line.startswith("MemTotal")), 0)
+    except OSError:
+        pass
+    try:
+        version = subprocess.run([php, "-r", "echo PHP_VERSION;"], cwd=API_PATH, capture_output=True,
+                                 text=True).stdout.strip()
+    except OSError:
+        version = ""
+    result = {
+        "host": socket.gethostname(),
+        "system": f"{platform.system()} {platform.release()} {platform.machine()}",
+        "cpu": cpu,
+        "cpus": os.cpu_count(),
+        "memory": memory,
+        "php": version,
+        "python": platform.python_version(),
+    }
+    return result, hashlib.sha256(json.dumps(result, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def record(file, bench, metrics, driver="", scale=0, dataset="", params=None, php="php"):
+    """
+    Records a run of a benchmark with the samples of its metrics, a dict of
+    lists of values, and returns the id of the run
+    """
+    commit, dirty = git_commit()
+    env, fingerprint = environment(php)
+    db = connect(file)
+    with db:
+        cursor = db.execute(
+            "INSERT INTO runs (bench, datetime, commit_id, dirty, driver, scale, dataset, fingerprint, environment, params) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (bench, time.strftime("%Y-%m-%d %H:%M:%S"), commit, int(dirty), driver or "", scale or 0, dataset or "",
+             fingerprint, json.dumps(env, sort_keys=True), json.dumps(params or {}, sort_keys=True, default=str)))
+        db.executemany("INSERT INTO samples (run_id, metric, value) VALUES (?, ?, ?)",
+                       [(cursor.lastrowid, metric, value) for metric, values in metrics.items() for value in values])
+    db.close()
+    return cursor.lastrowid
+
+
+def mann_whitney(first, second):
+    """
+    Returns the p-value of the two sided Mann-Whitney U test of the samples,
+    using the normal approximation with the correction of the ties
+    """
+    values = sorted([(value, 0) for value in first] + [(value, 1) for value in second])
+    ranks = [0.0] * len(values)
+    ties = 0
+    start = 0
+    while start < len(values):
+        end = start
+        while end + 1 < len(values) and values[end + 1][0] == values[start][0]:
+            end += 1
+        for index in range(start, end + 1):
+            ranks[index] = (start + end) / 2 + 1
+        ties += (end - start + 1) ** 3 - (end - start + 1)
+        start = end + 1
+    count1, count2 = len(first), len(second)
+    total = count1 + count2
+    rank1 = sum(rank for rank, (_, group) in zip(ranks, values) if not group)
+    u = rank1 - count1 * (count1 + 1) / 2
+    mean = count1 * count2 / 2
+    variance = count1 * count2 / 12 * ((total + 1) - ties / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def bootstrap(first, second, resamples, alpha, rng):
+    """
+    Returns the confidence interval of the relative change of the median of
+    the second samples over the first ones, resampling both groups
+    """
+    changes = []
+    for _ in range(resamples):
+        base = statistics.median(rng.choices(first, k=len(first)))
+        other = statistics.median(rng.choices(second, k=len(second)))
+        if base:
+            changes.append(other / base - 1)
+    interval = percentiles(changes, (alpha * 50, 100 - alpha * 50))
+    return list(interval.values())
+
+
+def compare(args, first, second, higher, rng):
+    """
+    Returns the comparison of the samples of a metric, higher tells if the
+    higher values of the metric are the better
+    """
+    base = statistics.median(first)
+    other = statistics.median(second)
+    change = other / base - 1 if base else 0
+    low, high = bootstrap(first, second, args.resamples, args.alpha, rng)
+    pvalue = mann_whitney(first, second)
+    sign = -1 if higher else 1
+    verdict = "same"
+    if pvalue < args.alpha and (low > 0 or high < 0):
+        if change * sign > args.threshold:
+            verdict = "regression"
+        elif change * sign < -args.threshold:
+            verdict = "improvement"
+        else:
+            verdict = "small"
+    return {
+        "baseline": {"samples": len(first), "median": round(base, 6)},
+        "candidate": {"samples": len(second), "median": round(other, 6)},
+        "change": round(change, 4),
+        "interval": [round(low, 4), round(high, 4)],
+        "pvalue": round(pvalue, 6),
+        "verdict": verdict,
+    }
+
+
+def select_runs(db, args):
+    """
+    Returns the ids of the runs of the candidate and of the baseline
+    """
+    where = "bench = ?"
+    params = [args.bench]
+    for key in ("driver", "scale", "fingerprint"):
+        if getattr(args, key) is not None:
+            where += f" AND {key} = ?"
+            params.append(getattr(args, key))
+    runs = db.execute(f"SELECT id, commit_id, fingerprint FROM runs WHERE {where} ORDER BY id", params).fetchall()
+    if not runs:
+        sys.exit(f"There are no runs of {args.bench} with these filters")
+    if args.fingerprint is None:
+        # Only the runs of the environment of the last run are compared
+        runs = [run for run in runs if run[2] == runs[-1][2]]
+    candidate = args.candidate or runs[-1][1]
+    matches = {run[1] for run in runs if run[1].startswith(candidate)}
+    if len(matches) != 1:
+        sys.exit(f"The candidate {candidate} matches {len(matches)} commits")
+    candidate = matches.pop()
+    second = [run[0] for run in runs if run[1] == candidate]
+    if args.baseline:
+        matches = {run[1] for run in runs if run[1].startswith(args.baseline)}
+        if len(matches) != 1:
+            sys.exit(f"The baseline {args.baseline} matches {len(matches)} commits")
+        baseline = matches.pop()
+        first = [run[0] for run in runs if run[1] == baseline]
+    else:
+        baseline = f"rolling {args.rolling}"
+        first = [run[0] for run in runs if run[1] != candidate and run[0] < second[0]][-args.rolling:]
+    if not first:
+        sys.exit(f"There are no runs of the baseline {baseline}")
+    return candidate, second, baseline, first
+
+
+def samples(db, ids, metric):
+    """
+    Returns the samples of the runs by metric
+    """
+    result = {}
+    marks = ",".join("?" * len(ids))
+    query = f"SELECT metric, value FROM samples WHERE run_id IN ({marks}) AND metric LIKE ? ORDER BY run_id, rowid"
+    for name, value in db.execute(query, [*ids, f"%{metric}%"]):
+        result.setdefault(name, []).append(value)
+    return result
+
+
+def list_runs(db):
+    for row in db.execute("SELECT r.id, datetime, bench, substr(commit_id, 1, 10), dirty, driver, scale, dataset, "
+                          "fingerprint, COUNT(DISTINCT metric), COUNT(value) "
+                          "FROM runs r LEFT JOIN samples ON run_id = r.id GROUP BY r.id ORDER BY r.id"):
+        run, date, bench, commit, dirty, driver, scale, dataset, fingerprint, metrics, values = row
+        print(f"{run:>6} {date} {bench:<10} {commit}{'+' if dirty else ' '} {driver or '-':<10} {scale:g}x "
+              f"{fingerprint} {metrics:>5} metrics {values:>8} samples {dataset}")
+
+
+def main(args):
+    if not os.path.exists(args.store):
+        sys.exit(f"The store {args.store} does not exist")
+    db = connect(args.store)
+    if args.list:
+        list_runs(db)
+        return
+    if not args.bench:
+        sys.exit("The --bench option is needed to compare")
+    candidate, second, baseline, first = select_runs(db, args)
+    data1 = samples(db, first, args.metric)
+    data2 = samples(db, second, args.metric)
+    rng = random.Random(args.seed)
+    report = {
+        "bench": args.bench,
+        "candidate": {"commit": candidate, "runs": second},
+        "baseline": {"commit": baseline, "runs": first},
+        "metrics": {},
+    }
+    for metric in sorted(set(data1) & set(data2)):
+        report["metrics"][metric] = compare(args, data1[metric], data2[metric], metric.endswith(HIGHER), rng)
+    print(f"candidate {candidate[:10]} ({len(second)} runs) baseline {baseline[:10]} ({len(first)} runs)")
+    for metric, data in report["metrics"].items():
+        if args.all or data["verdict"] != "same":
+            print(f"  {metric:<40} {data['baseline']['median']:>12.6f} {data['candidate']['median']:>12.6f} "
+                  f"{data['change'] * 100:+7.1f}% [{data['interval'][0] * 100:+7.1f}%, {data['interval'][1] * 100:+7.1f}%] "
+                  f"p {data['pvalue']:.4f} {data['verdict']}")
+    regressions = [metric for metric, data in report["metrics"].items() if data["verdict"] == "regression"]
+    print(f"{len(report['metrics'])} metrics, {len(regressions)} regressions")
+    append_report(args.report, report)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the runs of the benchmarks between commits")
+    parser.add_argument("--store", default=STORE, help="SQLite database of the history of the benchmarks")
+    parser.add_argument("--list", action="store_true", help="List the runs of the store")
+    parser.add_argument("--bench", help="Benchmark to compare, as actions, setup or http")
+    parser.add_argument("--candidate", help="Commit (or prefix) of the candidate, the commit of the last run by default")
+    parser.add_argument("--baseline", help="Commit (or prefix) of the baseline")
+    parser.add_argument("--rolling", type=int, default=5, help="Runs of the rolling baseline, when --baseline is not set")
+    parser.add_argument("--driver", help="Driver of the runs")
+    parser.add_argument("--scale", type=float, help="Scale of the runs")
+    parser.add_argument("--fingerprint", help="Environment of the runs, the environment of the last run by default")
+    parser.add_argument("--metric", default="", help="Text that the compared metrics contain")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Min relative change of a regression, 0.1 is 10%%")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level of the tests and the intervals")
+    parser.add_argument("--resamples", type=int, default=2000, help="Resamples of the bootstrap")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the bootstrap")
+    parser.add_argument("--all", action="store_true", help="Print all the metrics, not only the changed ones")
+    parser.add_argument("--report", help="File where the comparison is appended as a JSON line")
+    main(parser.parse_args())
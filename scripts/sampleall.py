@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Sample data of all the apps
+
+This script generates the sample data of all the apps in one process: the
+generators of code/apps/*/sample/python are imported as modules and their
+main functions are called with the options parsed here, so the Python
+interpreter, the Faker instance and the pools of values are loaded only once
+instead of once for each generator
+
+The files are written in the sample directory of each app (sample/sql, or
+sample/eml for the emails), or in a directory for each app inside --output
+
+The generators run one after the other in the order of their names (step1.py
+before step2.py in the emails), --jobs is passed to them and is used to
+generate the shards of each table in parallel, the generators are not run in
+parallel to not nest the pools of processes
+
+With --append only the generators of the tables that grow are used, the
+lookup tables and the emails keep the files of the first run
+
+The generators with their own options (as the conversations of the emails)
+define an options function that receives the parser, and their options are
+added to the options of this script
+
+Usage:
+
+scripts/sampleall.py [common options] [apps]
+
+Without apps, processes all the apps with sample/python files
+"""
+import os
+import sys
+import time
+import copy
+import importlib.util
+
+from samplelib import APPS_PATH, LOOKUPS, parse_args
+
+
+def sample_dir(app):
+    """
+    Returns the directory where the sample files of an app are stored
+    """
+    return os.path.join(APPS_PATH, app, "sample", "eml" if app == "emails" else "sql")
+
+
+# Generators of each app, imported only once
+_generators = {}
+
+
+def generators(app):
+    """
+    Returns the generators of an app, imported as modules with a name that
+    contains the app to avoid collisions between apps
+    """
+    if app in _generators:
+        return _generators[app]
+    path = os.path.join(APPS_PATH, app, "sample", "python")
+    modules = []
+    for file in sorted(os.listdir(path)):
+        if not file.endswith(".py"):
+            continue
+        name = f"sample_{app}_{file[:-3]}"
+        spec = importlib.util.spec_from_file_location(name, os.path.join(path, file))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        modules.append((file, module))
+    _generators[app] = modules
+    return modules
+
+
+def all_apps():
+    """
+    Returns the apps with sample/python files
+    """
+    return sorted(
+        app for app in os.listdir(APPS_PATH) if os.path.isdir(os.path.join(APPS_PATH, app, "sample", "python"))
+    )
+
+
+def options(parser):
+    parser.add_argument("apps", nargs="*", help="Apps to generate, all the apps with sample/python files by default")
+    # Without --output each app is written in its own sample directory
+    parser.set_defaults(output="")
+    for app in all_apps():
+        for _, module in generators(app):
+            if hasattr(module, "options"):
+                module.options(parser)
+
+
+if __name__ == "__main__":
+    args = parse_args("Generate the sample data of all the apps", options)
+    apps = args.apps or all_apps()
+    unknown = [app for app in apps if app not in all_apps()]
+    if unknown:
+        sys.exit(f"Apps without sample/python files: {', '.join(unknown)}")
+    if args.append and not args.output:
+        sys.exit("--append requires --output to not replace the sample files of the apps")
+    start = time.perf_counter()
+    for app in apps:
+        if args.append and app == "emails":
+            continue
+        app_args = copy.copy(args)
+        app_args.output = os.path.join(args.output, app) if args.output else sample_dir(app)
+        os.makedirs(app_args.output, exist_ok=True)
+        for file, module in generators(app):
+            if args.append and file[:-3] in LOOKUPS:
+                continue
+            begin = time.perf_counter()
+            module.main(app_args)
+            print(f"{app}/{file} {time.perf_counter() - begin:.2f}s")
+    print(f"total {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Churn of the sample data
+
+This script generates a stream of updates and deletes against an existing
+dataset, as changes of the status of the invoices, flips of the paid flag,
+edits of the address of the customers or deletes of meetings, to measure how
+the version, index and log tables grow and slow down after many edits
+
+The ids of the registers are chosen between the ids of the dataset, read with
+read_state from a SQLite database or from the JSON state file of --append,
+the registers deleted by the stream are not used again by the next operations
+or by the next runs (the deleted ids are kept in the JSON state file, and are
+the gaps of the ids of the SQLite database once the stream is run), and the
+registers are chosen with the distribution of --dist for table.id,
+as app_invoices.id=zipf:1.1 to edit more the newest invoices, the deleted
+ids drawn are replaced by the closest id that is not deleted, and the
+operations of the tables whose registers are all deleted are skipped and
+reported with the counts of the operations
+
+The stream is written as a .sql.gz file of UPDATE and DELETE statements
+grouped in transactions, that changes only the data of the tables and uses
+plain BEGIN and COMMIT statements because it is run with the clients of the
+databases, as zcat churn.sql.gz | sqlite3 saltos.sqlite, or with
+--api as a .sh.gz script of calls to the update and delete actions of the
+apps using the CLI of SaltOS, that also adds the control, log, version and
+index rows of each edit as the user interface does, the script must be run
+from the code/api directory by the owner of the files, as zcat churn.sh.gz | sh
+
+The operations are defined in the OPERATIONS dict, each operation has the
+table, the action (update or delete), the default weight and the function that
+returns the values of count updates, and the --mix option changes the weights
+
+Usage:
+
+scripts/samplechurn.py --dataset file [--api] [--mix op=weight,...] [options]
+
+The --scale option sets the number of operations, 100 by each unit of scale
+"""
+import os
+import sys
+import json
+import gzip
+import sqlite3
+import argparse
+
+from samplelib import (
+    COMPRESSLEVEL,
+    parse_args,
+    scaled,
+    table_rows,
+    read_state,
+    read_manifests,
+    ref_date,
+    sample,
+    fkeys,
+    shard_numpy,
+    sql_value,
+)
+
+
+def dates(args, nrng, count, low, high):
+    """
+    Returns count dates between the reference date moved low and high days
+    """
+    return [ref_date(args, day).isoformat() for day in nrng.integers(low, high + 1, count).tolist()]
+
+
+def lookups(nrng, table, count):
+    """
+    Returns count ids of a lookup table
+    """
+    return nrng.integers(1, table_rows(table, 1) + 1, count).tolist()
+
+
+def invoice_status(args, nrng, count):
+    return [{"status_id": value} for value in lookups(nrng, "app_invoices_status", count)]
+
+
+def invoice_paid(args, nrng, count):
+    return [
+        {"is_paid": paid, "paid_date": day if paid else "0000-00-00"}
+        for paid, day in zip(nrng.integers(0, 2, count).tolist(), dates(args, nrng, count, -30, 0))
+    ]
+
+
+def customer_address(args, nrng, count):
+    return [
+        {"address": address.replace("\n", ", "), "city": city, "province": province, "zip": zip}
+        for address, city, province, zip in zip(
+            sample(args, nrng, "street_address", count), sample(args, nrng, "city", count),
+            sample(args, nrng, "state", count), sample(args, nrng, "postcode", count))
+    ]
+
+
+def lead_status(args, nrng, count):
+    return [{"status_id": value} for value in lookups(nrng, "app_leads_status", count)]
+
+
+def quote_status(args, nrng, count):
+    return [{"status_id": value} for value in lookups(nrng, "app_quotes_status", count)]
+
+
+def purchase_status(args, nrng, count):
+    return [{"status_id": value} for value in lookups(nrng, "app_purchase_status", count)]
+
+
+def workorder_hours(args, nrng, count):
+    return [{"hours": value} for value in nrng.uniform(1, 8, count).round(2).tolist()]
+
+
+def product_stock(args, nrng, count):
+    return [{"stock": value} for value in nrng.integers(0, 500, count).tolist()]
+
+
+# Operations of the stream: table, action, default weight and the function
+# that returns the values of the updates (None for the deletes)
+OPERATIONS = {
+    "invoice_status": ("app_invoices", "update", 25, invoice_status),
+    "invoice_paid": ("app_invoices", "update", 20, invoice_paid),
+    "customer_address": ("app_customers", "update", 15, customer_address),
+    "lead_status": ("app_leads", "update", 10, lead_status),
+    "quote_status": ("app_quotes", "update", 8, quote_status),
+    "purchase_status": ("app_purchase", "update", 5, purchase_status),
+    "workorder_hours": ("app_workorders", "update", 5, workorder_hours),
+    "product_stock": ("app_products", "update", 5, product_stock),
+    "meeting_delete": ("app_meetings", "delete", 4, None),
+    "workorder_delete": ("app_workorders", "delete", 3, None),
+}
+
+
+def sql_statement(table, action, id, values):
+    """
+    Returns the UPDATE or DELETE statement of an operation
+    """
+    if action == "delete":
+        return f"DELETE FROM `{table}` WHERE `id`={id};\n"
+    fields = ", ".join(f"`{field}`={sql_value(value)}" for field, value in values.items())
+    return f"UPDATE `{table}` SET {fields} WHERE `id`={id};\n"
+
+
+def api_call(app, action, id, values):
+    """
+    Returns the line of the shell script that calls the action of the app
+    using the CLI of SaltOS, the JSON is sent by the standard input and the
+    deletes read it from /dev/null to not consume the script
+    """
+    if action == "delete":
+        return f"user=admin php index.php app/{app}/delete/{id} < /dev/null\n"
+    data = json.dumps(values, ensure_ascii=False).replace("'", "'\\''")
+    return f"printf '%s' '{data}' | user=admin php index.php app/{app}/update/{id}\n"
+
+
+def parse_mix(mix):
+    """
+    Returns the weights of the operations with the changes of --mix, as
+    invoice_status=50,meeting_delete=0
+    """
+    weights = {name: operation[2] for name, operation in OPERATIONS.items()}
+    for item in filter(None, mix.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS or not weight.replace(".", "", 1).isdigit():
+            raise argparse.ArgumentTypeError(f"invalid item {item}, the operations are {', '.join(OPERATIONS)}")
+        weights[name] = float(weight)
+    if not sum(weights.values()):
+        raise argparse.ArgumentTypeError("some operation must have weight")
+    return weights
+
+
+def read_deleted(file, tables):
+    """
+    Returns the ids of the tables deleted by the previous runs, as a dict of
+    table and set of ids, read from the deleted key of a JSON state file or
+    from the gaps of the ids of a SQLite database
+    """
+    if file.endswith(".json"):
+        return {table: set(ids) for table, ids in read_state(file).get("deleted", {}).items()}
+    db = sqlite3.connect(f"file:{file}?mode=ro", uri=True)
+    deleted = {}
+    for table in tables:
+        gaps = set()
+        last = 0
+        for (id,) in db.execute(f"SELECT id FROM {table} ORDER BY id"):
+            gaps.update(range(last + 1, id))
+            last = id
+        deleted[table] = gaps
+    db.close()
+    return deleted
+
+
+def write_deleted(file, deleted):
+    """
+    Writes the deleted ids to the deleted key of a JSON state file, with a
+    rename as write_state, the SQLite databases do not need it because the
+    deleted ids are gaps once the stream is run
+    """
+    if not file.endswith(".json"):
+        return
+    state = read_state(file)
+    state["deleted"] = {table: sorted(ids) for table, ids in sorted(deleted.items()) if ids}
+    temp = f"{file}.{os.getpid()}"
+    with open(temp, "w", encoding="utf-8") as fd:
+        json.dump(state, fd, indent=4, sort_keys=True)
+    os.replace(temp, file)
+
+
+def live_id(id, high, deleted):
+    """
+    Returns the closest id to id that is not deleted, searching first the
+    older ids and then the newer ones, or None if all the ids are deleted
+    """
+    if len(deleted) >= high:
+        return None
+    for candidate in range(id, 0, -1):
+        if candidate not in deleted:
+            return candidate
+    for candidate in range(id + 1, high + 1):
+        if candidate not in deleted:
+            return candidate
+    return None
+
+
+def churn(args, weights, ids, counts, skipped, deleted):
+    """
+    Generates the operations in blocks of --shard operations and yields the
+    table, the action, the id and the values of each operation, the
+    operations of the tables without registers are skipped, counts the
+    operations yielded by operation in the counts dict and the operations
+    skipped because all the registers of the table are deleted in the skipped
+    dict, and adds the ids of the deletes to the deleted dict, whose ids are
+    replaced by the closest id that is not deleted
+    """
+    names = [name for name in OPERATIONS if weights[name] and ids.get(OPERATIONS[name][0])]
+    if not names:
+        sys.exit("The dataset does not contain registers of the tables of the operations")
+    total = sum(weights[name] for name in names)
+    counts.update({name: 0 for name in names})
+    skipped.update({name: 0 for name in names})
+    count = scaled(100, args.scale)
+    for shard, first in enumerate(range(0, count, args.shard)):
+        size = min(args.shard, count - first)
+        nrng = shard_numpy("churn", args.seed, shard)
+        kinds = nrng.choice(len(names), size, p=[weights[name] / total for name in names])
+        values = {}
+        targets = {}
+        for kind, name in enumerate(names):
+            table, _, _, function = OPERATIONS[name]
+            number = int((kinds == kind).sum())
+            values[name] = iter(function(args, nrng, number) if function else [None] * number)
+            targets[name] = iter(fkeys(args, nrng, f"{table}.id", ids[table], number).tolist())
+        for kind in kinds.tolist():
+            name = names[kind]
+            table, action, _, _ = OPERATIONS[name]
+            # The deleted registers are replaced by the closest live id of the table
+            id = live_id(next(targets[name]), ids[table], deleted.setdefault(table, set()))
+            if id is None:
+                next(values[name])
+                skipped[name] += 1
+                continue
+            if action == "delete":
+                deleted[table].add(id)
+            counts[name] += 1
+            yield table, action, id, next(values[name])
+
+
+def options(parser):
+    parser.add_argument("--dataset", required=True, help="SQLite database or .json state file of the dataset to change")
+    parser.add_argument("--api", action="store_true",
+                        help="Write a script of calls to the actions instead of SQL, that only changes the data tables "
+                             "and leaves the control, version, index and log rows stale")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(""),
+                        help="Weights of the operations, as invoice_status=50,meeting_delete=0")
+
+
+if __name__ == "__main__":
+    args = parse_args("Generate a stream of updates and deletes of the sample data", options)
+    ids = read_state(args.dataset)["tables"]
+    deleted = read_deleted(args.dataset, sorted({table for table, _, _, _ in OPERATIONS.values() if ids.get(table)}))
+    manifests = read_manifests()
+    counts = {}
+    skipped = {}
+    file = os.path.join(args.output, "churn.sh.gz" if args.api else "churn.sql.gz")
+    with open(file, "wb") as fd:
+        with gzip.GzipFile(fileobj=fd, mode="wb", compresslevel=COMPRESSLEVEL, mtime=0) as gz:
+            if args.api:
+                gz.write(b"#!/bin/sh\n# Run from the code/api directory as zcat churn.sh.gz | sh\n")
+            statement = 0
+            for statement, (table, action, id, values) in enumerate(churn(args, args.mix, ids, counts, skipped, deleted), 1):
+                if args.api:
+                    line = api_call(manifests[table]["code"], action, id, values)
+                else:
+                    line = sql_statement(table, action, id, values)
+                    if (statement - 1) % args.commit == 0:
+                        line = ("COMMIT;\n" if statement > 1 else "") + "BEGIN;\n" + line
+                gz.write(line.encode("utf-8"))
+            if not args.api and statement:
+                gz.write(b"COMMIT;\n")
+    write_deleted(args.dataset, deleted)
+    for name, count in counts.items():
+        print(f"{name} {count}" + (f" ({skipped[name]} skipped, all the registers are deleted)" if skipped[name] else ""))
+    print(file)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Documents corpus
+
+This script generates a corpus of documents with known text to measure the
+text extraction of indexing_files (unoconv2txt, that uses pdftotext,
+LibreOffice and tesseract), each document has a random number of pages
+between 1 and --pages with --words words by page chosen from a fixed
+vocabulary, and the first line of each document contains a marker that is
+unique in the corpus:
+
+- pdf => PDF with a page for each page of text, written without libraries
+  with the Helvetica font, so pdftotext extracts the text
+- odt => OpenDocument text with a page break before each page
+- docx => Office Open XML document with a page break between the pages
+- xlsx => Office Open XML workbook with a sheet for each page, a row for
+  each line and three words by cell
+- png => image of one page with the text drawn with a big font, only the
+  first 100 words of the page because the text must be read by the OCR,
+  uses PIL that is imported only when the images are generated
+- txt => plain text with a form feed between the pages
+
+The documents are written as doc_<type>_<n>.<ext> files, the zip files use a
+fixed time and the PDF files do not contain dates, so the same options
+produce the same bytes, and the expected.json file contains for each file
+the type, the pages, the words, the bytes, the marker and the text that the
+extraction must find, scripts/benchindexing.py uses it to check the text
+extracted by indexing_files
+
+Usage:
+
+scripts/sampledocs.py [--types type,...] [--pages N] [--words N] [options]
+
+The --scale option sets the number of documents of each type, 10 by each
+unit of scale, and --jobs the processes used to generate them
+"""
+import os
+import io
+import json
+import zlib
+import zipfile
+import argparse
+from multiprocessing import Pool
+from xml.sax.saxutils import escape
+
+from samplelib import parse_args, scaled, shard_random
+
+# Words of the documents, plain ASCII words that the fonts of the PDF and
+# the OCR of the images can represent without problems
+VOCABULARY = """
+account address agenda amount answer april balance bank board budget build
+business buyer calendar campaign capital carrier center change client color
+company contract copy corner cost country credit customer daily dealer delivery
+design detail discount document driver east energy engine estimate event export
+factory family field figure finance flight format forest garden global group
+harbor health history holiday hotel house import income index invoice island
+journal kitchen label ladder language letter level license limit market matter
+meeting member method model monday motor mountain network number office order
+orange owner package paper partner payment people period phone planet policy
+price product profit project quality quarter question radio record region report
+river safety salary sample season service shipping signal silver south station
+status stock storage street summer supplier system table target tax team ticket
+timber total tower trade train transfer travel value vendor version village
+volume warehouse water weekly window winter worker yellow
+""".split()
+
+# Words of each line and lines of the text of the images
+LINE_WORDS = 12
+IMAGE_WORDS = 100
+
+# Fixed time of the entries of the zip files
+ZIP_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def document_text(rng, args, marker):
+    """
+    Returns the pages of a document as lists of lines, the first line of the
+    first page starts with the marker
+    """
+    pages = []
+    for _ in range(rng.randint(1, args.pages)):
+        words = rng.choices(VOCABULARY, k=args.words)
+        pages.append([" ".join(words[i:i + LINE_WORDS]) for i in range(0, len(words), LINE_WORDS)])
+    pages[0][0] = f"{marker} {pages[0][0]}"
+    return pages
+
+
+def pdf_string(text):
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def write_pdf(pages):
+    """
+    Returns a PDF with a page of A4 for each page, the size of the font
+    depends of the lines of the page to keep all the lines in the page
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for lines in pages:
+        leading = min(14, 740 / len(lines))
+        stream = [f"BT /F1 {leading * 0.8:.2f} Tf {leading:.2f} TL 50 800 Td"]
+        stream.extend(f"{pdf_string(line)} Tj T*" for line in lines)
+        stream.append("ET")
+        content = zlib.compress("\n".join(stream).encode("latin-1"))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("ascii")
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, data in enumerate(objects, 1):
+        offsets.append(pdf.tell())
+        pdf.write(b"%d 0 obj\n%s\nendobj\n" % (number, data))
+    xref = pdf.tell()
+    pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    pdf.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objects) + 1, xref))
+    return pdf.getvalue()
+
+
+def write_zip(files):
+    """
+    Returns a zip file with the files of the dict, the first file is stored
+    without compression as the mimetype of the OpenDocument files requires
+    """
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zip:
+        for number, (name, content) in enumerate(files.items()):
+            info = zipfile.ZipInfo(name, ZIP_TIME)
+            info.compress_type = zipfile.ZIP_STORED if number == 0 else zipfile.ZIP_DEFLATED
+            zip.writestr(info, content)
+    return data.getvalue()
+
+
+def write_odt(pages):
+    paragraphs = []
+    for number, lines in enumerate(pages):
+        for index, line in enumerate(lines):
+            style = ' text:style-name="P1"' if number and not index else ""
+            paragraphs.append(f"<text:p{style}>{escape(line)}</text:p>")
+    content = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+        'xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" '
+        'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+        'xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0" office:version="1.2">'
+        '<office:automatic-styles><style:style style:name="P1" style:family="paragraph">'
+        '<style:paragraph-properties fo:break-before="page"/></style:style></office:automatic-styles>'
+        f'<office:body><office:text>{"".join(paragraphs)}</office:text></office:body></office:document-content>'
+    )
+    manifest = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">'
+        '<manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.text"/>'
+        '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+        '</manifest:manifest>'
+    )
+    return write_zip({
+        "mimetype": "application/vnd.oasis.opendocument.text",
+        "META-INF/manifest.xml": manifest,
+        "content.xml": content,
+    })
+
+
+def ooxml_package(main, parts):
+    """
+    Returns the content types and the relations of an Office Open XML file
+    with the main part and the other parts, as (name, content type) pairs
+    """
+    overrides = "".join(f'<Override PartName="/{name}" ContentType="{type}"/>' for name, type in [main] + parts)
+    return {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            f'<Default Extension="xml" ContentType="application/xml"/>{overrides}</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            f'Target="{main[0]}"/></Relationships>'
+        ),
+    }
+
+
+def write_docx(pages):
+    paragraphs = []
+    for number, lines in enumerate(pages):
+        if number:
+            paragraphs.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+        paragraphs.extend(f"<w:p><w:r><w:t>{escape(line)}</w:t></w:r></w:p>" for line in lines)
+    files = ooxml_package(
+        ("word/document.xml", "application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"), [])
+    files["word/document.xml"] = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(paragraphs)}</w:body></w:document>'
+    )
+    return write_zip(files)
+
+
+def write_xlsx(pages):
+    sheet_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+    files = ooxml_package(
+        ("xl/workbook.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"),
+        [(f"xl/worksheets/sheet{number}.xml", sheet_type) for number in range(1, len(pages) + 1)])
+    sheets = []
+    relations = []
+    for number, lines in enumerate(pages, 1):
+        sheets.append(f'<sheet name="Page {number}" sheetId="{number}" r:id="rId{number}"/>')
+        relations.append(
+            f'<Relationship Id="rId{number}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{number}.xml"/>')
+        rows = []
+        for row, line in enumerate(lines, 1):
+            words = line.split(" ")
+            cells = "".join(
+                f'<c r="{chr(65 + column)}{row}" t="inlineStr"><is><t>{escape(" ".join(words[3 * column:3 * column + 3]))}</t></is></c>'
+                for column in range((len(words) + 2) // 3))
+            rows.append(f'<row r="{row}">{cells}</row>')
+        files[f"xl/worksheets/sheet{number}.xml"] = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<cols><col min="1" max="5" width="40" customWidth="1"/></cols>'
+            f'<sheetData>{"".join(rows)}</sheetData></worksheet>'
+        )
+    files["xl/workbook.xml"] = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets>{"".join(sheets)}</sheets></workbook>'
+    )
+    files["xl/_rels/workbook.xml.rels"] = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'{"".join(relations)}</Relationships>'
+    )
+    return write_zip(files)
+
+
+def write_png(pages):
+    """
+    Returns a PNG of an A4 page at 150 dpi with the lines of the first page
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 32)
+    except OSError:
+        font = ImageFont.load_default()
+    img = Image.new("L", (1240, 1754), color=255)
+    draw = ImageDraw.Draw(img)
+    for row, line in enumerate(pages[0]):
+        draw.text((60, 60 + 48 * row), line, font=font, fill=0)
+    data = io.BytesIO()
+    img.save(data, "PNG")
+    return data.getvalue()
+
+
+def write_txt(pages):
+    return "\f".join("\n".join(lines) + "\n" for lines in pages).encode("utf-8")
+
+
+# Types of documents: extension and writer
+TYPES = {
+    "pdf": ("pdf", write_pdf),
+    "odt": ("odt", write_odt),
+    "docx": ("docx", write_docx),
+    "xlsx": ("xlsx", write_xlsx),
+    "png": ("png", write_png),
+    "txt": ("txt", write_txt),
+}
+
+
+def write_document(task):
+    """
+    Generates and writes a document and returns its file and its expected
+    outcome
+    """
+    args, type, number = task
+    rng = shard_random("docs", args.seed, number, type)
+    marker = f"SALTOS{type.upper()}{number:06d}"
+    pages = document_text(rng, args, marker)
+    if type == "png":
+        # The image only has one page with the first words of the text
+        words = " ".join(" ".join(lines) for lines in pages).split(" ")[:IMAGE_WORDS]
+        pages = [[" ".join(words[i:i + LINE_WORDS]) for i in range(0, len(words), LINE_WORDS)]]
+    extension, writer = TYPES[type]
+    data = writer(pages)
+    file = f"doc_{type}_{number:05d}.{extension}"
+    with open(os.path.join(args.output, file), "wb") as fd:
+        fd.write(data)
+    text = "\n".join("\n".join(lines) for lines in pages)
+    return file, {
+        "type": type,
+        "pages": len(pages),
+        "words": len(text.split()),
+        "bytes": len(data),
+        "marker": marker,
+        "text": text,
+    }
+
+
+def parse_types(types):
+    """
+    Returns the list of types of the --types option
+    """
+    result = [type for type in types.split(",") if type]
+    unknown = [type for type in result if type not in TYPES]
+    if unknown or not result:
+        raise argparse.ArgumentTypeError(f"invalid types {','.join(unknown)}, the types are {', '.join(TYPES)}")
+    return result
+
+
+def options(parser):
+    parser.add_argument("--types", type=parse_types, default=list(TYPES), help="Types of documents, all by default")
+    parser.add_argument("--pages", type=int, default=5, help="Max pages of each document")
+    parser.add_argument("--words", type=int, default=300, help="Words of each page")
+
+
+if __name__ == "__main__":
+    args = parse_args("Generate a corpus of documents with known text", options)
+    if args.pages < 1 or args.words < 1:
+        raise SystemExit("--pages and --words must be positive")
+    tasks = [(args, type, number) for type in args.types for number in range(1, scaled(10, args.scale) + 1)]
+    pool = Pool(args.jobs) if args.jobs > 1 else None
+    expected = {}
+    for file, result in (pool.imap if pool else map)(write_document, tasks):
+        expected[file] = result
+        print(f"{file} {result['bytes']} bytes {result['pages']} pages {result['words']} words")
+    if pool:
+        pool.close()
+        pool.join()
+    with open(os.path.join(args.output, "expected.json"), "w", encoding="utf-8") as fd:
+        json.dump(expected, fd, indent=4, sort_keys=True, ensure_ascii=False)
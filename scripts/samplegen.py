@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Schema-driven sample data generator
+
+This script generates the sample data of any table defined in the
+xml/dbschema.xml files of the apps without writing a specific generator: the
+columns of each table are read from the schema, the tables are sorted by their
+foreign keys and the values of each column are chosen by the type and by the
+name of the column, the foreign keys point to the rows that the referenced
+table has at the same scale factor, or to the rows of the dataset to grow
+with --append
+
+The values of a column can be replaced by hooks, a hook is a function that
+receives the parsed options, the NumPy generator of the shard and the first
+and the last id of the block, and returns the list of values of the column,
+as Python strings or numbers that are formatted by the writers of the engine,
+the hooks are registered in the HOOKS dict with the
+table.column or the column as key, and the --hooks option loads more hooks
+from the HOOKS dict of other Python files
+
+The documents with lines (the invoices and the quotes) are generated with
+their lines and taxes tables, the numeric columns of the lines are drawn as
+the invoices and quotes generators do and the totals of each document are
+the sums of its lines, so the headers are consistent with their lines
+
+Usage:
+
+scripts/samplegen.py [options] [tables]
+
+Without tables, generates all the tables of the apps except the lookup tables
+"""
+import sys
+import importlib.util
+from datetime import datetime, timedelta
+
+from samplelib import (
+    LOOKUPS,
+    parse_args,
+    table_rows,
+    existing_rows,
+    read_dbschema,
+    field_type,
+    sort_tables,
+    ref_date,
+    sample,
+    generate,
+    fkeys,
+    ages,
+    seconds,
+    document_shape,
+    document_lines,
+)
+
+# Rows of the tables at scale 1 that are not the 100 rows of table_rows, used
+# by the child tables to get a realistic number of rows by parent
+ROWS = {
+    "app_emails_address": 300,
+}
+
+# Faker providers used by the text columns, searched by the name of the
+# column and then by the suffix after the last underscore
+PROVIDERS = {
+    "name": "company",
+    "contact": "name",
+    "participants": "name",
+    "address": "street_address",
+    "city": "city",
+    "location": "city",
+    "province": "state",
+    "zip": "postcode",
+    "country": "country",
+    "email": "email",
+    "from": "email",
+    "to": "email",
+    "cc": "email",
+    "bcc": "email",
+    "phone": "phone_number",
+    "website": "url",
+    "url": "url",
+    "iban": "iban",
+    "swift": "swift",
+    "title": "catch_phrase",
+    "subject": "catch_phrase",
+    "job_title": "job",
+    "host": "hostname",
+    "user": "user_name",
+    "pass": "password",
+}
+
+# Documents whose totals are the sums of their lines, with the tables of the
+# lines and the taxes and the column of the id of the document
+DOCUMENTS = {
+    "app_invoices": ("app_invoices_lines", "app_invoices_taxes", "invoice_id"),
+    "app_quotes": ("app_quotes_lines", "app_quotes_taxes", "quote_id"),
+}
+
+# Rows of the app_taxes lookup table used by the lines of the documents
+TAXES = [
+    (1, "VAT 21%", 21.0),
+    (2, "VAT 10%", 10.0),
+    (3, "VAT 4%", 4.0),
+    (4, "Exempt / Not subject", 0.0),
+]
+
+HOOKS = {}
+
+# Hook files loaded and columns prepared by each process
+_loaded = set()
+_columns = {}
+
+
+def hook(*keys):
+    """
+    Decorator used to register a hook for one or more table.column or column
+    keys
+    """
+    def register(function):
+        for key in keys:
+            HOOKS[key] = function
+        return function
+    return register
+
+
+@hook("app_employees.name", "app_leads.contact")
+def person_name(args, nrng, first, last):
+    return sample(args, nrng, "name", last - first)
+
+
+@hook("app_departments.name")
+def department_name(args, nrng, first, last):
+    return sample(args, nrng, "job", last - first)
+
+
+@hook("app_invoices.company_id", "app_quotes.company_id")
+def company_id(args, nrng, first, last):
+    return [1] * (last - first)
+
+
+@hook("pop3_port", "smtp_port")
+def port(args, nrng, first, last):
+    ports = ["110", "995", "25", "465", "587"]
+    return [ports[index] for index in nrng.integers(0, len(ports), last - first).tolist()]
+
+
+@hook("pop3_extra", "smtp_extra")
+def extra(args, nrng, first, last):
+    extras = ["", "tls", "ssl"]
+    return [extras[index] for index in nrng.integers(0, len(extras), last - first).tolist()]
+
+
+def load_hooks(file):
+    """
+    Loads the HOOKS dict of a Python file and adds it to the HOOKS dict
+    """
+    if file in _loaded:
+        return
+    _loaded.add(file)
+    spec = importlib.util.spec_from_file_location("samplegen_hooks", file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    HOOKS.update(module.HOOKS)
+
+
+def rows(args, table):
+    """
+    Returns the number of rows of a table, the lookup and the core tables use
+    the rows of table_rows and the other tables use the rows of ROWS or 100
+    by each unit of scale
+    """
+    if table in LOOKUPS or table.startswith("tbl_"):
+        return table_rows(table, args.scale)
+    return max(1, int(ROWS.get(table, 100) * args.scale))
+
+
+def guess_fkey(tables, table, name):
+    """
+    Returns the table pointed by a *_id column without fkey in the schema,
+    as app_customers for customer_id, or an empty string
+    """
+    if not name.endswith("_id"):
+        return ""
+    base = name[:-3]
+    for candidate in (f"app_{base}s", f"app_{base}", f"{table}_{base}s"):
+        if candidate in tables:
+            return candidate
+    return ""
+
+
+def column(args, tables, table, field):
+    """
+    Returns the function that produces the values of a column, that receives
+    the NumPy generator and the first and the last id of the block and
+    returns the list of values
+    """
+    name = field["name"]
+    type = field_type(field["type"])
+    for key in (f"{table}.{name}", name):
+        if key in HOOKS:
+            function = HOOKS[key]
+            return lambda nrng, first, last: function(args, nrng, first, last)
+    if field["pkey"]:
+        return lambda nrng, first, last: list(range(first, last))
+    fkey = field["fkey"] or guess_fkey(tables, table, name)
+    if fkey == table:
+        # Each row points to a previous row or to zero
+        return lambda nrng, first, last: [
+            int(nrng.random() * i) for i in range(first, last)
+        ]
+    if fkey:
+        high = existing_rows(fkey) or rows(args, fkey)
+        return lambda nrng, first, last: fkeys(args, nrng, f"{table}.{name}", high, last - first).tolist()
+    if "INT" in type:
+        if name == "active" or name.startswith(("is_", "state_", "email_", "pop3_delete")):
+            return lambda nrng, first, last: nrng.integers(0, 2, last - first).tolist()
+        return lambda nrng, first, last: nrng.integers(0, 100, last - first).tolist()
+    if "FLOAT" in type or "DOUBLE" in type or "DECIMAL" in type:
+        return lambda nrng, first, last: nrng.uniform(0, 1000, last - first).round(2).tolist()
+    if type == "DATETIME":
+        origin = datetime.combine(ref_date(args, -365), datetime.min.time())
+        return lambda nrng, first, last: [
+            (origin + timedelta(seconds=moment)).strftime("%Y-%m-%d %H:%M:%S")
+            for moment in seconds(args, nrng, f"{table}.{name}", 365, last - first).tolist()
+        ]
+    if type == "DATE":
+        days = {day: ref_date(args, day).isoformat() for day in range(-365, 1)}
+        return lambda nrng, first, last: [
+            days[-day] for day in ages(args, nrng, f"{table}.{name}", 365, last - first).tolist()
+        ]
+    if type == "TIME":
+        return lambda nrng, first, last: [
+            f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+            for seconds in nrng.integers(0, 86400, last - first).tolist()
+        ]
+    if name == "code" or name.endswith("_code"):
+        prefix = table.split("_")[-1][:3].upper()
+        return lambda nrng, first, last: [f"{prefix}-{i:06d}" for i in range(first, last)]
+    provider = PROVIDERS.get(name) or PROVIDERS.get(name.split("_")[-1])
+    if provider:
+        return lambda nrng, first, last: sample(args, nrng, provider, last - first)
+    if type.startswith(("VARCHAR", "CHAR")):
+        return lambda nrng, first, last: sample(args, nrng, "sentence", last - first, nb_words=4)
+    return lambda nrng, first, last: sample(args, nrng, "paragraph", last - first)
+
+
+def table_columns(args, table):
+    """
+    Returns the names and the functions of the columns of a table, the hooks
+    are loaded and the columns prepared the first time in each process
+    """
+    if table not in _columns:
+        for file in args.hooks:
+            load_hooks(file)
+        tables = read_dbschema()
+        _columns[table] = [(field["name"], column(args, tables, table, field)) for field in tables[table]["fields"]]
+    return _columns[table]
+
+
+def header(table, fields):
+    """
+    Returns the INSERT header of a table with the names of all its fields
+    """
+    names = ", ".join(f"`{field['name']}`" for field in fields)
+    return f"INSERT INTO `{table}` ({names}) VALUES\n"
+
+
+class TableBlock:
+    """
+    Block function of a table for the generate engine
+
+    It is a class instead of a closure to allow to send it to the processes
+    of the pool, each process loads the hooks and prepares the columns of the
+    table the first time that it is called
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def __call__(self, rng, nrng, fake, args, first, last, ids, data):
+        values = [function(nrng, first, last) for _, function in table_columns(args, self.table)]
+        return [list(zip(*values))]
+
+
+def document_block_shape(nrng, args, first, last):
+    n_lines, line_tax, present = document_shape(nrng, last - first, len(TAXES))
+    return (last - first, len(line_tax), int(present.sum())), (n_lines, line_tax, present)
+
+
+class DocumentBlock(TableBlock):
+    """
+    Block function of a document table and its lines and taxes tables
+
+    The columns are generated as in TableBlock, except the ids of the
+    documents in the lines and the taxes, the quantity, price, discount, tax
+    and total of the lines, the base and the amount of each tax and the
+    subtotal, tax and total of the documents, that are computed with
+    document_lines, and the paid amount of the paid documents, that is the
+    total
+    """
+
+    def __call__(self, rng, nrng, fake, args, first, last, ids, data):
+        import numpy
+        lines_table, taxes_table, parent = DOCUMENTS[self.table]
+        n_lines, line_tax, present = data
+        lines = document_lines(nrng, n_lines, line_tax, [value for _, _, value in TAXES])
+        owner = numpy.repeat(numpy.arange(last - first), n_lines)
+        doc, tax = numpy.nonzero(present)
+        tables = []
+        for table, start, count in ((self.table, ids[0], last - first), (lines_table, ids[1], len(line_tax)),
+                                    (taxes_table, ids[2], len(doc))):
+            tables.append({name: function(nrng, start, start + count) for name, function in table_columns(args, table)})
+        documents, line_values, tax_values = tables
+        documents.update({
+            "subtotal": lines["subtotal"].tolist(),
+            "tax": lines["total_tax"].tolist(),
+            "total": lines["total"].tolist(),
+        })
+        if "paid" in documents and "is_paid" in documents:
+            documents["paid"] = [total if paid else 0 for total, paid in zip(documents["total"], documents["is_paid"])]
+        line_values.update({
+            parent: (ids[0] + owner).tolist(),
+            "quantity": lines["quantity"].tolist(),
+            "price": lines["price"].tolist(),
+            "discount": lines["discount"].tolist(),
+            "tax_id": [TAXES[index][0] for index in line_tax.tolist()],
+            "tax_value": [TAXES[index][2] for index in line_tax.tolist()],
+            "total": lines["base_total"].tolist(),
+        })
+        tax_values.update({
+            parent: (ids[0] + doc).tolist(),
+            "tax_id": [TAXES[index][0] for index in tax.tolist()],
+            "tax_name": [TAXES[index][1] for index in tax.tolist()],
+            "tax_value": [TAXES[index][2] for index in tax.tolist()],
+            "base": lines["base"][doc, tax].tolist(),
+            "tax": lines["amount"][doc, tax].tolist(),
+        })
+        return [list(zip(*values.values())) for values in tables]
+
+
+def options(parser):
+    parser.add_argument("tables", nargs="*", help="Tables to generate, all the tables except the lookup tables by default")
+    parser.add_argument("--hooks", action="append", default=[], help="Python file with a HOOKS dict of column hooks")
+
+
+if __name__ == "__main__":
+    args = parse_args("Generate the sample data of any table from the dbschema.xml files", options)
+    for file in args.hooks:
+        load_hooks(file)
+    tables = read_dbschema()
+    names = args.tables or [name for name in tables if name not in LOOKUPS]
+    unknown = [name for name in names if name not in tables]
+    if unknown:
+        sys.exit(f"Unknown tables: {', '.join(unknown)}")
+    # The lines and the taxes of the documents are generated with the documents
+    children = {}
+    for name, (lines_table, taxes_table, _) in DOCUMENTS.items():
+        children.update({lines_table: name, taxes_table: name})
+    names = list(dict.fromkeys(children.get(name, name) for name in names))
+    for table in sort_tables(tables, names):
+        if table in DOCUMENTS:
+            lines_table, taxes_table, _ = DOCUMENTS[table]
+            files = [(f"{name}.sql.gz", header(name, tables[name]["fields"])) for name in (table, lines_table, taxes_table)]
+            paths = generate(args, table, files, rows(args, table), DocumentBlock(table), document_block_shape, block=True)
+        else:
+            files = [(f"{table}.sql.gz", header(table, tables[table]["fields"]))]
+            paths = generate(args, table, files, rows(args, table), TableBlock(table), block=True)
+        for path in paths:
+            print(path)
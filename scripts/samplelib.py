@@ -0,0 +1,1228 @@
+#!/usr/bin/env python3
+"""
+Sample data helpers
+
+This module contains the helpers shared by the sample data generators found
+in code/apps/*/sample/python and by the sample*.py scripts: the common command
+line options, the reference date and the distributions of the foreign keys
+and the dates, the pools of Faker values, the state of the datasets grown
+with --append, the manifest of the generated files and the generate engine,
+that produces the rows by shards with their own seeds, in parallel when
+--jobs is used, and streams them to gzip files of INSERT statements or of
+CSV or TSV rows, so the output does not depend on the number of processes
+and the memory stays flat with big scale factors
+
+The details of each feature are in the docstrings of its functions and in
+the sample data section of docs/devel.t2t
+"""
+import os
+import sys
+import gzip
+import random
+import re
+import io
+import csv
+import json
+import hashlib
+import math
+import time
+import sqlite3
+import argparse
+from datetime import date, timedelta
+from multiprocessing import Pool
+import xml.etree.ElementTree as ET
+
+# The transactions use the parse_query syntax of SaltOS because mysqli is not
+# able to prepare the BEGIN or START TRANSACTION commands
+BEGIN = "/*MYSQL SET autocommit=0 *//*SQLITE BEGIN */;\n"
+COMMIT = "COMMIT;\n"
+END = "/*MYSQL SET autocommit=1 */;\n"
+COMPRESSLEVEL = 6
+
+# Reference date of the generators without --date, a fixed date so the files
+# of two runs with the same options are the same
+DATE = date(2025, 1, 1)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+API_PATH = os.path.join(ROOT, "code", "api")
+APPS_PATH = os.path.join(ROOT, "code", "apps")
+# The pools of values are cached outside of the repository, in the cache
+# directory of the user
+CACHE_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "saltos", "sample")
+
+# Lookup tables, their rows are the fixed rows of the sample/sql files and
+# they do not grow with the scale factor
+LOOKUPS = (
+    "app_company",
+    "app_customers_types",
+    "app_employees_types",
+    "app_invoices_status",
+    "app_leads_status",
+    "app_payment_methods",
+    "app_products_categories",
+    "app_products_types",
+    "app_purchase_status",
+    "app_quotes_status",
+    "app_suppliers_types",
+    "app_taxes",
+)
+
+# Tables added by __dbschema_auto_apps for each app with the has_index,
+# has_control, has_version, has_files, has_notes or has_log features
+AUTO_TABLES = {
+    "index": """<table name="{$table}_index">
+        <fields>
+            <field name="id" type="/*MYSQL INT(11) *//*SQLITE INTEGER */" pkey="true"/>
+            <field name="search" type="MEDIUMTEXT"/>
+        </fields>
+        <indexes>
+            <index fulltext="true" fields="search"/>
+        </indexes>
+    </table>""",
+    "control": """<table name="{$table}_control">
+        <fields>
+            <field name="id" type="/*MYSQL INT(11) *//*SQLITE INTEGER */" pkey="true" fkey="{$table}"/>
+            <field name="user_id" type="INT(11)" fkey="tbl_users"/>
+            <field name="group_id" type="INT(11)" fkey="tbl_groups"/>
+            <field name="datetime" type="DATETIME"/>
+            <field name="users_id" type="TEXT"/>
+            <field name="groups_id" type="TEXT"/>
+        </fields>
+        <indexes>
+            <index fields="user_id"/>
+            <index fields="id,user_id"/>
+        </indexes>
+    </table>""",
+    "version": """<table name="{$table}_version">
+        <fields>
+            <field name="id" type="/*MYSQL INT(11) *//*SQLITE INTEGER */" pkey="true"/>
+            <field name="user_id" type="INT(11)" fkey="tbl_users"/>
+            <field name="datetime" type="DATETIME"/>
+            <field name="reg_id" type="INT(11)" fkey="{$table}"/>
+            <field name="ver_id" type="INT(11)"/>
+            <field name="data" type="MEDIUMTEXT"/>
+            <field name="hash" type="VARCHAR(255)"/>
+        </fields>
+        <indexes>
+            <index fields="user_id"/>
+            <index fields="reg_id"/>
+            <index fields="ver_id"/>
+            <index fields="reg_id,ver_id"/>
+        </indexes>
+    </table>""",
+    "files": """<table name="{$table}_files">
+        <fields>
+            <field name="id" type="/*MYSQL INT(11) *//*SQLITE INTEGER */" pkey="true"/>
+            <field name="user_id" type="INT(11)" fkey="tbl_users"/>
+            <field name="datetime" type="DATETIME"/>
+            <field name="reg_id" type="INT(11)" fkey="{$table}"/>
+            <field name="uniqid" type="VARCHAR(255)"/>
+            <field name="name" type="VARCHAR(255)"/>
+            <field name="size" type="INT(11)"/>
+            <field name="type" type="VARCHAR(255)"/>
+            <field name="file" type="VARCHAR(255)"/>
+            <field name="hash" type="VARCHAR(255)"/>
+            <field name="search" type="MEDIUMTEXT"/>
+            <field name="indexed" type="INT(11)"/>
+            <field name="retries" type="INT(11)"/>
+        </fields>
+    </table>""",
+    "notes": """<table name="{$table}_notes">
+        <fields>
+            <field name="id" type="/*MYSQL INT(11) *//*SQLITE INTEGER */" pkey="true"/>
+            <field name="user_id" type="INT(11)" fkey="tbl_users"/>
+            <field name="datetime" type="DATETIME"/>
+            <field name="reg_id" type="INT(11)" fkey="{$table}"/>
+            <field name="note" type="TEXT"/>
+        </fields>
+    </table>""",
+    "log": """<table name="{$table}_log">
+        <fields>
+            <field name="id" type="/*MYSQL INT(11) *//*SQLITE INTEGER */" pkey="true"/>
+            <field name="user_id" type="INT(11)" fkey="tbl_users"/>
+            <field name="datetime" type="DATETIME"/>
+            <field name="log" type="VARCHAR(255)"/>
+            <field name="reg_id" type="INT(11)" fkey="{$table}"/>
+            <field name="reg_ids" type="TEXT"/>
+            <field name="extra_id" type="INT(11)"/>
+            <field name="extra_ids" type="TEXT"/>
+        </fields>
+    </table>""",
+}
+
+
+def parse_args(description, options=None):
+    """
+    Parse the common command line options of the generators
+
+    --scale multiplies the base number of rows of each generator (100 rows by
+    default), so --scale 10000 produces 1M rows, --output sets the directory
+    where the .sql.gz files are written (the current directory by default),
+    --batch sets the number of rows of each INSERT statement and --commit sets
+    the number of INSERT statements of each transaction
+
+    --seed, --shard and --jobs control the generation: the seed and the shard
+    size define the contents of the files, and the jobs only define how many
+    processes are used to generate the shards, --date sets the reference date
+    used instead of today by the relative dates of the generators (DATE by
+    default, so the files do not change from one day to the next)
+
+    --format sets the format of the files: sql for INSERT statements (the
+    default), csv or tsv for the bulk load files
+
+    --locale, --pool and --cache control the pools of values: the locale of
+    Faker, the number of values generated for each provider and the directory
+    where the pools are cached
+
+    --dist sets the distribution of the values of a column, as column=spec
+    or table.column=spec, and can be used several times, see DISTRIBUTIONS
+
+    --append sets the SQLite database or the JSON state file used to grow an
+    existing dataset, the scale sets the number of new rows and the ids start
+    after the max ids of the tables, without --date the reference date is the
+    day after the last run, see read_state
+
+    --force generates the files again even when the manifest of the output
+    directory says that they were written by the same version of the
+    generator with the same options, see current_files
+
+    --profile prints the report of each generated table to the standard
+    error, with the file the reports are also appended as JSON lines, see
+    report_profile
+
+    The options argument is an optional function that receives the parser to
+    add the options of a specific generator
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--scale", type=float, default=1, help="Scale factor applied to the base rows, e.g. 10000 for 1M rows")
+    parser.add_argument("--output", default=".", help="Directory where the .sql.gz files are written")
+    parser.add_argument("--batch", type=int, default=1000, help="Rows of each INSERT statement")
+    parser.add_argument("--commit", type=int, default=100, help="INSERT statements of each transaction")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random generators")
+    parser.add_argument("--shard", type=int, default=10000, help="Rows generated by each shard")
+    parser.add_argument("--date", type=date.fromisoformat, help=f"Reference date used instead of today, as YYYY-MM-DD ({DATE})")
+    parser.add_argument("--jobs", type=int, default=1, help="Processes used to generate the shards, 0 for all the CPUs")
+    parser.add_argument("--format", choices=["sql", "csv", "tsv"], default="sql", help="Format of the files, INSERT statements or bulk load files")
+    parser.add_argument("--locale", default="en_US", help="Locale used by Faker")
+    parser.add_argument("--pool", type=int, default=10000, help="Values generated for each Faker provider")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Directory where the pools of values are cached")
+    parser.add_argument("--append", help="SQLite database or .json state file of the dataset to grow")
+    parser.add_argument("--dist", action="append", default=[],
+                        help="Distribution of a column, as customer_id=zipf:1.1 or app_invoices.proforma_date=recent:15")
+    parser.add_argument("--force", action="store_true", help="Generate the files even if the manifest says that they are current")
+    parser.add_argument("--profile", nargs="?", const="", metavar="FILE",
+                        help="Print the times of the phases, and append them as JSON lines to FILE if it is set")
+    if options:
+        options(parser)
+    args = parser.parse_args()
+    if args.scale <= 0:
+        parser.error("--scale must be greater than zero")
+    if args.batch <= 0 or args.commit <= 0 or args.shard <= 0 or args.pool <= 0:
+        parser.error("--batch, --commit, --shard and --pool must be greater than zero")
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count()
+    args.dist = parse_dist(parser, args.dist)
+    args.state = read_state(args.append) if args.append else {"date": None, "tables": {}}
+    _existing.update(args.state["tables"])
+    last = args.state["date"]
+    args.since = date.fromisoformat(last) if last else None
+    if args.date is None:
+        args.date = args.since + timedelta(days=1) if last else DATE
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    return args
+
+
+def scaled(rows, scale):
+    """
+    Returns the number of rows (or the upper limit of an id range) for a scale
+    factor, never less than one
+    """
+    return max(1, int(rows * scale))
+
+
+# Distributions of the --dist option and the number of parameters of each
+# one, the values are drawn by rank, where the rank 0 is the newest value (the
+# last id of the foreign keys and the reference date of the dates):
+# - zipf:s => weight 1/(rank+1)^s, the newest registers are the hottest
+# - hot:fraction:share => the share of the values go to the fraction of the
+#   newest values, as hot:0.1:0.8 for the 80% of the rows in the 10% of ids
+# - recent:days => weight exp(-rank/days), as dates close to the reference
+# - seasonal:period:amplitude => bursts every period days where the weight
+#   grows to 1+amplitude, as seasonal:7:4 for weekly bursts
+DISTRIBUTIONS = {
+    "uniform": 0,
+    "zipf": 1,
+    "hot": 2,
+    "recent": 1,
+    "seasonal": 2,
+}
+
+
+def parse_dist(parser, items):
+    """
+    Returns the dict of columns and distributions of the --dist options, the
+    distributions are tuples with the name and the float parameters
+    """
+    result = {}
+    for item in items:
+        column, _, spec = item.partition("=")
+        name, *params = spec.split(":")
+        try:
+            params = tuple(float(param) for param in params)
+        except ValueError:
+            parser.error(f"Invalid parameters in --dist {item}")
+        if not column or DISTRIBUTIONS.get(name) != len(params):
+            parser.error(f"Invalid --dist {item}, use column=spec with spec in zipf:s, hot:fraction:share, "
+                         "recent:days, seasonal:period:amplitude or uniform")
+        if any(param <= 0 for param in params) or (name == "hot" and max(params) > 1):
+            parser.error(f"Invalid parameters in --dist {item}")
+        result[column] = (name, params)
+    return result
+
+
+def distribution(args, column):
+    """
+    Returns the distribution of a column (as table.column) set by --dist, by
+    the table and the column or only by the column, or None if it is uniform
+    """
+    spec = args.dist.get(column) or args.dist.get(column.split(".")[-1])
+    return None if spec is None or spec[0] == "uniform" else spec
+
+
+# Cumulative weights of the distributions, computed once by range
+_cdfs = {}
+
+
+def ranks(args, nrng, spec, size, count):
+    """
+    Returns count ranks between 0 and size-1 drawn with the weights of a
+    distribution, using the cumulative weights of the range
+    """
+    import numpy
+    key = (spec, size, args.date)
+    if key not in _cdfs:
+        name, params = spec
+        rank = numpy.arange(size, dtype=float)
+        if name == "zipf":
+            weights = 1 / (rank + 1) ** params[0]
+        elif name == "hot":
+            hot = max(1, int(size * params[0]))
+            weights = numpy.where(rank < hot, params[1] / hot, (1 - params[1]) / max(1, size - hot))
+        elif name == "recent":
+            weights = numpy.exp(-rank / params[0])
+        else:
+            ordinal = args.date.toordinal() - rank
+            weights = 1 + params[1] * ((1 + numpy.cos(2 * math.pi * ordinal / params[0])) / 2) ** 4
+        cdf = numpy.cumsum(weights)
+        _cdfs[key] = cdf / cdf[-1]
+    return numpy.minimum(numpy.searchsorted(_cdfs[key], nrng.random(count), side="right"), size - 1)
+
+
+def fkeys(args, nrng, column, high, count):
+    """
+    Returns a NumPy array of count foreign keys between 1 and high for a
+    column (as table.column), uniform or with the distribution of --dist,
+    where the rank 0 is the last id
+    """
+    spec = distribution(args, column)
+    if spec is None:
+        return nrng.integers(1, high + 1, count)
+    return high - ranks(args, nrng, spec, high, count)
+
+
+def days_window(args, low, high):
+    """
+    Returns the range of days low..high relative to the reference date, with
+    --append the days up to the date of the last run are removed, so the new
+    rows continue after the rows of the dataset
+    """
+    if args.since is not None:
+        low = max(low, (args.since - args.date).days + 1)
+        high = max(high, low)
+    return low, high
+
+
+def ages(args, nrng, column, days, count):
+    """
+    Returns a NumPy array of count ages in days between 0 and days for a date
+    column (as table.column), the generators use the reference date moved
+    back the age, uniform or with the distribution of --dist, with --append
+    the ages stop before the date of the last run
+    """
+    days = -days_window(args, -days, 0)[0]
+    spec = distribution(args, column)
+    if spec is None:
+        return nrng.integers(0, days + 1, count)
+    return ranks(args, nrng, spec, days + 1, count)
+
+
+def seconds(args, nrng, column, days, count):
+    """
+    Returns a NumPy array of count seconds between 0 and days*86400 from the
+    start of a range of days that ends at the reference date, for a datetime
+    column (as table.column), uniform or with the distribution of --dist for
+    the days (the rank 0 is the last day before the reference date) and
+    uniform for the time, with --append only the days after the date of the
+    last run are used (the rank 0 is the reference date)
+    """
+    spec = distribution(args, column)
+    if args.since is not None:
+        window = 1 - days_window(args, -days, 0)[0]
+        if spec is None:
+            return (days + 1 - window) * 86400 + nrng.integers(0, window * 86400, count)
+        return (days - ranks(args, nrng, spec, window, count)) * 86400 + nrng.integers(0, 86400, count)
+    if spec is None:
+        return nrng.integers(0, days * 86400 + 1, count)
+    age = ranks(args, nrng, spec, days, count)
+    return (days - 1 - age) * 86400 + nrng.integers(0, 86400, count)
+
+
+def read_state(file):
+    """
+    Returns the state of the dataset to grow, a dict with the max id of each
+    table and the date of the last run (or None)
+
+    The file can be a JSON state file, written by the generators after each
+    table (a missing file is an empty dataset), or a SQLite database, where
+    the date of the last run is the last date of the control tables
+    """
+    if file.endswith(".json"):
+        if not os.path.exists(file):
+            return {"date": None, "tables": {}}
+        with open(file, encoding="utf-8") as fd:
+            return json.load(fd)
+    if not os.path.exists(file):
+        raise FileNotFoundError(file)
+    db = sqlite3.connect(f"file:{file}?mode=ro", uri=True)
+    state = {"date": None, "tables": {}}
+    names = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+    for name in names:
+        columns = [row[1] for row in db.execute(f"PRAGMA table_info({name})")]
+        if "id" in columns:
+            state["tables"][name] = db.execute(f"SELECT IFNULL(MAX(id), 0) FROM {name}").fetchone()[0]
+        if name.endswith("_control") and "datetime" in columns:
+            last = db.execute(f"SELECT MAX(SUBSTR(datetime, 1, 10)) FROM {name}").fetchone()[0]
+            if last and last != "0000-00-00" and (state["date"] is None or last > state["date"]):
+                state["date"] = last
+    db.close()
+    return state
+
+
+def write_state(args, tables):
+    """
+    Updates the max ids of the state with the rows generated for the tables,
+    a dict of table and max id, and writes the state file when --append is a
+    JSON file, the state keeps the date of the run, does nothing without
+    --append
+    """
+    if not args.append:
+        return
+    args.state["tables"].update(tables)
+    _existing.update(tables)
+    if args.append.endswith(".json"):
+        args.state["date"] = args.date.isoformat()
+        temp = f"{args.append}.{os.getpid()}"
+        with open(temp, "w", encoding="utf-8") as fd:
+            json.dump(args.state, fd, indent=4, sort_keys=True)
+        os.replace(temp, args.append)
+
+
+# Max ids of the tables of the dataset to grow, set in each process
+_existing = {}
+
+
+def existing_rows(table):
+    """
+    Returns the max id of a table in the dataset to grow, zero without
+    --append or when the table is empty
+    """
+    return _existing.get(table, 0)
+
+
+# Rows of the lookup tables, counted only once
+_lookups = {}
+
+
+def table_rows(table, scale):
+    """
+    Returns the number of rows of a table for a scale factor, used as number
+    of rows to generate and as upper limit of the foreign keys that point to
+    the table: the lookup tables have the rows of their sample/sql files, the
+    core tables (tbl_*) only have the admin user and the other tables have 100
+    rows by each unit of scale, with --append the tables of the dataset to
+    grow have their max id
+    """
+    if existing_rows(table):
+        return existing_rows(table)
+    if table.startswith("tbl_"):
+        return 1
+    if table in LOOKUPS:
+        if table not in _lookups:
+            files = [os.path.join(APPS_PATH, app, "sample", "sql", f"{table}.sql.gz") for app in os.listdir(APPS_PATH)]
+            files = [file for file in files if os.path.exists(file)]
+            rows = 0
+            for file in files:
+                with gzip.open(file, "rt", encoding="utf-8") as fd:
+                    rows += sum(1 for line in fd if line.startswith("("))
+            _lookups[table] = max(1, rows)
+        return _lookups[table]
+    return scaled(100, scale)
+
+
+def _dbschema_tables(tables, app, root):
+    """
+    Adds to the tables dict the tables of a dbschema XML element
+    """
+    for table in root.iter("table"):
+        tables[table.get("name")] = {
+            "app": app,
+            "ignore": table.get("ignore") == "true",
+            "fields": [{
+                "name": field.get("name"),
+                "type": field.get("type"),
+                "pkey": field.get("pkey") == "true",
+                "fkey": field.get("fkey", ""),
+            } for field in table.iter("field")],
+            "indexes": [index.get("fields").split(",") for index in table.iter("index")],
+        }
+
+
+def read_dbschema(core=False, auto=False):
+    """
+    Returns the tables defined by the xml/dbschema.xml files of the apps
+
+    Returns a dict with the name of each table as key and a dict with the app
+    (the directory of the app), the fields (a list of dicts with the name,
+    the type, the pkey and the fkey of each field) and the indexes (a list
+    with the fields of each index) as value, the types are returned with the
+    parse_query syntax, as /*MYSQL INT(11) *//*SQLITE INTEGER */
+
+    The core argument adds the tables of code/api/xml/dbschema.xml, with an
+    empty app, and the auto argument adds the tables and the indexes that
+    db_schema adds automatically, as done by __dbschema_auto_apps and
+    __dbschema_auto_fkey
+    """
+    tables = {}
+    if core:
+        _dbschema_tables(tables, "", ET.parse(os.path.join(API_PATH, "xml", "dbschema.xml")).getroot())
+    for app in sorted(os.listdir(APPS_PATH)):
+        file = os.path.join(APPS_PATH, app, "xml", "dbschema.xml")
+        if not os.path.exists(file):
+            continue
+        _dbschema_tables(tables, app, ET.parse(file).getroot())
+    if auto:
+        for table, spec in read_manifests().items():
+            for feature, xml in AUTO_TABLES.items():
+                if spec.get(f"has_{feature}") == "1":
+                    _dbschema_tables(tables, spec["app"], ET.fromstring(xml.replace("{$table}", table)))
+        for spec in tables.values():
+            if spec["ignore"]:
+                continue
+            indexes = [",".join(fields) for fields in spec["indexes"]]
+            for field in spec["fields"]:
+                if field["fkey"] and field["name"] not in indexes:
+                    spec["indexes"].append([field["name"]])
+    return tables
+
+
+def read_manifests():
+    """
+    Returns the apps with table defined by the xml/manifest.xml files of the
+    apps, as a dict with the table of each app as key and the attributes of
+    the app and the directory of the app as value
+    """
+    apps = {}
+    for app in sorted(os.listdir(APPS_PATH)):
+        file = os.path.join(APPS_PATH, app, "xml", "manifest.xml")
+        if not os.path.exists(file):
+            continue
+        for node in ET.parse(file).getroot().iter("app"):
+            if node.get("table"):
+                apps[node.get("table")] = {**node.attrib, "app": app}
+    return apps
+
+
+def field_type(type):
+    """
+    Returns the MySQL type of a field type in the parse_query syntax, as
+    INT(11) for /*MYSQL INT(11) *//*SQLITE INTEGER */
+    """
+    match = re.search(r"/\*MYSQL (.*?) \*/", type)
+    return (match.group(1) if match else type).strip().upper()
+
+
+def sort_tables(tables, names):
+    """
+    Returns the names of the tables sorted to put each table after the tables
+    pointed by its foreign keys, the references to itself and to the tables
+    not included in names are ignored, the ties are sorted by name to get
+    always the same order, and a ValueError is raised if there is a cycle
+    """
+    depends = {name: {field["fkey"] for field in tables[name]["fields"]
+                      if field["fkey"] in names and field["fkey"] != name} for name in names}
+    result = []
+    while depends:
+        ready = sorted(name for name, fkeys in depends.items() if not fkeys)
+        if not ready:
+            raise ValueError(f"Cycle in the foreign keys of {', '.join(sorted(depends))}")
+        result.extend(ready)
+        for name in ready:
+            del depends[name]
+        for fkeys in depends.values():
+            fkeys.difference_update(ready)
+    return result
+
+
+def ref_date(args, days=0):
+    """
+    Returns the reference date of the generation moved the requested days,
+    the generators use it instead of the relative dates of Faker (as 'today'
+    or '-60d') because these dates depend on the time of each process
+    """
+    return args.date + timedelta(days=days)
+
+
+def shard_random(name, seed, shard, stream=""):
+    """
+    Returns the random generator of a shard, seeded with a string to get the
+    same sequence in all the processes and in all the executions
+    """
+    return random.Random(f"{name}:{seed}:{shard}:{stream}")
+
+
+def shard_numpy(name, seed, shard, stream=""):
+    """
+    Returns the NumPy random generator of a shard, seeded with the digest of
+    the same string used by shard_random, NumPy is only imported when a block
+    generator needs it
+    """
+    import numpy
+    digest = hashlib.sha256(f"{name}:{seed}:{shard}:{stream}".encode("utf-8")).digest()
+    return numpy.random.default_rng(list(digest))
+
+
+def document_shape(nrng, count, ntaxes):
+    """
+    Draws the shape of a block of documents with lines (invoices, quotes, ...)
+
+    Each document has between 1 and 50 lines, biased to the small values, and
+    each line has one of the ntaxes taxes, returns the number of lines of each
+    document, the tax index of each line and a (count, ntaxes) boolean matrix
+    with the taxes used by each document, that are the rows of the taxes table
+    """
+    import numpy
+    n_lines = (nrng.random(count) ** 2 * 49).astype(numpy.int64) + 1
+    line_tax = nrng.integers(0, ntaxes, n_lines.sum())
+    owner = numpy.repeat(numpy.arange(count), n_lines)
+    present = numpy.zeros((count, ntaxes), dtype=bool)
+    present[owner, line_tax] = True
+    return n_lines, line_tax, present
+
+
+def document_lines(nrng, n_lines, line_tax, values):
+    """
+    Draws the numeric columns of the lines of a block of documents
+
+    Draws the quantity, price and discount of each line and computes the base
+    total of each line, the base and the amount of each tax of each document
+    (as a (count, ntaxes) matrix) and the subtotal, taxes and total of each
+    document, the group-by sums are done with bincount over document*ntaxes+tax
+    """
+    import numpy
+    count = len(n_lines)
+    ntaxes = len(values)
+    values = numpy.asarray(values, dtype=float)
+    owner = numpy.repeat(numpy.arange(count), n_lines)
+    quantity = numpy.round(nrng.uniform(1, 10, len(line_tax)), 2)
+    price = numpy.round(nrng.uniform(10, 200, len(line_tax)), 2)
+    discount = nrng.choice([0, 5, 10, 15, 20, 25], len(line_tax), p=[0.70, 0.10, 0.08, 0.06, 0.04, 0.02])
+    base_total = numpy.round(quantity * price * (1 - discount / 100), 2)
+    base = numpy.bincount(owner * ntaxes + line_tax, base_total, count * ntaxes).reshape(count, ntaxes)
+    base = numpy.round(base, 2)
+    amount = numpy.round(base * values / 100, 2)
+    subtotal = numpy.round(base.sum(axis=1), 2)
+    total_tax = numpy.round(amount.sum(axis=1), 2)
+    total = numpy.round(subtotal + total_tax, 2)
+    return {
+        "quantity": quantity,
+        "price": price,
+        "discount": discount,
+        "base_total": base_total,
+        "base": base,
+        "amount": amount,
+        "subtotal": subtotal,
+        "total_tax": total_tax,
+        "total": total,
+    }
+
+
+def sql_value(value):
+    """
+    Returns a value formatted as SQL, the strings are quoted doubling the
+    quotes, the None values are NULL and the numbers are returned as they are
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    if isinstance(value, bool):
+        return str(int(value))
+    return str(value)
+
+
+def text_value(value):
+    """
+    Returns a value formatted for the CSV and TSV files, the None values are
+    empty strings
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(int(value))
+    return str(value)
+
+
+class SqlWriter:
+    """
+    INSERT writer
+
+    Formats the rows of one table (the values of the columns of the header)
+    as INSERT statements of up to batch rows grouped in transactions of up to
+    commit statements, the start argument is the number of rows written
+    before by the previous shards, to continue the statements and the
+    transactions where the previous shard finished
+    """
+
+    def __init__(self, header, batch=1000, commit=100, start=0):
+        self.header = header
+        self.batch = batch
+        self.commit = commit
+        self.rows = start
+        self.parts = []
+
+    def write(self, row):
+        if self.rows % self.batch:
+            self.parts.append(",\n")
+        else:
+            statement = self.rows // self.batch
+            if statement:
+                self.parts.append(";\n")
+                if statement % self.commit == 0:
+                    self.parts.append(COMMIT)
+            if statement % self.commit == 0:
+                self.parts.append(BEGIN)
+            self.parts.append(self.header)
+        self.parts.append("(" + ", ".join(sql_value(value) for value in row) + ")")
+        self.rows += 1
+
+    def close(self):
+        if self.rows:
+            self.parts.append(";\n")
+            self.parts.append(COMMIT)
+            self.parts.append(END)
+
+    def getvalue(self):
+        return "".join(self.parts)
+
+
+# Values of the rows formatted as SQL, quoted strings or bare numbers
+_value = re.compile(r"'((?:[^']|'')*)'|([^\s,()]+)", re.S)
+
+# Column names of an INSERT header
+_header = re.compile(r"INSERT INTO `?(\w+)`?\s*(?:\(([^)]*)\))?")
+
+
+def sql_values(row):
+    """
+    Returns the list of values of a row formatted as SQL, as (1, 'it''s'),
+    the strings are unescaped and the numbers are returned as strings
+    """
+    return [match.group(2) if match.group(1) is None else match.group(1).replace("''", "'")
+            for match in _value.finditer(row)]
+
+
+def header_columns(header):
+    """
+    Returns the table of an INSERT header and the positions of the values of
+    each column of the table in the rows, sorted as the fields of the table in
+    the dbschema.xml files, the headers without column names are supposed to
+    contain all the fields in this order
+    """
+    match = _header.match(header)
+    table = match.group(1)
+    fields = [field["name"] for field in read_dbschema()[table]["fields"]]
+    if not match.group(2):
+        return table, list(zip(fields, range(len(fields))))
+    names = [name.strip().strip("`") for name in match.group(2).split(",")]
+    return table, [(field, names.index(field)) for field in fields if field in names]
+
+
+class CsvWriter:
+    """
+    CSV and TSV writer
+
+    Formats the rows of one table (the values of the columns of the header)
+    as lines of a CSV or TSV file with the columns sorted as the fields of the
+    table, the first line contains the names of the columns and is written by
+    the writer of the first row, the CSV values are quoted when needed
+    doubling the quotes and the TSV values escape the backslashes, tabs and
+    newlines with backslashes, as expected by LOAD DATA
+    """
+
+    def __init__(self, header, format="csv", start=0):
+        _, self.columns = header_columns(header)
+        self.format = format
+        self.rows = start
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator="\n")
+
+    def line(self, values):
+        if self.format == "csv":
+            self.writer.writerow(values)
+        else:
+            self.buffer.write("\t".join(
+                value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+                for value in values
+            ) + "\n")
+
+    def write(self, row):
+        if not self.rows:
+            self.line([name for name, _ in self.columns])
+        self.line([text_value(row[index]) for _, index in self.columns])
+        self.rows += 1
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return self.buffer.getvalue()
+
+
+def make_writer(args, header, start):
+    """
+    Returns the writer of a table for the format of the options
+    """
+    if args.format == "sql":
+        return SqlWriter(header, args.batch, args.commit, start)
+    return CsvWriter(header, args.format, start)
+
+
+def output_file(args, file):
+    """
+    Returns the name of a .sql.gz file for the format of the options
+    """
+    if args.format == "sql":
+        return file
+    return file[:-len(".sql.gz")] + f".{args.format}.gz"
+
+
+def open_sample(path):
+    """
+    Opens a .gz file to write text, the gzip header does not contain the time
+    to get always the same file for the same data
+    """
+    return io.TextIOWrapper(gzip.GzipFile(path, "wb", COMPRESSLEVEL, mtime=0), encoding="utf-8")
+
+
+# Manifest of each output directory, with the content hash, the rows and the
+# version and options of the generator of each file
+MANIFEST = "manifest.json"
+
+# Options that define the contents of the files of the engine
+OPTIONS = ("scale", "seed", "shard", "date", "format", "locale", "pool", "batch", "commit", "dist")
+
+
+def file_hash(path):
+    """
+    Returns the sha256 of the contents of a file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def count_rows(path):
+    """
+    Returns the rows of a .sql.gz file (the lines that start a row) or of a
+    .csv.gz or .tsv.gz file (the lines after the names of the columns)
+    """
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as fd:
+        if path.endswith(".sql.gz"):
+            return sum(1 for line in fd if line.startswith("("))
+        if path.endswith(".csv.gz"):
+            return max(0, sum(1 for _ in csv.reader(fd)) - 1)
+        return max(0, sum(1 for _ in fd) - 1)
+
+
+def generator_version(generator):
+    """
+    Returns the version of a generator, the start of the digest of the
+    sources of the generator and of this module and the version of Faker, to
+    detect the changes of the code that writes the files
+    """
+    from faker import VERSION
+    digest = hashlib.sha256(VERSION.encode("utf-8"))
+    for file in (generator, __file__):
+        with open(file, "rb") as fd:
+            digest.update(fd.read())
+    return digest.hexdigest()[:16]
+
+
+def generator_options(args):
+    """
+    Returns the options that define the contents of the files of the engine,
+    as JSON values
+    """
+    options = {option: getattr(args, option) for option in OPTIONS}
+    options["date"] = args.date.isoformat()
+    if args.since is not None:
+        options["since"] = args.since.isoformat()
+    options["dist"] = {column: [name, list(params)] for column, (name, params) in sorted(args.dist.items())}
+    return options
+
+
+def read_manifest(directory):
+    """
+    Returns the manifest of a directory, a dict with the name of each file as
+    key, or an empty dict when the directory does not have manifest
+    """
+    file = os.path.join(directory, MANIFEST)
+    if not os.path.exists(file):
+        return {}
+    with open(file, encoding="utf-8") as fd:
+        return json.load(fd)
+
+
+def write_manifest(paths, generator, options=None, rows=None):
+    """
+    Adds the files to the manifest of their directory, with the sha256, the
+    size and the rows of each file, and the name, the version and the options
+    of the generator, the rows are counted when they are not passed, and the
+    manifest is written with a rename to not leave a partial file
+    """
+    version = generator_version(generator)
+    for path, count in zip(paths, rows or [None] * len(paths)):
+        directory = os.path.dirname(path) or "."
+        manifest = read_manifest(directory)
+        manifest[os.path.basename(path)] = {
+            "sha256": file_hash(path),
+            "size": os.path.getsize(path),
+            "rows": count_rows(path) if count is None else count,
+            "generator": os.path.basename(generator),
+            "version": version,
+            "options": options or {},
+        }
+        file = os.path.join(directory, MANIFEST)
+        temp = f"{file}.{os.getpid()}"
+        with open(temp, "w", encoding="utf-8") as fd:
+            json.dump(manifest, fd, indent=4, sort_keys=True)
+        os.replace(temp, file)
+
+
+def current_files(paths, generator, options):
+    """
+    Returns True when all the files exist with the size of the manifest of
+    their directory and were written by the same version of the generator
+    with the same options, so they can be kept instead of generated again
+    """
+    version = generator_version(generator)
+    for path in paths:
+        entry = read_manifest(os.path.dirname(path) or ".").get(os.path.basename(path))
+        if not entry or not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+            return False
+        if entry["version"] != version or entry["options"] != options:
+            return False
+    return True
+
+
+# Each process creates its own Faker instance only once
+_fake = None
+
+
+def _faker(locale):
+    global _fake
+    if _fake is None:
+        from faker import Faker
+        _fake = Faker(locale)
+    return _fake
+
+
+# Each process loads each pool of values only once
+_pools = {}
+
+
+def pool(args, provider, **kwargs):
+    """
+    Returns the pool of values of a Faker provider
+
+    The pool contains the unique values of args.pool calls to the provider
+    (less for the providers with few values, as the states), they are
+    generated with the Faker of the process and a generator seeded with the
+    seed and the provider, and cached in a JSON file of the cache directory,
+    the values are returned as they are, the writers format them
+
+    @args     => the parsed command line options
+    @provider => name of the Faker provider, as company or paragraph
+    @kwargs   => arguments passed to the provider, as nb_words=10
+    """
+    from faker import VERSION
+    key = "_".join([provider] + [f"{k}{v}" for k, v in sorted(kwargs.items())])
+    file = os.path.join(args.cache, f"faker_{args.locale}_{args.seed}_{args.pool}_{VERSION}_{key}.json")
+    begin = time.perf_counter()
+    if file not in _pools:
+        if os.path.exists(file):
+            with open(file, encoding="utf-8") as fd:
+                values = json.load(fd)
+        else:
+            # The Faker of the process is used with its own generator, and the
+            # generator of the shard is restored after filling the pool
+            fake = _faker(args.locale)
+            saved = fake.random
+            fake.random = random.Random(f"{args.seed}:{key}")
+            try:
+                method = getattr(fake, provider)
+                values = list(dict.fromkeys(method(**kwargs) for _ in range(args.pool)))
+            finally:
+                fake.random = saved
+            # Written with a rename because other processes can be doing the same
+            os.makedirs(args.cache, exist_ok=True)
+            temp = f"{file}.{os.getpid()}"
+            with open(temp, "w", encoding="utf-8") as fd:
+                json.dump(values, fd, ensure_ascii=False)
+            os.replace(temp, file)
+        _pools[file] = values
+        # The pools are filled while the rows are generated
+        elapsed = _spend("faker", begin) - begin
+        if _profile is not None:
+            _profile["rows"] -= elapsed
+    return _pools[file]
+
+
+def sample(args, nrng, provider, count, **kwargs):
+    """
+    Returns count values of the pool of a Faker provider, sampled with the
+    NumPy generator of the shard
+    """
+    values = pool(args, provider, **kwargs)
+    return [values[index] for index in nrng.integers(0, len(values), count).tolist()]
+
+
+def sample_joined(args, nrng, provider, low, high, separator, count, **kwargs):
+    """
+    Returns count strings made by joining between low and high values of the
+    pool of a Faker provider, as the fields with several paragraphs or names
+    """
+    sizes = nrng.integers(low, high + 1, count).tolist()
+    values = iter(sample(args, nrng, provider, sum(sizes), **kwargs))
+    return [separator.join(next(values) for _ in range(size)) for size in sizes]
+
+
+# Phases of the generation measured by --profile: the pre-pass of the shapes,
+# the creation of Faker and the pools of values, the generation of the rows,
+# the INSERT or CSV formatting, the gzip compression and the file writes
+PHASES = ("shape", "faker", "rows", "format", "compress", "write")
+
+# Times of the phases of the shard generated by the process, None without
+# --profile
+_profile = None
+
+
+def _spend(phase, begin):
+    """
+    Adds the time since begin to a phase of the profile of the shard, when
+    --profile is used, and returns the current time
+    """
+    now = time.perf_counter()
+    if _profile is not None:
+        _profile[phase] += now - begin
+    return now
+
+
+def peak_rss():
+    """
+    Returns the peak RSS in bytes of the process and of its finished
+    children, as the processes of the pool
+    """
+    import resource
+    peak = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def report_profile(args, report):
+    """
+    Prints the profile of a generator to the standard error and appends it as
+    a JSON line to the file of --profile, the times of the phases are added
+    over all the shards, so with --jobs they are process times that can be
+    greater than the wall time
+    """
+    lines = [
+        f"profile {report['generator']}: {report['rows']} rows in {report['wall']:.3f}s "
+        f"({report['rows_per_second']:.0f} rows/s), peak RSS {report['peak_rss'] / 1048576:.1f} MB",
+    ]
+    total = sum(report["phases"].values()) or 1
+    for phase, seconds in report["phases"].items():
+        lines.append(f"  {phase:<10} {seconds:10.3f}s {100 * seconds / total:6.1f}%")
+    for file, table in report["tables"].items():
+        ratio = table["raw"] / table["compressed"] if table["compressed"] else 0
+        lines.append(f"  {file:<40} {table['rows']:>10} rows {table['raw']:>12} raw {table['compressed']:>12} gz "
+                     f"{ratio:5.1f}x")
+    print("\n".join(lines), file=sys.stderr)
+    if args.profile:
+        with open(args.profile, "a", encoding="utf-8") as fd:
+            fd.write(json.dumps(report, sort_keys=True) + "\n")
+
+
+def _shape_shard(task):
+    name, args, shard, first, last, shape = task
+    _existing.update(args.state["tables"])
+    counts, _ = shape(shard_numpy(name, args.seed, shard, "shape"), args, first, last)
+    return counts
+
+
+def _generate_shard(task):
+    global _profile
+    name, args, shard, first, last, tables, starts, offsets, final, row, shape, block = task
+    _existing.update(args.state["tables"])
+    _profile = dict.fromkeys(PHASES, 0.0) if args.profile is not None else None
+    begin = time.perf_counter()
+    fake = _faker(args.locale)
+    begin = _spend("faker", begin)
+    rng = shard_random(name, args.seed, shard)
+    fake.random = rng
+    writers = [make_writer(args, header, start) for (_, header), start in zip(tables, starts)]
+    if block:
+        nrng = shard_numpy(name, args.seed, shard)
+        data = None
+        if shape:
+            _, data = shape(shard_numpy(name, args.seed, shard, "shape"), args, first, last)
+        ids = [offset + start + 1 for start, offset in zip(starts, offsets)]
+        blocks = row(rng, nrng, fake, args, first, last, ids, data)
+    else:
+        blocks = [[row(rng, fake, args, i) for i in range(first, last)]]
+    begin = _spend("rows", begin)
+    for writer, rows in zip(writers, blocks):
+        for item in rows:
+            writer.write(item)
+    output = []
+    sizes = []
+    for writer in writers:
+        if final:
+            writer.close()
+        data = writer.getvalue().encode("utf-8")
+        begin = _spend("format", begin)
+        output.append(gzip.compress(data, COMPRESSLEVEL, mtime=0) if data else b"")
+        sizes.append(len(data))
+        begin = _spend("compress", begin)
+    return output, sizes, _profile
+
+
+def generate(args, name, tables, count, row, shape=None, block=False):
+    """
+    Generate the rows of a table (and its child tables) and write the files
+
+    @args   => the parsed command line options
+    @name   => name of the generator, used to seed the random generators
+    @tables => list of (file, header) tuples, the first one is the main table
+               and the others are the child tables
+    @count  => number of rows of the main table, the ids start at 1 or after
+               the max id of the table with --append
+    @row    => function(rng, fake, args, i) that returns the row i of the main
+               table, or function(rng, nrng, fake, args, first, last, ids, data)
+               that returns a list of rows for each table when block is used,
+               each row is a sequence with the values of the columns of the
+               header of its table, as Python strings, numbers or None,
+               with the rows of the main table from first to last-1, ids
+               contains the first id of each table and data is the data
+               returned by shape
+    @shape  => function(nrng, args, first, last) that returns the number of
+               rows of each table produced by the block and the data needed to
+               produce them, only required when there are child tables, it is
+               called with its own NumPy generator to allow to compute the ids
+               of each shard before generating it
+    @block  => generate the rows by blocks instead of row by row, the block is
+               the shard, rng is the Python generator used by Faker and nrng
+               is the NumPy generator of the shard
+
+    With --append the ids of each table start after its max id, the shards
+    are seeded with the name and the max id of the main table to not repeat
+    the rows of the previous runs, and the state is updated at the end
+
+    The files are added to the manifest of the output directory, and when
+    the manifest says that all the files are current they are kept and not
+    generated again, except with --append or --force
+
+    With --profile the times of the phases, the rows per second, the peak RSS
+    and the raw and compressed bytes of each file are reported at the end
+
+    Returns the list of the written files
+    """
+    generator = sys.modules[row.__module__].__file__
+    options = generator_options(args)
+    paths = [os.path.join(args.output, output_file(args, file)) for file, _ in tables]
+    if not args.append and not args.force and current_files(paths, generator, options):
+        return paths
+    clock = time.perf_counter()
+    phases = dict.fromkeys(PHASES, 0.0)
+    generator_name = name
+    offsets = [existing_rows(file.split(".")[0]) for file, _ in tables]
+    if offsets[0]:
+        name = f"{name}+{offsets[0]}"
+    shards = [(shard, first, min(first + args.shard, offsets[0] + count + 1))
+              for shard, first in enumerate(range(offsets[0] + 1, offsets[0] + count + 1, args.shard))]
+    workers = Pool(args.jobs) if args.jobs > 1 else None
+    imap = workers.imap if workers else map
+
+    # Compute the first row of each shard for each table
+    starts = [[0] * len(tables)]
+    if shape:
+        tasks = [(name, args, shard, first, last, shape) for shard, first, last in shards]
+        for counts in imap(_shape_shard, tasks):
+            starts.append([a + b for a, b in zip(starts[-1], counts)])
+    else:
+        for shard, first, last in shards:
+            starts.append([last - 1 - offsets[0]])
+    phases["shape"] = time.perf_counter() - clock
+
+    # Generate the shards and append the gzip members in order
+    files = [open(path, "wb") for path in paths]
+    tasks = [(name, args, shard, first, last, tables, starts[shard], offsets, shard == len(shards) - 1, row, shape,
+              block) for shard, first, last in shards]
+    raw = [0] * len(tables)
+    compressed = [0] * len(tables)
+    for output, sizes, times in imap(_generate_shard, tasks):
+        begin = time.perf_counter()
+        for index, (file, data) in enumerate(zip(files, output)):
+            file.write(data)
+            raw[index] += sizes[index]
+            compressed[index] += len(data)
+        phases["write"] += time.perf_counter() - begin
+        for phase, seconds in (times or {}).items():
+            phases[phase] += seconds
+    for file in files:
+        file.close()
+    if workers:
+        workers.close()
+        workers.join()
+    write_state(args, {file.split(".")[0]: offset + rows for (file, _), offset, rows in zip(tables, offsets, starts[-1])})
+    write_manifest(paths, generator, options, starts[-1])
+    if args.profile is not None:
+        wall = time.perf_counter() - clock
+        report_profile(args, {
+            "generator": generator_name,
+            "scale": args.scale,
+            "jobs": args.jobs,
+            "format": args.format,
+            "rows": sum(starts[-1]),
+            "wall": wall,
+            "rows_per_second": sum(starts[-1]) / wall if wall else 0,
+            "peak_rss": peak_rss(),
+            "phases": phases,
+            "tables": {
+                os.path.basename(path): {"rows": rows, "raw": size, "compressed": gz}
+                for path, rows, size, gz in zip(paths, starts[-1], raw, compressed)
+            },
+        })
+    return paths
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Local mail server
+
+This script runs a POP3 server that serves a corpus of emails from memory
+and a SMTP server that accepts and discards the sent emails, to measure the
+download of getmail and the sending of sendmail end to end in one machine
+without reaching a real mail server, the sample account of the emails app
+points to example.com, that can not be used offline
+
+The corpus is made of the .eml.gz (or .eml) files of the directories or
+files passed as arguments, the eml directory of the emails app by default,
+as the files generated by code/apps/emails/sample/python/step2.py or by
+scripts/samplestress.py, the files are loaded in memory when the server
+starts with the CRLF line ends and the dot stuffing already applied, the
+UIDL of each message is the name of its file without extension, and
+getmail stores the downloaded messages with this name
+
+The POP3 server implements the commands used by the pop3_class of getmail
+(USER, PASS, CAPA, STAT, LIST, UIDL, RETR, TOP, DELE, RSET, NOOP and QUIT)
+and the deleted messages are removed from the corpus at the end of the
+session unless --keep is used, the SMTP server implements EHLO, HELO,
+AUTH PLAIN and LOGIN, MAIL, RCPT, DATA, RSET, NOOP and QUIT as used by
+PHPMailer, the users and passwords are checked against --user and --password,
+and with --certfile the POP3 server uses TLS as the pop3_extra=tls accounts
+and the SMTP server offers STARTTLS as the smtp_extra=tls accounts
+
+--latency delays each response of both servers and --bandwidth limits the
+bytes per second sent by the POP3 server and read by the SMTP server in each
+connection, to emulate a remote server
+
+The server prints the messages and the bytes per second of both servers each
+--interval seconds and at the end to the standard error, and with --report
+the final report is appended as a JSON line to the file, the rates are
+computed between the first and the last command of the sessions, so the time
+waiting for the first client is not counted, the server ends after
+--sessions sessions, after --duration seconds or with Ctrl+C
+
+To download the corpus with getmail, change the POP3 settings of the account
+to point to the server, as pop3_host=127.0.0.1, pop3_port=1110 and an empty
+pop3_extra (or tls with --certfile), and the same for the SMTP settings
+
+Usage:
+
+scripts/samplemail.py [--host addr] [--pop3-port N] [--smtp-port N]
+                      [--latency ms] [--bandwidth Mbit/s] [--keep]
+                      [--sessions N] [--report file] [dirs or files]
+"""
+import os
+import sys
+import ssl
+import gzip
+import glob
+import json
+import time
+import base64
+import signal
+import asyncio
+import argparse
+
+ROOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CORPUS_PATH = os.path.join(ROOT_PATH, "code", "apps", "emails", "sample", "eml")
+
+# Bytes of each write of the limited connections
+CHUNK = 65536
+
+# Max size of the lines, the long base64 lines of the stress corpus are
+# longer than the default limit of the streams
+LIMIT = 1 << 26
+
+
+class Message:
+    """
+    Message of the corpus, with the UIDL, the size of the message with CRLF
+    line ends and the data ready to be sent by RETR, with the dot stuffing
+    """
+
+    def __init__(self, uidl, data):
+        lines = data.replace(b"\r\n", b"\n").split(b"\n")
+        if lines[-1] == b"":
+            lines.pop()
+        self.uidl = uidl
+        self.size = sum(len(line) + 2 for line in lines)
+        self.data = b"".join((b"." + line if line.startswith(b".") else line) + b"\r\n" for line in lines)
+
+    def top(self, count):
+        """
+        Returns the headers and the first count lines of the body, as TOP
+        """
+        headers, separator, body = self.data.partition(b"\r\n\r\n")
+        return headers + separator + b"".join(line + b"\r\n" for line in body.split(b"\r\n")[:-1][:count])
+
+
+def load_corpus(paths):
+    """
+    Returns the messages of the .eml.gz and .eml files of the paths, the
+    directories are read sorted by name and the repeated UIDLs get a suffix
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.eml.gz")) + glob.glob(os.path.join(path, "*.eml"))))
+        else:
+            files.append(path)
+    messages = []
+    uidls = set()
+    for file in files:
+        name = os.path.basename(file)
+        uidl = name[:-7] if name.endswith(".eml.gz") else os.path.splitext(name)[0]
+        suffix = 1
+        while uidl in uidls:
+            suffix += 1
+            uidl = f"{uidl.rsplit('~', 1)[0]}~{suffix}"
+        uidls.add(uidl)
+        opener = gzip.open if file.endswith(".gz") else open
+        with opener(file, "rb") as fd:
+            messages.append(Message(uidl, fd.read()))
+    return messages
+
+
+class Stats:
+    """
+    Counters of a server, the messages and the bytes of the messages, and
+    the times of the first and the last command used to compute the rates
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.sessions = 0
+        self.messages = 0
+        self.bytes = 0
+        self.first = None
+        self.last = None
+
+    def touch(self):
+        self.last = time.perf_counter()
+        if self.first is None:
+            self.first = self.last
+
+    def add(self, size):
+        self.messages += 1
+        self.bytes += size
+        self.touch()
+
+    def report(self):
+        seconds = self.last - self.first if self.first is not None else 0
+        return {
+            "sessions": self.sessions,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "seconds": round(seconds, 6),
+            "messages_per_second": round(self.messages / seconds, 3) if seconds else 0,
+            "bytes_per_second": round(self.bytes / seconds, 3) if seconds else 0,
+        }
+
+    def line(self):
+        report = self.report()
+        return (f"{self.name}: {report['sessions']} sessions, {report['messages']} messages, "
+                f"{report['bytes'] / 1048576:.1f} MB in {report['seconds']:.3f}s "
+                f"({report['messages_per_second']:.1f} msgs/s, {report['bytes_per_second'] / 1048576:.2f} MB/s)")
+
+
+class Connection:
+    """
+    Connection of a client with the --latency and --bandwidth of the
+    server, the latency is added before each response and the bandwidth
+    limits the bytes written and read by the connection
+    """
+
+    def __init__(self, args, reader, writer):
+        self.args = args
+        self.reader = reader
+        self.writer = writer
+        self.rate = args.bandwidth * 125000
+        self.begin = time.perf_counter()
+        self.bytes = 0
+
+    async def throttle(self, size):
+        # The connection can not go ahead of the bytes allowed since it began,
+        # and the idle time does not allow bursts
+        if self.rate:
+            now = time.perf_counter()
+            self.begin = max(self.begin, now - self.bytes / self.rate)
+            self.bytes += size
+            delay = self.begin + self.bytes / self.rate - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def send(self, *lines, data=b""):
+        if self.args.latency:
+            await asyncio.sleep(self.args.latency / 1000)
+        self.writer.write(b"".join(line.encode("utf-8") + b"\r\n" for line in lines))
+        if not self.rate:
+            self.writer.write(data)
+        for offset in range(0, len(data) if self.rate else 0, CHUNK):
+            chunk = data[offset:offset + CHUNK]
+            self.writer.write(chunk)
+            await self.throttle(len(chunk))
+            await self.writer.drain()
+        await self.writer.drain()
+
+    async def readline(self):
+        line = await self.reader.readline()
+        await self.throttle(len(line))
+        return line
+
+
+def check_login(args, user, password):
+    return user == args.user and password == args.password
+
+
+async def pop3_session(args, messages, stats, reader, writer):
+    """
+    Serves a POP3 session, the state of the session is the user, the login
+    flag and the set of deleted messages, that are removed from the shared
+    list of messages by QUIT unless --keep is used
+    """
+    conn = Connection(args, reader, writer)
+    user = None
+    logged = False
+    deleted = set()
+    await conn.send(f"+OK SaltOS sample POP3 server ready <{os.getpid()}.{time.time_ns()}@samplemail>")
+    while True:
+        line = await conn.readline()
+        if not line:
+            break
+        stats.touch()
+        command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+        command = command.upper()
+        if command == "QUIT":
+            if logged and not args.keep:
+                for message in deleted:
+                    messages.remove(message)
+            await conn.send("+OK bye")
+            break
+        if command == "CAPA":
+            await conn.send("+OK capability list follows", "USER", "UIDL", "TOP", ".")
+        elif command == "NOOP":
+            await conn.send("+OK")
+        elif not logged:
+            if command == "USER":
+                user = argument
+                await conn.send("+OK send the password")
+            elif command == "PASS" and user is not None and check_login(args, user, argument):
+                logged = True
+                await conn.send(f"+OK {user} logged in")
+            else:
+                await conn.send("-ERR authentication failed")
+        else:
+            current = [(index, message) for index, message in enumerate(messages, 1) if message not in deleted]
+            if command in ("LIST", "UIDL", "RETR", "TOP", "DELE") and argument:
+                number = argument.split(" ")[0]
+                index = int(number) if number.isdigit() else 0
+                message = messages[index - 1] if 0 < index <= len(messages) else None
+                if message is None or message in deleted:
+                    await conn.send("-ERR no such message")
+                    continue
+            if command == "STAT":
+                await conn.send(f"+OK {len(current)} {sum(message.size for _, message in current)}")
+            elif command == "LIST" and argument:
+                await conn.send(f"+OK {index} {message.size}")
+            elif command == "LIST":
+                await conn.send(f"+OK {len(current)} messages",
+                                *[f"{index} {message.size}" for index, message in current], ".")
+            elif command == "UIDL" and argument:
+                await conn.send(f"+OK {index} {message.uidl}")
+            elif command == "UIDL":
+                await conn.send("+OK", *[f"{index} {message.uidl}" for index, message in current], ".")
+            elif command == "RETR" and argument:
+                await conn.send(f"+OK {message.size} octets", data=message.data + b".\r\n")
+                stats.add(message.size)
+            elif command == "TOP" and argument.count(" ") == 1 and argument.split(" ")[1].isdigit():
+                await conn.send("+OK", data=message.top(int(argument.split(" ")[1])) + b".\r\n")
+            elif command == "DELE" and argument:
+                deleted.add(message)
+                await conn.send(f"+OK message {index} deleted")
+            elif command == "RSET":
+                deleted.clear()
+                await conn.send("+OK")
+            else:
+                await conn.send("-ERR unknown command or missing argument")
+    writer.close()
+
+
+async def smtp_auth(conn, args, argument):
+    """
+    Returns if the AUTH PLAIN or AUTH LOGIN exchange ends with the user and
+    the password of the server
+    """
+    mechanism, _, initial = argument.partition(" ")
+    try:
+        if mechanism.upper() == "PLAIN":
+            if not initial:
+                await conn.send("334 ")
+                initial = (await conn.readline()).decode("ascii").strip()
+            _, user, password = base64.b64decode(initial).decode("utf-8").split("\0")
+        elif mechanism.upper() == "LOGIN":
+            if not initial:
+                await conn.send("334 VXNlcm5hbWU6")
+                initial = (await conn.readline()).decode("ascii").strip()
+            await conn.send("334 UGFzc3dvcmQ6")
+            user = base64.b64decode(initial).decode("utf-8")
+            password = base64.b64decode((await conn.readline()).decode("ascii").strip()).decode("utf-8")
+        else:
+            return False
+    except ValueError:
+        return False
+    return check_login(args, user, password)
+
+
+async def smtp_session(args, context, stats, reader, writer):
+    """
+    Serves a SMTP session, the data of the emails is read and discarded, and
+    each accepted email is counted with its bytes
+    """
+    conn = Connection(args, reader, writer)
+    sender = None
+    recipients = 0
+    await conn.send("220 samplemail SaltOS sample SMTP server ready")
+    while True:
+        line = await conn.readline()
+        if not line:
+            break
+        stats.touch()
+        command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+        command = command.upper()
+        if command == "QUIT":
+            await conn.send("221 bye")
+            break
+        if command == "EHLO":
+            sender, recipients = None, 0
+            extensions = ["8BITMIME", "AUTH PLAIN LOGIN"]
+            if context and not writer.get_extra_info("sslcontext"):
+                extensions.append("STARTTLS")
+            await conn.send("250-samplemail", *[f"250-{extension}" for extension in extensions[:-1]],
+                            f"250 {extensions[-1]}")
+        elif command == "HELO":
+            sender, recipients = None, 0
+            await conn.send("250 samplemail")
+        elif command == "STARTTLS" and context and not writer.get_extra_info("sslcontext"):
+            await conn.send("220 ready to start TLS")
+            await writer.start_tls(context)
+        elif command == "AUTH":
+            if await smtp_auth(conn, args, argument):
+                await conn.send("235 authentication successful")
+            else:
+                await conn.send("535 authentication failed")
+        elif command == "MAIL":
+            sender, recipients = argument, 0
+            await conn.send("250 OK")
+        elif command == "RCPT" and sender is not None:
+            recipients += 1
+            await conn.send("250 OK")
+        elif command == "DATA" and recipients:
+            await conn.send("354 end data with <CR><LF>.<CR><LF>")
+            size = 0
+            while True:
+                line = await conn.readline()
+                if not line or line == b".\r\n":
+                    break
+                size += len(line) - line.startswith(b"..")
+            stats.add(size)
+            sender, recipients = None, 0
+            await conn.send("250 OK queued")
+        elif command == "RSET":
+            sender, recipients = None, 0
+            await conn.send("250 OK")
+        elif command == "NOOP":
+            await conn.send("250 OK")
+        else:
+            await conn.send("503 bad sequence of commands or unknown command")
+    writer.close()
+
+
+async def serve(args, messages, context):
+    """
+    Runs the servers until the end of --sessions, --duration or a signal,
+    and prints the rates of the servers each --interval seconds
+    """
+    done = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, done.set)
+    pop3 = Stats("pop3")
+    smtp = Stats("smtp")
+
+    def session(stats, handler):
+        async def run(reader, writer):
+            try:
+                await handler(reader, writer)
+            except (ConnectionError, ssl.SSLError, ValueError) as error:
+                print(f"{stats.name}: {error}", file=sys.stderr)
+                writer.close()
+            stats.sessions += 1
+            if args.sessions and pop3.sessions + smtp.sessions >= args.sessions:
+                done.set()
+        return run
+
+    servers = [await asyncio.start_server(
+        session(pop3, lambda reader, writer: pop3_session(args, messages, pop3, reader, writer)),
+        args.host, args.pop3_port, ssl=context, limit=LIMIT)]
+    if args.smtp_port:
+        servers.append(await asyncio.start_server(
+            session(smtp, lambda reader, writer: smtp_session(args, context, smtp, reader, writer)),
+            args.host, args.smtp_port, limit=LIMIT))
+    size = sum(message.size for message in messages)
+    print(f"Serving {len(messages)} messages ({size / 1048576:.1f} MB) by POP3 on {args.host}:{args.pop3_port}"
+          + (f" and SMTP on {args.host}:{args.smtp_port}" if args.smtp_port else ""), file=sys.stderr)
+    begin = time.perf_counter()
+    while not done.is_set():
+        timeout = args.interval or None
+        if args.duration:
+            timeout = min(timeout or args.duration, max(begin + args.duration - time.perf_counter(), 0))
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            if args.duration and time.perf_counter() - begin >= args.duration:
+                break
+            for stats in (pop3, smtp):
+                if stats.first is not None:
+                    print(stats.line(), file=sys.stderr)
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+    return pop3, smtp
+
+
+def main(args):
+    context = None
+    if args.certfile:
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(args.certfile, args.keyfile)
+    messages = load_corpus(args.paths or [CORPUS_PATH])
+    if not messages:
+        sys.exit("The corpus does not contain any .eml.gz or .eml file")
+    corpus = len(messages)
+    pop3, smtp = asyncio.run(serve(args, messages, context))
+    print(pop3.line(), file=sys.stderr)
+    if args.smtp_port:
+        print(smtp.line(), file=sys.stderr)
+    if args.report:
+        report = {
+            "corpus": corpus,
+            "latency": args.latency,
+            "bandwidth": args.bandwidth,
+            "pop3": pop3.report(),
+            "smtp": smtp.report(),
+        }
+        with open(args.report, "a", encoding="utf-8") as fd:
+            fd.write(json.dumps(report, sort_keys=True) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a corpus of emails by POP3 and accept emails by SMTP")
+    parser.add_argument("paths", nargs="*", help="Directories or files of the corpus, the eml directory of the emails app by default")
+    parser.add_argument("--host", default="127.0.0.1", help="Address where the servers listen")
+    parser.add_argument("--pop3-port", type=int, default=1110, help="Port of the POP3 server")
+    parser.add_argument("--smtp-port", type=int, default=1025, help="Port of the SMTP server, 0 to not start it")
+    parser.add_argument("--user", default="admin", help="User accepted by the servers")
+    parser.add_argument("--password", default="admin", help="Password accepted by the servers")
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds added before each response")
+    parser.add_argument("--bandwidth", type=float, default=0, help="Mbit/s of each connection, 0 for no limit")
+    parser.add_argument("--keep", action="store_true", help="Keep the deleted messages in the corpus")
+    parser.add_argument("--certfile", help="Certificate to use TLS in POP3 and STARTTLS in SMTP")
+    parser.add_argument("--keyfile", help="Private key of the certificate, if it is not in the certfile")
+    parser.add_argument("--interval", type=float, default=5, help="Seconds between the reports, 0 to only report at the end")
+    parser.add_argument("--sessions", type=int, default=0, help="End after this number of sessions, 0 for no limit")
+    parser.add_argument("--duration", type=float, default=0, help="End after this number of seconds, 0 for no limit")
+    parser.add_argument("--report", help="File where the final report is appended as a JSON line")
+    main(parser.parse_args())
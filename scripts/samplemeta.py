@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Control, version and index rows of the sample data
+
+This script computes the rows that the setup adds to the *_control,
+*_version and *_index tables of each app after loading its sample data, and
+writes them as .csv.gz files in the sample/sql directory of the app, the setup
+loads these files as the other tables and does not call make_control,
+make_version and make_index for each register of the app
+
+The rows are computed in a temporary SQLite database loaded with the
+sample/sql files of the apps, using the functions of scripts/samplesqlite.py,
+so the files must be generated again each time that the sample data changes,
+the database is written to disk and the tables are streamed to the files to
+keep the memory bounded with big scale factors, and the files are added to
+the manifest.json file of the directory as the files of the generators
+
+Usage:
+
+scripts/samplemeta.py [--output dir] [--input dir] [--date YYYY-MM-DD] [apps]
+
+Without apps, processes all the apps with sample files, with --input the
+files of each app are read from and written to the <dir>/<app> directories
+written by scripts/sampleall.py --output
+"""
+import os
+import io
+import csv
+import gzip
+import argparse
+import tempfile
+from datetime import date
+
+from samplelib import COMPRESSLEVEL, DATE, read_dbschema, read_manifests, write_manifest
+from samplesqlite import META, open_database, fill_database, app_list, sample_dir
+
+
+def write_table(db, table, file):
+    """
+    Writes a table as a .csv.gz file with the names of the columns in the
+    first line, the gzip header does not contain the time to get always the
+    same file for the same data
+    """
+    cursor = db.execute(f"SELECT * FROM {table} ORDER BY id")
+    with gzip.GzipFile(file, "wb", COMPRESSLEVEL, mtime=0) as gz:
+        with io.TextIOWrapper(gz, encoding="utf-8", newline="") as fd:
+            writer = csv.writer(fd, lineterminator="\n")
+            writer.writerow([column[0] for column in cursor.description])
+            writer.writerows(cursor)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the control, version and index rows of the sample data")
+    parser.add_argument("apps", nargs="*", help="Apps to process, all the apps with sample/sql files by default")
+    parser.add_argument("--output", help="Output directory, the directory of the sample files of each app by default")
+    parser.add_argument("--input", help="Directory with the sample files of each app in <dir>/<app>, as written by "
+                        "scripts/sampleall.py --output (the sample/sql directory of each app by default)")
+    parser.add_argument("--date", type=date.fromisoformat, default=DATE,
+                        help=f"Date of the control and version rows, as YYYY-MM-DD ({DATE})")
+    args = parser.parse_args()
+    if args.input and not os.path.isdir(args.input):
+        parser.error(f"{args.input} is not a directory")
+    apps = app_list(parser, args.apps, args.input)
+    tables = read_dbschema(core=True, auto=True)
+    manifests = read_manifests()
+    with tempfile.TemporaryDirectory(prefix="samplemeta") as temp:
+        db = open_database(os.path.join(temp, "samplemeta.sqlite"))
+        loaded = fill_database(db, tables, apps, f"{args.date} 00:00:00", meta=False, input=args.input)
+        for table in loaded:
+            output = args.output or sample_dir(manifests[table]["app"], args.input)
+            os.makedirs(output, exist_ok=True)
+            for name in META:
+                if f"{table}_{name}" in tables:
+                    file = os.path.join(output, f"{table}_{name}.csv.gz")
+                    write_table(db, f"{table}_{name}", file)
+                    write_manifest([file], __file__, {"date": args.date.isoformat()})
+                    print(file)
+        db.close()
@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+"""
+Prebuilt SQLite database
+
+This script builds a SQLite database with the structure that db_schema
+creates and the sample data that the setup of each app loads, the tables are
+created using the xml/dbschema.xml files with the same types, defaults and
+index names used by db_schema, so the next setup finds the structure updated
+and only has to add the static data and the admin user
+
+The rows of the sample/sql files of the apps are loaded in one transaction
+using prepared statements without journal, and the indexes are created after
+the data, the database is written to a temporary file and renamed at the end
+to never leave a half built database in the output
+
+The control, version and index rows of the loaded apps are computed in bulk,
+the control and index rows with one INSERT ... SELECT by app that uses the
+same fields and subqueries of __make_index_helper, and the version rows with
+the same serialized data and hash chain of make_version, this module also
+provides these functions to scripts/samplemeta.py
+
+Usage:
+
+scripts/samplesqlite.py [--output file] [--input dir] [--date YYYY-MM-DD] [apps]
+scripts/samplesqlite.py --output file --append dir [--date YYYY-MM-DD]
+
+Without apps, loads the sample/sql files of all the apps, or the files of
+the directory of each app inside --input (as written by sampleall.py
+--output and read by the setup with the sample environment variable), with
+--append loads the files of new rows found in dir (as made by the generators
+with --append) in the existing database and computes the control, version
+and index rows of the new registers, without --date the day after the last
+control row is used
+"""
+import os
+import re
+import io
+import csv
+import gzip
+import glob
+import base64
+import hashlib
+import sqlite3
+import argparse
+from datetime import date, timedelta
+
+from samplelib import APPS_PATH, DATE, read_dbschema, read_manifests, read_manifest, read_state, header_columns, sql_values
+
+# Default values of the fields by type, as done by __dbschema_create_table
+DEFAULTS = {
+    "int": "0",
+    "float": "0",
+    "date": "0000-00-00",
+    "time": "00:00:00",
+    "datetime": "0000-00-00 00:00:00",
+    "string": "",
+}
+
+DATATYPES = {
+    "int": ("TINYINT", "SMALLINT", "MEDIUMINT", "INT", "BIGINT", "INTEGER"),
+    "string": ("TINYTEXT", "TEXT", "MEDIUMTEXT", "LONGTEXT", "VARCHAR"),
+    "float": ("DECIMAL", "NUMERIC", "FLOAT", "REAL", "DOUBLE"),
+    "date": ("DATE",),
+    "time": ("TIME",),
+    "datetime": ("DATETIME",),
+}
+
+# Words escaped by escape_reserved_word
+RESERVED = (
+    "key", "value", "field", "table", "default", "order", "group",
+    "from", "to", "in", "out", "start", "stop", "begin", "end",
+)
+
+# Tokens of the .sql.gz files: the separators, comments and transaction
+# statements between the INSERT headers and the rows
+_skip = re.compile(r"(?:\s+|[,;]|/\*.*?\*/|COMMIT\b|BEGIN\b)*", re.S)
+_insert = re.compile(r"INSERT INTO\s+`?\w+`?\s*(?:\([^)]*\))?\s*VALUES", re.S)
+_row = re.compile(r"\((?:'(?:[^']|'')*'|[^'()])*\)", re.S)
+
+CHUNK = 1 << 22
+
+# Rows added by the setup of the core, used by the indexes of the tables that
+# point to the admin user or group
+ADMIN = {
+    "tbl_users": {
+        "id": 1, "active": 1, "group_id": 1, "login": "admin", "name": "Admin",
+        "description": "Admin user", "start": "00:00:00", "end": "23:59:59", "days": "1111111",
+    },
+    "tbl_groups": {"id": 1, "active": 1, "code": "admin", "name": "Admin", "description": "Admin group"},
+}
+
+# Tables added by the make_control, make_version and make_index functions
+META = ("control", "version", "index")
+
+
+def parse_query(query):
+    """
+    Returns the SQLite part of a text in the parse_query syntax, as INTEGER
+    for /*MYSQL INT(11) *//*SQLITE INTEGER */
+    """
+    query = re.sub(r"/\*SQLITE (.*?)\*/", lambda match: match.group(1).strip(), query, flags=re.S)
+    return re.sub(r"/\*MYSQL .*?\*/", "", query, flags=re.S).strip()
+
+
+def escape(word):
+    return f"`{word}`" if word in RESERVED else word
+
+
+def field_default(type):
+    """
+    Returns the default value of a field type, as done by get_field_type
+    """
+    type = parse_query(type).split("(")[0].upper()
+    for key, types in DATATYPES.items():
+        if type in types:
+            return DEFAULTS[key]
+    raise ValueError(f"Unknown type '{type}'")
+
+
+def create_table(table, spec):
+    """
+    Returns the CREATE TABLE of a table, as done by __dbschema_create_table
+    """
+    fields = []
+    for field in spec["fields"]:
+        extra = f"NOT NULL DEFAULT '{field_default(field['type'])}'"
+        if field["pkey"]:
+            extra = "PRIMARY KEY AUTOINCREMENT"
+        fields.append(f"{escape(field['name'])} {parse_query(field['type'])} {extra}")
+    for field in spec["fields"]:
+        if field["fkey"]:
+            fields.append(f"FOREIGN KEY ({field['name']}) REFERENCES {field['fkey']} (id)")
+    return f"CREATE TABLE {table} ({','.join(fields)})"
+
+
+def create_index(table, fields):
+    """
+    Returns the CREATE INDEX of an index, named as done by __dbschema_auto_name
+    """
+    name = f"{table}_{'_'.join(fields)}"[:64]
+    return f"CREATE INDEX {name} ON {table} ({','.join(escape(field) for field in fields)})"
+
+
+def sql_rows(fd, columns):
+    """
+    Returns the rows of a .sql.gz file as lists of values sorted as the
+    columns of the file, the file is read by chunks to support files bigger
+    than the memory, the columns list is filled with the columns of the first
+    INSERT and all the INSERT of the file must use the same columns
+    """
+    buffer = ""
+    pos = 0
+    eof = False
+    positions = None
+    headers = {}
+    while True:
+        pos = _skip.match(buffer, pos).end()
+        match = _row.match(buffer, pos)
+        if match and positions is not None:
+            values = sql_values(match.group(0))
+            yield [values[index] for index in positions]
+            pos = match.end()
+            continue
+        match = _insert.match(buffer, pos)
+        if match:
+            if match.group(0) not in headers:
+                headers[match.group(0)] = header_columns(match.group(0))[1]
+            temp = headers[match.group(0)]
+            if not columns:
+                columns.extend(name for name, _ in temp)
+            if [name for name, _ in temp] != columns:
+                raise ValueError(f"Different columns in {match.group(0)}")
+            positions = [index for _, index in temp]
+            pos = match.end()
+            continue
+        if eof:
+            if buffer[pos:].strip():
+                raise ValueError(f"Unexpected data {buffer[pos:pos + 50]!r}")
+            return
+        chunk = fd.read(CHUNK)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def tsv_rows(fd):
+    """
+    Returns the rows of a .tsv.gz file, unescaping the values as LOAD DATA
+    """
+    escapes = {"\\\\": "\\", "\\t": "\t", "\\n": "\n", "\\r": "\r"}
+    for line in fd:
+        yield [re.sub(r"\\[\\tnr]", lambda match: escapes[match.group(0)], value)
+               for value in line.rstrip("\n").split("\t")]
+
+
+def load_file(db, file):
+    """
+    Loads a .sql.gz, .csv.gz or .tsv.gz file of the sample/sql directories
+    and returns the table and the number of rows loaded
+    """
+    table = os.path.basename(file).split(".")[0]
+    with io.TextIOWrapper(gzip.open(file), "utf-8", newline="") as fd:
+        if file.endswith(".sql.gz"):
+            columns = []
+            rows = sql_rows(fd, columns)
+            first = next(rows, None)
+            if first is None:
+                return table, 0
+            rows = [first], rows
+        else:
+            rows = csv.reader(fd) if file.endswith(".csv.gz") else tsv_rows(fd)
+            columns = next(rows, None)
+            if columns is None:
+                return table, 0
+            rows = (rows,)
+        fields = ",".join(escape(column) for column in columns)
+        marks = ",".join("?" * len(columns))
+        before = db.total_changes
+        for part in rows:
+            db.executemany(f"INSERT INTO {table} ({fields}) VALUES ({marks})", part)
+        return table, db.total_changes - before
+
+
+def php_string(value):
+    """
+    Returns the string of a value as PHP converts it, the floats use the 14
+    digits of the precision setting and the null values are empty strings
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.14G}"
+    return str(value)
+
+
+def php_bool(value):
+    """
+    Returns the boolean of a value as PHP evaluates it
+    """
+    return value not in (None, 0, 0.0, "", "0")
+
+
+def php_serialize(value):
+    """
+    Returns the value serialized as the PHP serialize function, supports the
+    dicts, the strings, the integers, the floats and the null values
+    """
+    if value is None:
+        return "N;"
+    if isinstance(value, int):
+        return f"i:{value};"
+    if isinstance(value, float):
+        temp = repr(value)
+        if "e" in temp:
+            mantissa, exponent = temp.split("e")
+            if "." not in mantissa:
+                mantissa += ".0"
+            temp = f"{mantissa}E{'' if exponent.startswith('-') else '+'}{exponent.lstrip('+')}"
+        elif temp.endswith(".0"):
+            temp = temp[:-2]
+        return f"d:{temp};"
+    if isinstance(value, dict):
+        items = "".join(php_serialize(key) + php_serialize(val) for key, val in value.items())
+        return f"a:{len(value)}:{{{items}}}"
+    return f's:{len(str(value).encode())}:"{value}";'
+
+
+def find_in_set(value, values):
+    """
+    FIND_IN_SET of libsqlite, returns the position of the value in the comma
+    separated list or zero
+    """
+    values = php_string(values).split(",")
+    value = php_string(value)
+    return values.index(value) + 1 if value in values else 0
+
+
+def open_database(file, journal=False):
+    """
+    Opens a database without journal (unless journal is true, as needed to
+    not break an existing database if the load fails) and with the functions
+    that libsqlite adds to SQLite and that are used by the indexes
+    """
+    db = sqlite3.connect(file, isolation_level=None)
+    if not journal:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+    db.execute("PRAGMA locking_mode=EXCLUSIVE")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA cache_size=-262144")
+    db.create_function("CONCAT", -1, lambda *args: "".join(php_string(arg) for arg in args), deterministic=True)
+    db.create_function("IF", 3, lambda condition, yes, no: yes if php_bool(condition) else no, deterministic=True)
+    db.create_function("FIND_IN_SET", 2, find_in_set, deterministic=True)
+    return db
+
+
+def subtables(spec):
+    """
+    Returns the subtables of an app as a list of subtable and field tuples,
+    as done by __apps_subtables_helper
+    """
+    result = []
+    for subtable in filter(None, spec.get("subtables", "").split(",")):
+        subtable = subtable.split(":")[-1]
+        result.append((subtable.split("(")[0], subtable.split("(")[1].split(")")[0]))
+    return result
+
+
+def index_fields(tables, manifests, table, alias=""):
+    """
+    Returns the fields and subqueries used to index a table, as done by
+    __make_index_helper, the alias is the name of the table in the outer
+    query used to resolve the foreign keys of the main table of the app
+    """
+    result = [escape(field["name"]) for field in tables[table]["fields"]]
+    if manifests.get(table, {}).get("field"):
+        result.append(manifests[table]["field"])
+    for field in tables[table]["fields"]:
+        if not field["fkey"]:
+            continue
+        key = f"{alias}.{field['name']}" if alias else field["name"]
+        fkey = field["fkey"]
+        temp = manifests.get(fkey, {}).get("field", "")
+        if temp == "":
+            temp = ",' ',".join(escape(field["name"]) for field in tables[fkey]["fields"])
+            if temp != "":
+                temp = f"CONCAT({temp})"
+        if field_default(field["type"]) == "":
+            where = f"FIND_IN_SET({fkey}.id,{key})"
+            temp = f"GROUP_CONCAT({temp})"
+        else:
+            where = f"{fkey}.id={key}"
+        if temp != "":
+            result.append(f"(SELECT {temp} FROM {fkey} WHERE {where})")
+    return result
+
+
+def index_query(tables, manifests, table, after=0):
+    """
+    Returns the INSERT ... SELECT that fills the index table of an app with
+    the same search field that make_index computes for each register after
+    the id passed
+    """
+    fields = ",' ',".join(f"IFNULL(({field}),'')" for field in index_fields(tables, manifests, table, "__main"))
+    queries = [f"CONCAT({fields})"]
+    others = subtables(manifests[table])
+    others += [(f"{table}_{name}", "reg_id") for name in ("files", "notes") if f"{table}_{name}" in tables]
+    for subtable, field in others:
+        fields = ",' ',".join(f"IFNULL(({field}),'')" for field in index_fields(tables, manifests, subtable))
+        queries.append(f"SELECT GROUP_CONCAT(CONCAT({fields})) FROM {subtable} WHERE {field}=__main.id")
+    search = ",' ',".join(f"IFNULL(({query}),'')" for query in queries)
+    return (f"INSERT INTO {table}_index (id, search) SELECT id, CONCAT({search}) FROM {table} __main "
+            f"WHERE id > {int(after)} ORDER BY id")
+
+
+def version_rows(db, tables, manifests, table, datetime, after=0):
+    """
+    Returns the rows of the version table of an app, with the same data and
+    hash that make_version computes for the first version of each register
+    after the id passed
+    """
+    others = subtables(manifests[table])
+    others += [(f"{table}_{name}", "id" if name == "control" else "reg_id")
+               for name in ("control", "files", "notes") if f"{table}_{name}" in tables]
+    cursors = []
+    for subtable, field in others:
+        cursor = db.cursor()
+        cursor.execute(f"SELECT * FROM {subtable} WHERE {field} > ? ORDER BY {field}, id", (after,))
+        names = [column[0] for column in cursor.description]
+        cursors.append([subtable, names.index(field), names, cursor, cursor.fetchone()])
+    cursor = db.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id", (after,))
+    names = [column[0] for column in cursor.description]
+    for row in cursor:
+        reg_id = row[0]
+        data = {table: {reg_id: dict(zip(names, row))}}
+        for temp in cursors:
+            subtable, position, subnames, subcursor, subrow = temp
+            data[subtable] = {}
+            while subrow is not None and subrow[position] is not None and subrow[position] <= reg_id:
+                if subrow[position] == reg_id:
+                    values = dict(zip(subnames, subrow))
+                    if subtable == f"{table}_files":
+                        del values["search"]
+                    data[subtable][values["id"]] = values
+                subrow = subcursor.fetchone()
+            temp[4] = subrow
+        array = {
+            "user_id": 1,
+            "datetime": datetime,
+            "reg_id": reg_id,
+            "ver_id": 1,
+            "data": base64.b64encode(php_serialize(data).encode()).decode(),
+            "hash": "",
+        }
+        array["hash"] = hashlib.md5(php_serialize(array).encode()).hexdigest()
+        yield array
+
+
+def make_meta(db, tables, manifests, table, datetime, names=META):
+    """
+    Fills the control, version and index tables of an app that exist (only
+    the tables of names) with the rows of the registers after the last
+    register of each table (all the registers when the table is empty), and
+    returns the number of rows added to each table
+    """
+    result = {}
+    for name in names:
+        meta = f"{table}_{name}"
+        if meta not in tables:
+            continue
+        after = db.execute(f"SELECT IFNULL(MAX({'reg_id' if name == 'version' else 'id'}), 0) FROM {meta}").fetchone()[0]
+        before = db.total_changes
+        if name == "control":
+            db.execute(f"INSERT INTO {meta} (id, user_id, group_id, datetime) "
+                       f"SELECT id, 1, 1, ? FROM {table} WHERE id > ? ORDER BY id", (datetime, after))
+        elif name == "version":
+            db.executemany(f"INSERT INTO {meta} (user_id, datetime, reg_id, ver_id, data, hash) "
+                           "VALUES (:user_id, :datetime, :reg_id, :ver_id, :data, :hash)",
+                           version_rows(db, tables, manifests, table, datetime, after))
+        else:
+            db.execute(index_query(tables, manifests, table, after))
+        result[meta] = db.total_changes - before
+    return result
+
+
+def app_table(manifests, table):
+    """
+    Returns the main table of the app of a table or subtable, or an empty
+    string if the table is not part of any app
+    """
+    if table in manifests:
+        return table
+    for main, spec in manifests.items():
+        if table in [subtable for subtable, _ in subtables(spec)]:
+            return main
+    return ""
+
+
+def meta_table(manifests, table):
+    """
+    Returns true if the table is a control, version or index table of an app
+    """
+    return any(table == f"{main}_{name}" for main in manifests for name in META)
+
+
+def sample_dir(app, input=None):
+    """
+    Returns the directory of the sample files of an app, the sample/sql
+    directory of the app or the directory of the app inside input, as the
+    directories written by scripts/sampleall.py --output
+    """
+    return os.path.join(input, app) if input else os.path.join(APPS_PATH, app, "sample", "sql")
+
+
+def sample_files(directory):
+    """
+    Returns the .sql.gz, .csv.gz and .tsv.gz files of a directory, sorted
+    """
+    files = []
+    for format in ("sql", "csv", "tsv"):
+        files.extend(glob.glob(os.path.join(directory, f"*.{format}.gz")))
+    return sorted(files)
+
+
+def load_apps(db, apps, meta=True, input=None):
+    """
+    Loads the sample files of the apps (see sample_dir), ignoring the files of the tables
+    that contain data as the setup does, and the files of the control,
+    version and index tables if meta is false, and returns the main tables of
+    the apps that got rows, the sha256 of the files found in the manifest.json
+    files are stored in tbl_config as the setup does
+    """
+    manifests = read_manifests()
+    loaded = []
+    for app in apps:
+        hashes = read_manifest(sample_dir(app, input))
+        for file in sample_files(sample_dir(app, input)):
+            table = os.path.basename(file).split(".")[0]
+            if not meta and meta_table(manifests, table):
+                continue
+            if db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]:
+                continue
+            table, count = load_file(db, file)
+            print(f"{table} {count}")
+            name = os.path.basename(file)
+            if name in hashes:
+                db.execute("INSERT INTO tbl_config (user_id, `key`, val) VALUES (0, ?, ?)",
+                           (f"sample/{app}/{name}", hashes[name]["sha256"]))
+            main = app_table(manifests, table)
+            if count and main and main not in loaded:
+                loaded.append(main)
+    return loaded
+
+
+def fill_database(db, tables, apps, datetime, meta=True, input=None):
+    """
+    Creates the tables and the indexes, loads the sample data of the apps and
+    computes the control, version and index rows of the loaded apps, the meta
+    and input arguments are passed to load_apps, and returns the main tables of the apps
+    that got rows
+    """
+    manifests = read_manifests()
+    db.execute("BEGIN")
+    for table, spec in tables.items():
+        if not spec["ignore"]:
+            db.execute(create_table(table, spec))
+    loaded = load_apps(db, apps, meta, input)
+    for table, spec in tables.items():
+        if not spec["ignore"]:
+            for fields in spec["indexes"]:
+                db.execute(create_index(table, fields))
+    # The admin user and group only exist while the indexes are computed,
+    # they are added later by the setup with their password
+    added = add_admin(db)
+    for table in loaded:
+        for name, count in make_meta(db, tables, manifests, table, datetime).items():
+            print(f"{name} {count}")
+    remove_admin(db, added)
+    db.execute("COMMIT")
+    return loaded
+
+
+def add_admin(db):
+    """
+    Adds the admin user and group to the empty tables, and returns the
+    tables that got them
+    """
+    added = []
+    for table, row in ADMIN.items():
+        if not db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]:
+            db.execute(f"INSERT INTO {table} ({','.join(map(escape, row))}) VALUES ({','.join('?' * len(row))})",
+                       list(row.values()))
+            added.append(table)
+    return added
+
+
+def remove_admin(db, added):
+    """
+    Removes the admin user and group added by add_admin
+    """
+    for table in added:
+        db.execute(f"DELETE FROM {table}")
+        db.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+
+
+def append_database(db, tables, files, datetime):
+    """
+    Loads the files of new rows made by the generators with --append in an
+    existing database, and computes the control, version and index rows of
+    the new registers of the apps, returns the main tables that got rows
+    """
+    manifests = read_manifests()
+    db.execute("BEGIN")
+    loaded = []
+    for file in files:
+        table, count = load_file(db, file)
+        print(f"{table} {count}")
+        main = app_table(manifests, table)
+        if count and main and main not in loaded:
+            loaded.append(main)
+    added = add_admin(db)
+    for table in loaded:
+        for name, count in make_meta(db, tables, manifests, table, datetime).items():
+            print(f"{name} {count}")
+    remove_admin(db, added)
+    db.execute("COMMIT")
+    return loaded
+
+
+def build(output, apps, datetime, input=None):
+    """
+    Builds the database in a temporary file and renames it to the output
+    """
+    temp = f"{output}.tmp"
+    if os.path.exists(temp):
+        os.remove(temp)
+    db = open_database(temp)
+    fill_database(db, read_dbschema(core=True, auto=True), apps, datetime, input=input)
+    db.close()
+    os.replace(temp, output)
+
+
+def app_list(parser, apps, input=None):
+    """
+    Returns the apps passed or all the apps with sample files, in their
+    sample/sql directories or in the directories of input
+    """
+    apps = apps or sorted(app for app in os.listdir(input or APPS_PATH) if sample_files(sample_dir(app, input)))
+    unknown = [app for app in apps if not sample_files(sample_dir(app, input))]
+    if unknown:
+        parser.error(f"Apps without sample files: {', '.join(unknown)}")
+    return apps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a SQLite database with the sample data")
+    parser.add_argument("apps", nargs="*", help="Apps to load, all the apps with sample files by default")
+    parser.add_argument("--output", default="saltos.sqlite", help="SQLite file to build (saltos.sqlite)")
+    parser.add_argument("--date", type=date.fromisoformat,
+                        help=f"Date of the control and version rows, as YYYY-MM-DD ({DATE})")
+    parser.add_argument("--input", help="Directory with the sample files of each app in <dir>/<app>, as written by "
+                        "scripts/sampleall.py --output (the sample/sql directory of each app by default)")
+    parser.add_argument("--append", help="Directory with the files of new rows to load in the existing output")
+    args = parser.parse_args()
+    if args.input and not os.path.isdir(args.input):
+        parser.error(f"{args.input} is not a directory")
+    if args.append:
+        if not os.path.exists(args.output):
+            parser.error(f"{args.output} does not exist")
+        if args.date is None:
+            last = read_state(args.output)["date"]
+            args.date = date.fromisoformat(last) + timedelta(days=1) if last else DATE
+        files = []
+        for format in ("sql", "csv", "tsv"):
+            files.extend(glob.glob(os.path.join(args.append, "**", f"*.{format}.gz"), recursive=True))
+        db = open_database(args.output, journal=True)
+        append_database(db, read_dbschema(core=True, auto=True), sorted(files), f"{args.date} 00:00:00")
+        db.close()
+    else:
+        build(args.output, app_list(parser, args.apps, args.input), f"{args.date or DATE} 00:00:00", args.input)
+    print(args.output)
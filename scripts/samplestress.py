@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Stress emails
+
+This script generates pathological emails to profile the memory and the
+latency of the parsing path of the emails app (the mime_parser_class used by
+getmail, __getmail_getinfo, __getmail_gettextbody and the indexing of the
+attachments by indexing_files), each case exercises one of the mails that
+cause problems in production:
+
+- huge_attachment => one attachment of --attachment-size MB
+- many_parts => --parts attachments of different types in one message
+- deep_nesting => --depth levels of nested multiparts with a text and an
+  attachment at the bottom
+- huge_headers => --headers Received headers, --headers recipients, a long
+  subject and a header with a long token that can not be folded
+- mixed_charsets => subject made of encoded words in several charsets and
+  text, HTML and file names in several charsets
+- long_base64_lines => an attachment encoded in base64 lines of
+  --line-size characters instead of 76
+- malformed => a multipart without the closing boundary and with invalid
+  characters in the base64 of an attachment
+
+The messages are written as stress_<case>_<n>.eml.gz files, one gzip member
+without time by message written while the message is serialized, and the
+expected.json file contains the expected parse outcome of each file, written
+from the spec used to build the message and not by parsing it: the subject
+and the sender, the number of recipients, the number of MIME parts, the depth
+of the multiparts, the text parts, the files (name, type and decoded size)
+that __getmail_getfiles must select, the charsets of the parts, and for the
+malformed messages the offset where the message is truncated and the offset
+of the invalid characters of the base64
+
+The files can be copied to the inbox directory of an account to be imported
+by getmail, and the rows of app_emails and app_emails_files compared with
+the expected outcomes
+
+Usage:
+
+scripts/samplestress.py [--cases case,...] [--attachment-size MB] [--parts N]
+                        [--depth N] [--headers N] [--line-size N] [options]
+
+The --scale option sets the number of messages of each case, 1 by each unit
+of scale, and --jobs the processes used to generate them
+"""
+import os
+import sys
+import gzip
+import json
+import base64
+import argparse
+from multiprocessing import Pool
+from email.generator import BytesGenerator
+from email.header import Header
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.utils import format_datetime
+from datetime import datetime, timedelta
+
+from samplelib import COMPRESSLEVEL, parse_args, scaled, ref_date, shard_random
+
+# Texts of the mixed charsets case, each one can be encoded with its charset
+CHARSETS = {
+    "iso-8859-1": "Canción de la niña en el año",
+    "windows-1252": "Factura de 25 € con “comillas”",
+    "koi8-r": "Привет, это тестовое письмо",
+    "iso-2022-jp": "日本語のテストメール",
+    "gb2312": "这是一封测试邮件",
+    "utf-8": "Ünïcödé ✓ ☃ 🚀",
+}
+
+# Types of the parts of the many parts case
+TYPES = [
+    ("text", "plain", "txt"),
+    ("text", "csv", "csv"),
+    ("application", "pdf", "pdf"),
+    ("image", "png", "png"),
+    ("application", "octet-stream", "bin"),
+]
+
+
+SENDER = "stress@example.com"
+
+
+def headers(rng, args, msg, subject="Stress email"):
+    """
+    Adds the common headers of the stress emails
+    """
+    msg["From"] = SENDER
+    msg["To"] = "admin@example.com"
+    msg["Subject"] = subject
+    moment = datetime.combine(ref_date(args), datetime.min.time()) - timedelta(seconds=rng.randint(0, 86400 * 30))
+    msg["Date"] = format_datetime(moment)
+    msg["Message-ID"] = f"<stress-{rng.getrandbits(64):016x}@example.com>"
+    return msg
+
+
+def attachment(data, maintype, subtype, name):
+    """
+    Returns an attachment part encoded in base64
+    """
+    part = MIMEBase(maintype, subtype)
+    part.set_payload(base64.encodebytes(data).decode("ascii"))
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=name)
+    return part
+
+
+def outcome(subject, files=(), texts=1, multiparts=1, depth=1, recipients=1, charsets=("utf-8",)):
+    """
+    Returns the expected parse outcome of a message built with the texts, the
+    files (as name, type and size) and the multiparts of the arguments
+    """
+    return {
+        "subject": subject,
+        "from": SENDER,
+        "recipients": recipients,
+        "parts": multiparts + texts + len(files),
+        "depth": depth,
+        "texts": texts,
+        "files": [{"name": name, "type": type, "size": size} for name, type, size in files],
+        "charsets": sorted(set(charsets)),
+        "valid": True,
+    }
+
+
+def huge_attachment(rng, args):
+    subject = "Huge attachment"
+    msg = headers(rng, args, MIMEMultipart("mixed"), subject)
+    msg.attach(MIMEText("See the attached file.", "plain", "utf-8"))
+    size = args.attachment_size * 1048576
+    msg.attach(attachment(rng.randbytes(size), "application", "octet-stream", "huge.bin"))
+    return msg, None, outcome(subject, [("huge.bin", "application/octet-stream", size)])
+
+
+def many_parts(rng, args):
+    subject = f"{args.parts} parts"
+    msg = headers(rng, args, MIMEMultipart("mixed"), subject)
+    msg.attach(MIMEText("Many attachments follow.", "plain", "utf-8"))
+    files = []
+    for index in range(args.parts):
+        maintype, subtype, extension = TYPES[index % len(TYPES)]
+        data = rng.randbytes(rng.randint(16, 4096))
+        files.append((f"part_{index:04d}.{extension}", f"{maintype}/{subtype}", len(data)))
+        msg.attach(attachment(data, maintype, subtype, files[-1][0]))
+    return msg, None, outcome(subject, files)
+
+
+def deep_nesting(rng, args):
+    subject = f"{args.depth} nested multiparts"
+    msg = headers(rng, args, MIMEMultipart("mixed"), subject)
+    node = msg
+    for level in range(args.depth):
+        child = MIMEMultipart("related" if level % 2 else "mixed")
+        node.attach(child)
+        node = child
+    node.attach(MIMEText("The deepest text of the message.", "plain", "utf-8"))
+    node.attach(attachment(rng.randbytes(1024), "application", "octet-stream", "deepest.bin"))
+    files = [("deepest.bin", "application/octet-stream", 1024)]
+    return msg, None, outcome(subject, files, multiparts=args.depth + 1, depth=args.depth + 1)
+
+
+def huge_headers(rng, args):
+    msg = MIMEMultipart("mixed")
+    for index in range(args.headers):
+        msg["Received"] = (f"from relay{index}.example.com (relay{index}.example.com [10.{index // 65536 % 256}."
+                           f"{index // 256 % 256}.{index % 256}]) by mx.example.com with ESMTP id {rng.getrandbits(48):012x}")
+    subject = " ".join(f"word{index}" for index in range(args.headers))
+    headers(rng, args, msg, subject)
+    del msg["To"]
+    msg["To"] = ", ".join(f"User {index} <user{index}@example.com>" for index in range(args.headers))
+    msg["X-Trace"] = base64.b64encode(rng.randbytes(args.headers * 12)).decode("ascii")
+    msg.attach(MIMEText("A message with enormous headers.", "plain", "utf-8"))
+    return msg, None, outcome(subject, recipients=args.headers)
+
+
+def mixed_charsets(rng, args):
+    msg = MIMEMultipart("mixed")
+    subject = Header()
+    for charset, text in CHARSETS.items():
+        subject.append(text + " ", charset)
+    headers(rng, args, msg, subject)
+    body = MIMEMultipart("alternative")
+    for charset, text in CHARSETS.items():
+        body.attach(MIMEText(f"{text}\n", "plain", charset))
+    body.attach(MIMEText(f"<html><body><p>{CHARSETS['windows-1252']}</p></body></html>", "html", "windows-1252"))
+    msg.attach(body)
+    files = []
+    for charset, text in CHARSETS.items():
+        part = MIMEBase("text", "plain")
+        part.set_payload(base64.encodebytes(text.encode(charset)).decode("ascii"))
+        part["Content-Transfer-Encoding"] = "base64"
+        part.set_param("charset", charset)
+        part.add_header("Content-Disposition", "attachment", filename=("utf-8", "", f"{text[:12]}.txt"))
+        msg.attach(part)
+        files.append((f"{text[:12]}.txt", "text/plain", len(text.encode(charset))))
+    subject = "".join(f"{text} " for text in CHARSETS.values())
+    return msg, None, outcome(subject, files, len(CHARSETS) + 1, 2, 2, charsets=CHARSETS)
+
+
+def long_base64_lines(rng, args):
+    msg = headers(rng, args, MIMEMultipart("mixed"), "Long base64 lines")
+    msg.attach(MIMEText("The attachment is encoded without line breaks.", "plain", "utf-8"))
+    data = rng.randbytes(args.line_size * 3 // 4)
+    part = attachment(b"", "application", "octet-stream", "long.bin")
+    part.set_payload(base64.b64encode(data).decode("ascii") + "\n")
+    msg.attach(part)
+    return msg, None, outcome("Long base64 lines", [("long.bin", "application/octet-stream", len(data))])
+
+
+def malformed(rng, args):
+    subject = "Malformed message"
+    msg = headers(rng, args, MIMEMultipart("mixed"), subject)
+    msg.set_boundary(f"stress-{rng.getrandbits(64):016x}")
+    msg.attach(MIMEText("The closing boundary is missing.", "plain", "utf-8"))
+    msg.attach(attachment(rng.randbytes(4096), "application", "octet-stream", "valid.bin"))
+    msg.attach(attachment(rng.randbytes(4096), "application", "octet-stream", "broken.bin"))
+    raw = msg.as_bytes()
+    # Without the closing boundary and with invalid characters in the last base64
+    truncated = raw.rindex(f"--{msg.get_boundary()}--".encode("ascii"))
+    invalid = truncated - 200
+    raw = raw[:invalid] + b"!!**" + raw[invalid:truncated]
+    # The characters out of the base64 alphabet are ignored (RFC 2045), so the broken file keeps its size
+    files = [("valid.bin", "application/octet-stream", 4096), ("broken.bin", "application/octet-stream", 4096)]
+    result = outcome(subject, files)
+    result.update({"valid": False, "truncated": len(raw), "invalid": invalid})
+    return None, raw, result
+
+
+# Cases of the stress corpus, see the docstring
+CASES = {
+    "huge_attachment": huge_attachment,
+    "many_parts": many_parts,
+    "deep_nesting": deep_nesting,
+    "huge_headers": huge_headers,
+    "mixed_charsets": mixed_charsets,
+    "long_base64_lines": long_base64_lines,
+    "malformed": malformed,
+}
+
+
+class Counter:
+    """
+    Writer that counts the bytes written to a file
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        return self.fd.write(data)
+
+
+def write_case(task):
+    """
+    Generates and writes a message and returns its file and its outcome
+    """
+    args, case, number = task
+    rng = shard_random("stress", args.seed, number, case)
+    msg, raw, result = CASES[case](rng, args)
+    file = f"stress_{case}_{number:04d}.eml.gz"
+    with gzip.GzipFile(os.path.join(args.output, file), "wb", COMPRESSLEVEL, mtime=0) as gz:
+        counter = Counter(gz)
+        if raw is None:
+            BytesGenerator(counter, mangle_from_=False).flatten(msg)
+        else:
+            counter.write(raw)
+    result["case"] = case
+    result["bytes"] = counter.bytes
+    return file, result
+
+
+def parse_cases(cases):
+    """
+    Returns the list of cases of the --cases option
+    """
+    result = [case for case in cases.split(",") if case]
+    unknown = [case for case in result if case not in CASES]
+    if unknown or not result:
+        raise argparse.ArgumentTypeError(f"invalid cases {','.join(unknown)}, the cases are {', '.join(CASES)}")
+    return result
+
+
+def options(parser):
+    parser.add_argument("--cases", type=parse_cases, default=list(CASES), help="Cases to generate, all by default")
+    parser.add_argument("--attachment-size", type=int, default=50, help="MB of the attachment of huge_attachment")
+    parser.add_argument("--parts", type=int, default=500, help="Attachments of many_parts")
+    parser.add_argument("--depth", type=int, default=100, help="Nested multiparts of deep_nesting")
+    parser.add_argument("--headers", type=int, default=5000, help="Received headers and recipients of huge_headers")
+    parser.add_argument("--line-size", type=int, default=4000000, help="Characters of the base64 line of long_base64_lines")
+
+
+if __name__ == "__main__":
+    args = parse_args("Generate pathological emails to stress the parser", options)
+    # The generator and the parser of Python recurse by each multipart level
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), args.depth * 10 + 1000))
+    tasks = [(args, case, number) for case in args.cases for number in range(1, scaled(1, args.scale) + 1)]
+    pool = Pool(args.jobs) if args.jobs > 1 else None
+    expected = {}
+    for file, result in (pool.imap if pool else map)(write_case, tasks):
+        expected[file] = result
+        print(f"{file} {result['bytes']} bytes {result['parts']} parts {len(result['files'])} files")
+    if pool:
+        pool.close()
+        pool.join()
+    with open(os.path.join(args.output, "expected.json"), "w", encoding="utf-8") as fd:
+        json.dump(expected, fd, indent=4, sort_keys=True, ensure_ascii=False)
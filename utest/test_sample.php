@@ -0,0 +1,90 @@
+<?php
+
+/**
+ *  ____        _ _    ___  ____    _  _    ___
+ * / ___|  __ _| | |_ / _ \/ ___|  | || |  / _ \
+ * \___ \ / _` | | __| | | \___ \  | || |_| | | |
+ *  ___) | (_| | | |_| |_| |___) | |__   _| |_| |
+ * |____/ \__,_|_|\__|\___/|____/     |_|(_)___/
+ *
+ * SaltOS: Framework to develop Rich Internet Applications
+ * Copyright (C) 2007-2025 by Josep Sanz Campderrós
+ * More information in https://www.saltos.org or info@saltos.org
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+
+declare(strict_types=1);
+
+// phpcs:disable PSR1.Classes.ClassDeclaration
+// phpcs:disable Squiz.Classes.ValidClassName
+// phpcs:disable PSR1.Methods.CamelCapsMethodName
+// phpcs:disable PSR1.Files.SideEffects
+
+/**
+ * Test sample
+ *
+ * This test performs some tests to validate the correctness
+ * of the sample data generators
+ */
+
+/**
+ * Importing namespaces
+ */
+use PHPUnit\Framework\TestCase;
+use PHPUnit\Framework\Attributes\TestDox;
+
+/**
+ * Main class of this unit test
+ */
+final class test_sample extends TestCase
+{
+    #[testdox('sample append')]
+    /**
+     * sample append test
+     *
+     * This test performs some tests to validate that the rows added to a
+     * dataset with --append are dated after the date of the previous run
+     */
+    public function test_sample_append(): void
+    {
+        $dir = get_directory('dirs/tempdir') ?? getcwd_protected() . '/data/temp/';
+        $dir .= 'utest_sample';
+        $state = "$dir/state.json";
+
+        $horizons = [];
+        $dates = [];
+        foreach ([1, 2] as $run) {
+            $buffer = ob_passthru("python3 ../../scripts/sampleall.py --scale=0.1 --append=$state " .
+                "--output=$dir/run$run crm sales purchases hr 2>&1");
+            $this->assertStringContainsString('total', $buffer);
+            $horizons[$run] = json_decode(file_get_contents($state), true)['date'];
+
+            // The dates of the rows are quoted strings, the empty dates are skipped
+            $dates[$run] = [];
+            foreach (glob("$dir/run$run/*/*.sql.gz") as $file) {
+                $buffer = file_get_contents("compress.zlib://$file");
+                preg_match_all("/'(\d{4}-\d{2}-\d{2})/", $buffer, $matches);
+                $dates[$run] = array_merge($dates[$run], array_diff($matches[1], ['0000-00-00']));
+            }
+            $this->assertNotEmpty($dates[$run]);
+        }
+        $this->assertGreaterThan($horizons[1], $horizons[2]);
+        $this->assertGreaterThan($horizons[1], min($dates[2]));
+        $this->assertLessThan($horizons[1], min($dates[1]));
+
+        ob_passthru("rm -rf $dir");
+        $this->assertDirectoryDoesNotExist($dir);
+    }
+}
@@ -0,0 +1,223 @@
+<?php
+
+/**
+ *  ____        _ _    ___  ____    _  _    ___
+ * / ___|  __ _| | |_ / _ \/ ___|  | || |  / _ \
+ * \___ \ / _` | | __| | | \___ \  | || |_| | | |
+ *  ___) | (_| | | |_| |_| |___) | |__   _| |_| |
+ * |____/ \__,_|_|\__|\___/|____/     |_|(_)___/
+ *
+ * SaltOS: Framework to develop Rich Internet Applications
+ * Copyright (C) 2007-2025 by Josep Sanz Campderrós
+ * More information in https://www.saltos.org or info@saltos.org
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program.  If not, see <https://www.gnu.org/licenses/>.
+ */
+
+declare(strict_types=1);
+
+// phpcs:disable PSR1.Classes.ClassDeclaration
+// phpcs:disable Squiz.Classes.ValidClassName
+// phpcs:disable PSR1.Methods.CamelCapsMethodName
+// phpcs:disable PSR1.Files.SideEffects
+
+/**
+ * Test setup
+ *
+ * This test performs some tests to validate the correctness
+ * of the setup functions
+ */
+
+/**
+ * Importing namespaces
+ */
+use PHPUnit\Framework\TestCase;
+use PHPUnit\Framework\Attributes\TestDox;
+
+/**
+ * Loading helper function
+ *
+ * This file contains the needed function used by the unit tests
+ */
+require_once 'lib/utestlib.php';
+require_once 'php/lib/setup.php';
+
+/**
+ * Main class of this unit test
+ */
+final class test_setup extends TestCase
+{
+    #[testdox('setup functions')]
+    /**
+     * setup test
+     *
+     * This test performs some tests to validate the correctness
+     * of the setup functions
+     */
+    public function test_setup(): void
+    {
+        db_query('CREATE TABLE utest_setup (id INTEGER, name TEXT)');
+
+        $file = get_temp_file('sql.gz');
+        file_put_contents("compress.zlib://$file", implode("\n", [
+            '/*MYSQL SET autocommit=0 *//*SQLITE BEGIN */;',
+            'INSERT INTO utest_setup (id, name) VALUES',
+            "(1, 'one;'),",
+            "(2, 'it''s;\nmultiline;');",
+            'INSERT INTO utest_setup (id, name) VALUES',
+            "(3, 'three');",
+            'COMMIT;',
+            '/*MYSQL SET autocommit=1 */;',
+            'INSERT INTO utest_setup (id, name) VALUES',
+            "(4, 'four')",
+        ]));
+        $this->assertSame(__setup_import_sql($file), 6);
+        unlink($file);
+
+        $this->assertEquals(execute_query('SELECT COUNT(*) FROM utest_setup'), 4);
+        $this->assertSame(execute_query('SELECT name FROM utest_setup WHERE id = 2'), "it's;\nmultiline;");
+        db_query('DELETE FROM utest_setup');
+
+        $dir = get_directory('dirs/tempdir') ?? getcwd_protected() . '/data/temp/';
+        $file = $dir . 'utest_setup.csv.gz';
+        file_put_contents("compress.zlib://$file", implode("\n", [
+            'name,id',
+            'one,1',
+            '"it\'s, ""quoted""',
+            'multiline",2',
+            '',
+        ]));
+        $this->assertSame(__setup_import_csv($file), 2);
+        unlink($file);
+
+        $this->assertEquals(execute_query('SELECT COUNT(*) FROM utest_setup'), 2);
+        $this->assertSame(execute_query('SELECT name FROM utest_setup
+            WHERE id = 2'), "it's, \"quoted\"\nmultiline");
+        db_query('DELETE FROM utest_setup');
+
+        $file = $dir . 'utest_setup.tsv.gz';
+        file_put_contents("compress.zlib://$file", implode("\n", [
+            "id\tname",
+            "1\tone",
+            "2\ttab\\there\\nnew line\\\\",
+            '',
+        ]));
+        $this->assertSame(__setup_import_csv($file), 2);
+        unlink($file);
+
+        $this->assertEquals(execute_query('SELECT COUNT(*) FROM utest_setup'), 2);
+        $this->assertSame(execute_query('SELECT name FROM utest_setup
+            WHERE id = 2'), "tab\there\nnew line\\");
+
+        db_query('DROP TABLE utest_setup');
+    }
+
+    #[testdox('setup helper functions')]
+    /**
+     * setup helper test
+     *
+     * This test performs some tests to validate the reload of the sample
+     * files whose sha256 changed in the manifest
+     */
+    public function test_setup_helper(): void
+    {
+        // The sample files are read from the sample env variable as the CLI does
+        $method = get_data('server/request_method');
+        set_data('server/request_method', 'CLI');
+        $sample = get_directory('dirs/tempdir') ?? getcwd_protected() . '/data/temp/';
+        $sample .= 'utest_setup';
+        $path = "$sample/utest";
+        if (!is_dir($path)) {
+            mkdir($path, 0777, true);
+        }
+        putenv("sample=$sample");
+
+        // Keep the registers of the app to restore them at the end
+        db_query('CREATE TABLE utest_customers AS SELECT * FROM app_customers');
+        db_query('CREATE TABLE utest_customers_index AS SELECT * FROM app_customers_index');
+        db_query('DELETE FROM app_customers');
+        db_query('DELETE FROM app_customers_index');
+        $log = intval(execute_query('SELECT MAX(id) FROM app_customers_log'));
+
+        $write = function ($files) use ($path) {
+            $manifest = [];
+            foreach ($files as $name => $lines) {
+                file_put_contents("compress.zlib://$path/$name", implode("\n", $lines) . "\n");
+                $manifest[$name] = ['sha256' => hash_file('sha256', "$path/$name")];
+            }
+            file_put_contents("$path/manifest.json", json_encode($manifest));
+        };
+        $key = 'sample/utest/app_customers.csv.gz';
+
+        // First load of the file, the control and the index are built
+        $write(['app_customers.csv.gz' => ['id,active,name', '900001,1,utest one', '900002,1,utest two']]);
+        $json = __setup_helper('utest');
+        $this->assertSame($json['setup']['total'], ['customers' => 2]);
+        $this->assertSame(get_config($key, 0), hash_file('sha256', "$path/app_customers.csv.gz"));
+        $this->assertEquals(execute_query('SELECT COUNT(*) FROM app_customers_control
+            WHERE id IN (900001, 900002)'), 2);
+        $this->assertStringContainsString('utest two', execute_query('SELECT search
+            FROM app_customers_index WHERE id = 900002'));
+
+        // The file with the same hash is skipped
+        $json = __setup_helper('utest');
+        $this->assertSame($json['setup']['total'], []);
+        $this->assertEquals(execute_query('SELECT COUNT(*) FROM app_customers'), 2);
+
+        // The file with a new hash reloads the table and rebuilds the control and the index
+        $write(['app_customers.csv.gz' => ['id,active,name', '900001,1,utest changed']]);
+        $json = __setup_helper('utest');
+        $this->assertSame($json['setup']['total'], ['customers' => 1]);
+        $this->assertSame(get_config($key, 0), hash_file('sha256', "$path/app_customers.csv.gz"));
+        $this->assertEquals(execute_query('SELECT COUNT(*) FROM app_customers'), 1);
+        $this->assertEquals(execute_query('SELECT COUNT(*) FROM app_customers_control
+            WHERE id IN (900001, 900002)'), 1);
+        $this->assertNull(execute_query('SELECT search FROM app_customers_index WHERE id = 900002'));
+        $this->assertStringContainsString('utest changed', execute_query('SELECT search
+            FROM app_customers_index WHERE id = 900001'));
+
+        // The index loaded from a file is not rebuilt
+        db_query('DELETE FROM app_customers_index');
+        $write([
+            'app_customers.csv.gz' => ['id,active,name', '900001,1,utest meta'],
+            'app_customers_index.csv.gz' => ['id,search', '900001,utest from file'],
+        ]);
+        $json = __setup_helper('utest');
+        $this->assertSame($json['setup']['total'], ['customers' => 1]);
+        $this->assertSame(execute_query('SELECT search
+            FROM app_customers_index WHERE id = 900001'), 'utest from file');
+        $hash = hash_file('sha256', "$path/app_customers_index.csv.gz");
+        $this->assertSame(get_config('sample/utest/app_customers_index.csv.gz', 0), $hash);
+
+        // Restore the registers of the app
+        db_query('DELETE FROM app_customers');
+        db_query('DELETE FROM app_customers_index');
+        db_query('INSERT INTO app_customers SELECT * FROM utest_customers');
+        db_query('INSERT INTO app_customers_index SELECT * FROM utest_customers_index');
+        db_query('DROP TABLE utest_customers');
+        db_query('DROP TABLE utest_customers_index');
+        db_query('DELETE FROM app_customers_control WHERE id IN (900001, 900002)');
+        db_query('DELETE FROM app_customers_version WHERE reg_id IN (900001, 900002)');
+        db_query("DELETE FROM app_customers_log WHERE log = 'setup' AND id > $log");
+        set_config($key, null, 0);
+        set_config('sample/utest/app_customers_index.csv.gz', null, 0);
+        foreach (glob("$path/*") as $file) {
+            unlink($file);
+        }
+        rmdir($path);
+        rmdir($sample);
+        putenv('sample');
+        set_data('server/request_method', $method);
+    }
+}